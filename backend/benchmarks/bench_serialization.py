@@ -0,0 +1,94 @@
+"""Per-request CPU benchmark for the list and detail endpoints.
+
+Compares the previous response path (ORM objects -> Pydantic validation ->
+stdlib JSON) with the current one (column tuples -> orjson, streamed or cached
+lists) on an in-memory SQLite database filled with large transcripts.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_serialization --videos 200 --transcript-kb 300
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from src import crud, models  # noqa: E402
+from src.cache import QueryCache  # noqa: E402
+from src.database import Base  # noqa: E402
+from src.serialization import iter_json_array  # noqa: E402
+
+def _session(videos: int, transcript_kb: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    transcript = ("これは文字起こしのテキストです。" * 64)[: transcript_kb * 1024 // 3]
+    db.add_all([
+        models.Video(
+            url=f"https://youtu.be/{i}", title=f"Video {i}", channel_name="Channel",
+            tags="a,b", transcript=transcript, summary=transcript[:200], status="completed",
+        )
+        for i in range(videos)
+    ])
+    db.commit()
+    return db
+
+def _cpu_ms(fn, repeat: int) -> float:
+    fn()  # warm up
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) * 1000 / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--transcript-kb", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = _session(args.videos, args.transcript_kb)
+    video_id = db.query(models.Video.id).first()[0]
+
+    def list_before():
+        db.expire_all()
+        videos = crud.search_videos(db)
+        body = [models.VideoSchema.model_validate(v) for v in videos]
+        return json.dumps(jsonable_encoder(body)).encode("utf-8")
+
+    def list_after_stream():
+        return b"".join(iter_json_array(crud.search_video_rows(db, batch_size=200)))
+
+    cache = QueryCache()
+
+    def list_after_cached():
+        original = crud.query_cache
+        crud.query_cache = cache
+        try:
+            return crud.search_videos_cached(db)
+        finally:
+            crud.query_cache = original
+
+    def detail_before():
+        db.expire_all()
+        video = crud.get_video(db, video_id)
+        return json.dumps(jsonable_encoder(models.VideoSchema.model_validate(video))).encode("utf-8")
+
+    def detail_after():
+        return crud.get_video_json(db, video_id)
+
+    print(f"{args.videos} videos, {args.transcript_kb} KB transcripts, CPU ms per request")
+    print(f"  list   before (ORM + Pydantic + json):   {_cpu_ms(list_before, args.repeat):9.2f}")
+    print(f"  list   after  (tuples + orjson stream):  {_cpu_ms(list_after_stream, args.repeat):9.2f}")
+    print(f"  list   after  (cached, encoded):         {_cpu_ms(list_after_cached, args.repeat):9.2f}")
+    print(f"  detail before (ORM + Pydantic + json):   {_cpu_ms(detail_before, args.repeat * 20):9.2f}")
+    print(f"  detail after  (tuple + orjson):          {_cpu_ms(detail_after, args.repeat * 20):9.2f}")
+
+if __name__ == "__main__":
+    main()
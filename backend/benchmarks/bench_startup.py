@@ -0,0 +1,92 @@
+"""Startup-time benchmark for the backend.
+
+Measures, in a fresh interpreter each run:
+  * import time of ``src.main``
+  * time from process start to the first successful request (``GET /``)
+and checks that the heavy SDKs (yt-dlp, Google Cloud, googleapiclient) and
+the numeric libraries used for summaries and embeddings (NumPy, SciPy) are
+not imported by the web app at startup.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup --runs 5 --max-import-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "yt_dlp",
+    "google.cloud.speech",
+    "google.cloud.storage",
+    "googleapiclient.discovery",
+    "numpy",
+    "scipy",
+]
+
+# 子プロセスで実行する計測コード
+_CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import src.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(src.main.app) as client:
+    response = client.get("/")
+    assert response.status_code == 200
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_request_ms": (t2 - t0) * 1000,
+    "heavy_loaded": [m for m in %(heavy)r if m in sys.modules],
+}))
+"""
+
+def run_once() -> dict:
+    env = dict(os.environ)
+    # 起動計測ではDBやネットワークに依存しないようにする
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("SEED_ON_STARTUP", "false")
+    code = _CHILD % {"heavy": HEAVY_MODULES}
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None,
+                        help="Fail if the median import time exceeds this value.")
+    parser.add_argument("--max-first-request-ms", type=float, default=None,
+                        help="Fail if the median time to first request exceeds this value.")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    first_ms = statistics.median(r["first_request_ms"] for r in results)
+    heavy = sorted({m for r in results for m in r["heavy_loaded"]})
+
+    print(f"runs:                 {args.runs}")
+    print(f"import src.main:      {import_ms:8.1f} ms (median)")
+    print(f"time to first request:{first_ms:8.1f} ms (median)")
+    print(f"heavy SDKs imported:  {', '.join(heavy) if heavy else 'none'}")
+
+    failed = False
+    if heavy:
+        print("FAIL: heavy SDKs should be imported lazily.")
+        failed = True
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"FAIL: import time above {args.max_import_ms} ms.")
+        failed = True
+    if args.max_first_request_ms is not None and first_ms > args.max_first_request_ms:
+        print(f"FAIL: time to first request above {args.max_first_request_ms} ms.")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
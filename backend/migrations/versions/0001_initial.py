@@ -0,0 +1,36 @@
+"""initial videos table
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'videos',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('channel_name', sa.String(length=255), nullable=False),
+        sa.Column('tags', sa.Text(), nullable=True),
+        sa.Column('memo', sa.Text(), nullable=True),
+        sa.Column('transcript', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_videos_id', 'videos', ['id'])
+
+
+def downgrade():
+    op.drop_index('ix_videos_id', table_name='videos')
+    op.drop_table('videos')
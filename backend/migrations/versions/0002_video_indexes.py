@@ -0,0 +1,37 @@
+"""indexes for status, timestamps and sort columns on videos
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_videos_status', 'videos', ['status'])
+    op.create_index('ix_videos_created_at', 'videos', ['created_at'])
+    op.create_index('ix_videos_updated_at', 'videos', ['updated_at'])
+    op.create_index('ix_videos_channel_name', 'videos', ['channel_name'])
+    op.create_index('ix_videos_title', 'videos', ['title'])
+    # 処理中ジョブの復旧スキャン用の部分インデックス
+    op.create_index(
+        'ix_videos_processing', 'videos', ['updated_at'],
+        postgresql_where=sa.text("status = 'processing'"),
+        sqlite_where=sa.text("status = 'processing'"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_videos_processing', table_name='videos')
+    op.drop_index('ix_videos_title', table_name='videos')
+    op.drop_index('ix_videos_channel_name', table_name='videos')
+    op.drop_index('ix_videos_updated_at', table_name='videos')
+    op.drop_index('ix_videos_created_at', table_name='videos')
+    op.drop_index('ix_videos_status', table_name='videos')
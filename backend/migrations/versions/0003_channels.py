@@ -0,0 +1,38 @@
+"""channels table and videos.channel_id / duration_seconds
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'channels',
+        sa.Column('id', sa.String(length=64), primary_key=True),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('channel_id', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('duration_seconds', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_videos_channel_id', 'channels', ['channel_id'], ['id'])
+        batch_op.create_index('ix_videos_channel_id', ['channel_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_index('ix_videos_channel_id')
+        batch_op.drop_constraint('fk_videos_channel_id', type_='foreignkey')
+        batch_op.drop_column('duration_seconds')
+        batch_op.drop_column('channel_id')
+    op.drop_table('channels')
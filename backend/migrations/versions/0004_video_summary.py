@@ -0,0 +1,24 @@
+"""videos.summary
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('summary', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('summary')
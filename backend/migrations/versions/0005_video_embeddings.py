@@ -0,0 +1,31 @@
+"""video_embeddings table
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'video_embeddings',
+        sa.Column('video_id', sa.Integer(), sa.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('model', sa.String(length=255), nullable=False),
+        sa.Column('dim', sa.Integer(), nullable=False),
+        sa.Column('vector', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_video_embeddings_updated_at', 'video_embeddings', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_video_embeddings_updated_at', table_name='video_embeddings')
+    op.drop_table('video_embeddings')
@@ -0,0 +1,30 @@
+"""transcription checkpoint columns on videos
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('transcription_stage', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('audio_sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('gcs_uri', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('operation_name', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('operation_name')
+        batch_op.drop_column('gcs_uri')
+        batch_op.drop_column('audio_sha256')
+        batch_op.drop_column('transcription_stage')
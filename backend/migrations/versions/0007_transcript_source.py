@@ -0,0 +1,24 @@
+"""videos.transcript_source
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('transcript_source', sa.String(length=32), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('transcript_source')
@@ -0,0 +1,46 @@
+"""MinHash signatures, LSH bands and videos.duplicate_of
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('duplicate_of', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_videos_duplicate_of', 'videos', ['duplicate_of'], ['id'], ondelete='SET NULL')
+        batch_op.create_index('ix_videos_duplicate_of', ['duplicate_of'])
+
+    op.create_table(
+        'video_signatures',
+        sa.Column('video_id', sa.Integer(), sa.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('num_perm', sa.Integer(), nullable=False),
+        sa.Column('signature', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        'video_lsh_bands',
+        sa.Column('video_id', sa.Integer(), sa.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('band', sa.SmallInteger(), primary_key=True),
+        sa.Column('bucket', sa.BigInteger(), nullable=False),
+    )
+    op.create_index('ix_video_lsh_bands_band_bucket', 'video_lsh_bands', ['band', 'bucket'])
+
+
+def downgrade():
+    op.drop_index('ix_video_lsh_bands_band_bucket', table_name='video_lsh_bands')
+    op.drop_table('video_lsh_bands')
+    op.drop_table('video_signatures')
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_index('ix_videos_duplicate_of')
+        batch_op.drop_constraint('fk_videos_duplicate_of', type_='foreignkey')
+        batch_op.drop_column('duplicate_of')
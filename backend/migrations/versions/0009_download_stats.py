@@ -0,0 +1,26 @@
+"""videos.download_bytes / download_seconds
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('download_bytes', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('download_seconds', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('download_seconds')
+        batch_op.drop_column('download_bytes')
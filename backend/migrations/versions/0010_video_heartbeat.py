@@ -0,0 +1,33 @@
+"""videos.heartbeat_at and the unfinished-jobs index
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+    # 旧バージョンのレプリカで実行中のジョブを、新しいレプリカが即座に引き継がないようにする
+    op.execute("UPDATE videos SET heartbeat_at = CURRENT_TIMESTAMP WHERE status = 'processing'")
+    # 中断ジョブと、ハートビートが途絶えた処理中ジョブの再開スキャン用の部分インデックス
+    op.create_index(
+        'ix_videos_unfinished', 'videos', ['status', 'heartbeat_at'],
+        postgresql_where=sa.text("status IN ('processing', 'interrupted')"),
+        sqlite_where=sa.text("status IN ('processing', 'interrupted')"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_videos_unfinished', table_name='videos')
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('heartbeat_at')
@@ -0,0 +1,105 @@
+"""Size-bounded, content-addressed on-disk cache of converted FLAC audio.
+
+Files are stored as ``objects/<sha256[:2]>/<sha256>.flac`` with a small
+``index/<youtube_id>`` file pointing at the digest, so a retried job can find
+the audio it already converted. When the cache grows past
+``AUDIO_CACHE_MAX_BYTES`` the least recently used files are removed.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional, Tuple
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "summaryoutube-audio-cache"))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AudioCache:
+    def __init__(self, root: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}.flac")
+
+    def _index_path(self, video_id: str) -> str:
+        return os.path.join(self.root, "index", video_id)
+
+    def get(self, sha256: Optional[str]) -> Optional[str]:
+        """Return the cached file for ``sha256`` and mark it as recently used."""
+        if not sha256:
+            return None
+        path = self._object_path(sha256)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def lookup(self, video_id: str) -> Optional[Tuple[str, str]]:
+        """Return ``(sha256, path)`` for the audio last cached for a YouTube video."""
+        try:
+            with open(self._index_path(video_id)) as f:
+                sha256 = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = self.get(sha256)
+        return (sha256, path) if path else None
+
+    def put(self, video_id: str, path: str) -> Tuple[str, str]:
+        """Move ``path`` into the cache. Returns ``(sha256, cached_path)``."""
+        sha256 = file_sha256(path)
+        target = self._object_path(sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(path)
+            os.utime(target)
+        else:
+            # 同一ファイルシステム上なら rename、そうでなければコピー後に置き換える
+            tmp_target = f"{target}.{os.getpid()}.tmp"
+            shutil.move(path, tmp_target)
+            os.replace(tmp_target, target)
+        index_path = self._index_path(video_id)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(index_path, "w") as f:
+            f.write(sha256)
+        self.evict(keep=sha256)
+        return sha256, target
+
+    def evict(self, keep: Optional[str] = None):
+        """Remove least recently used files until the cache fits in ``max_bytes``."""
+        with self._lock:
+            objects_dir = os.path.join(self.root, "objects")
+            entries = []
+            for dirpath, _, filenames in os.walk(objects_dir):
+                for name in filenames:
+                    if not name.endswith(".flac"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if keep and os.path.basename(path) == f"{keep}.flac":
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+audio_cache = AudioCache()
@@ -0,0 +1,38 @@
+"""Fill in derived data for videos stored before it existed.
+
+Embeddings (for ``/related`` and ``/search/semantic``) and duplicate
+signatures (for ``/duplicates`` and transcript reuse) are only computed when
+a video is written, so a library created before they were introduced has
+none. ``run_backfill`` computes whatever is missing, in batches; it runs in
+the background on startup (``BACKFILL_ON_STARTUP``) and can be run by hand:
+
+    python -m src.backfill [signatures] [embeddings]
+"""
+import argparse
+from typing import Optional
+
+STEPS = ("signatures", "embeddings")
+
+def run_backfill(steps=STEPS) -> dict:
+    from . import crud
+
+    done = {}
+    try:
+        if "signatures" in steps:
+            done["signatures"] = crud.backfill_signatures()
+        if "embeddings" in steps:
+            done["embeddings"] = crud.backfill_embeddings()
+    except Exception as e:
+        print(f"[Backfill] Failed: {e}")
+    if any(done.values()):
+        print(f"[Backfill] Done: {done}")
+    return done
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Compute derived data missing for existing videos.")
+    parser.add_argument("steps", nargs="*", choices=STEPS, help="What to backfill (default: everything)")
+    args = parser.parse_args(argv)
+    run_backfill(tuple(args.steps) or STEPS)
+
+if __name__ == "__main__":
+    main()
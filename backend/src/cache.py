@@ -0,0 +1,289 @@
+"""Versioned query-result cache.
+
+Cached results are keyed by normalized query parameters plus a global data
+version. Writes bump the version, so stale entries are never read again and
+simply age out. Entries live in an in-process LRU and, when configured, in a
+shared Redis-compatible store that also holds the version counter so every
+replica sees the same one.
+
+Without the shared store the version is per process, so a write handled by
+one worker does not invalidate another worker's entries. Memory-only entries
+therefore expire after ``CACHE_LOCAL_TTL_SECONDS``, which bounds how stale a
+result from another worker can be; run with ``CACHE_BACKEND=redis`` when
+several workers or replicas serve the app and results must be fresh.
+
+Settings:
+    CACHE_BACKEND      "memory" (default), "redis" or "none"
+    REDIS_URL          used when CACHE_BACKEND=redis
+    CACHE_TTL_SECONDS  expiry for shared entries (default 300)
+    CACHE_MAX_ENTRIES  size of the in-process LRU (default 256)
+    CACHE_LOCAL_TTL_SECONDS  expiry for entries when there is no shared store (default 5)
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from .serialization import dumps, loads
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_LOCAL_TTL_SECONDS = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "5"))
+
+VERSION_KEY = "summaryoutube:data_version"
+VERSION_TIME_KEY = "summaryoutube:data_version_at"
+
+class LRUBackend:
+    """Thread-safe in-process LRU store."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            item = self._data.get(key)
+            value = int(item[0] if item else 0) + 1
+            self._data[key] = (str(value), None)
+            self._data.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class FakeRedis:
+    """Minimal in-memory stand-in for a Redis client (get/set/incr with expiry)."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            if isinstance(value, str):
+                value = value.encode("utf-8")
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            value, expires_at = self._data.get(key, (b"0", None))
+            value = int(value) + 1
+            self._data[key] = (str(value).encode("utf-8"), expires_at)
+            return value
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+class RedisBackend:
+    """Shared store backed by a Redis-compatible client."""
+
+    def __init__(self, client=None, url: str = REDIS_URL):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None):
+        self.client.set(key, value, ex=ttl)
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+class QueryCache:
+    def __init__(
+        self,
+        local: Optional[LRUBackend] = None,
+        shared=None,
+        ttl: int = CACHE_TTL_SECONDS,
+        enabled: bool = True,
+        local_ttl: float = CACHE_LOCAL_TTL_SECONDS,
+    ):
+        self.local = local if local is not None else LRUBackend()
+        self.shared = shared
+        self.ttl = ttl
+        # 共有ストアがあれば版は全プロセス共通なので、ローカルの写しに期限は要らない
+        self.local_ttl = None if shared is not None else local_ttl
+        self.enabled = enabled
+        # 版番号の出どころ（共有ストアかこのプロセスか）。異なる出どころの版は比較できない
+        self.version_scope = "shared" if shared is not None else os.urandom(4).hex()
+        self.stats = {"hits": 0, "local_hits": 0, "shared_hits": 0, "misses": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def version(self) -> int:
+        if self.shared is not None:
+            try:
+                return int(self.shared.get(VERSION_KEY) or 0)
+            except Exception as e:
+                print(f"Cache version lookup failed: {e}")
+                self._count("errors")
+        return int(self.local.get(VERSION_KEY) or 0)
+
+    def version_token(self) -> str:
+        """The data version as ``"<scope>:<n>"``, comparable only with tokens of the same scope."""
+        return f"{self.version_scope}:{self.version()}"
+
+    def bump_version(self) -> int:
+        # 共有ストアに届かなくても、少なくともこのプロセスの古い結果は返さない
+        version = self.local.incr(VERSION_KEY)
+        now = str(time.time())
+        self.local.set(VERSION_TIME_KEY, now)
+        if self.shared is not None:
+            try:
+                version = self.shared.incr(VERSION_KEY)
+                self.shared.set(VERSION_TIME_KEY, now)
+            except Exception as e:
+                print(f"Cache version bump failed: {e}")
+                self._count("errors")
+        return version
+
+    def seconds_since_write(self) -> Optional[float]:
+        """Seconds since the last version bump seen by any replica of the app, if known."""
+        value = None
+        if self.shared is not None:
+            try:
+                value = self.shared.get(VERSION_TIME_KEY)
+            except Exception as e:
+                print(f"Cache version lookup failed: {e}")
+                self._count("errors")
+        if value is None:
+            value = self.local.get(VERSION_TIME_KEY)
+        return None if value is None else time.time() - float(value)
+
+    def _key(self, namespace: str, params: dict) -> str:
+        return f"summaryoutube:{namespace}:v{self.version()}:{json.dumps(params, sort_keys=True, ensure_ascii=False)}"
+
+    def _lookup(self, key: str) -> Optional[str]:
+        cached = self.local.get(key)
+        if cached is not None:
+            self._count("hits")
+            self._count("local_hits")
+            return cached
+        if self.shared is not None:
+            try:
+                cached = self.shared.get(key)
+            except Exception as e:
+                print(f"Cache lookup failed: {e}")
+                self._count("errors")
+                cached = None
+            if cached is not None:
+                self._count("hits")
+                self._count("shared_hits")
+                self.local.set(key, cached, ttl=self.local_ttl)
+                return cached
+        self._count("misses")
+        return None
+
+    def _store(self, key: str, encoded: str):
+        self.local.set(key, encoded, ttl=self.local_ttl)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, encoded, ttl=self.ttl)
+            except Exception as e:
+                print(f"Cache store failed: {e}")
+                self._count("errors")
+
+    def get_or_compute(self, namespace: str, params: dict, compute: Callable, store: bool = True):
+        """Return the cached JSON-serializable result for ``params``, computing it on a miss.
+
+        With ``store=False`` a computed result is returned without being cached.
+        """
+        if not self.enabled:
+            return compute()
+        key = self._key(namespace, params)
+        cached = self._lookup(key)
+        if cached is not None:
+            return loads(cached)
+        value = compute()
+        if store:
+            self._store(key, dumps(value).decode("utf-8"))
+        return value
+
+    def get_or_compute_encoded(self, namespace: str, params: dict, compute: Callable, store: bool = True) -> bytes:
+        """Like ``get_or_compute`` but returns the encoded JSON, so hits skip decoding and re-encoding."""
+        if not self.enabled:
+            return dumps(compute())
+        key = self._key(namespace, params)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached.encode("utf-8")
+        encoded = dumps(compute())
+        if store:
+            self._store(key, encoded.decode("utf-8"))
+        return encoded
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["version"] = self.version()
+        return stats
+
+def _create_cache() -> QueryCache:
+    if CACHE_BACKEND == "none":
+        return QueryCache(enabled=False)
+    if CACHE_BACKEND == "redis":
+        return QueryCache(shared=RedisBackend())
+    return QueryCache()
+
+query_cache = _create_cache()
+
+def normalize_search_params(title_query, tags_query, sort_by, sort_order, skip, limit, sortable) -> dict:
+    """Normalize search parameters so equivalent queries share a cache entry."""
+    # ILIKE は大文字小文字を区別せず、タグは AND 条件なので順序も区別しない
+    title = (title_query or "").strip().lower() or None
+    tags = sorted({tag.strip().lower() for tag in (tags_query or "").split(",") if tag.strip()}) or None
+    return {
+        "title_query": title,
+        "tags_query": tags,
+        "sort_by": sort_by if sort_by in sortable else "id",
+        "sort_order": "desc" if (sort_order or "").lower() == "desc" else "asc",
+        "skip": max(skip or 0, 0),
+        "limit": limit,
+    }
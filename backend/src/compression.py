@@ -0,0 +1,243 @@
+"""Negotiated response compression (zstd, brotli, gzip).
+
+The encoding is chosen from the client's ``Accept-Encoding`` (q-values are
+honoured, ties go to the server's preference order). gzip is always available;
+brotli and zstd are used when the ``brotli`` / ``zstandard`` packages are
+installed. Streaming responses are compressed chunk by chunk.
+
+Responses that carry an ``ETag`` (completed transcripts) have their compressed
+forms kept in a byte-bounded LRU keyed by ``(etag, encoding)``, so the same
+transcript is not recompressed on every view.
+
+Settings:
+    COMPRESSION_ENCODINGS         server preference order (default "zstd,br,gzip", empty disables)
+    COMPRESSION_MIN_SIZE          smallest body worth compressing in bytes (default 1024)
+    COMPRESSION_GZIP_LEVEL        1-9 (default 6)
+    COMPRESSION_BROTLI_QUALITY    0-11 (default 5)
+    COMPRESSION_ZSTD_LEVEL        1-22 (default 3)
+    COMPRESSION_CACHE_MAX_BYTES   size of the compressed-body cache (default 64 MiB)
+"""
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class _BrotliStream:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+def _compressobj(encoding: str):
+    """Return a streaming compressor with ``compress(data)`` and ``flush()``."""
+    if encoding == "gzip":
+        # wbits=31 で gzip ヘッダ付きの出力になる
+        return zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    if encoding == "br":
+        return _BrotliStream(COMPRESSION_BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressor = _compressobj(encoding)
+    return compressor.compress(data) + compressor.flush()
+
+def available_encodings(preferred=None) -> list:
+    installed = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [e for e in (COMPRESSION_ENCODINGS if preferred is None else preferred) if installed.get(e)]
+
+def choose_encoding(accept_encoding: Optional[str], available) -> Optional[str]:
+    """Pick the encoding to use for an ``Accept-Encoding`` header, or None for identity."""
+    if not accept_encoding or not available:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        # 同じ重みならサーバー側の優先順（先に並んでいる方）を採用する
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def make_etag(body: bytes) -> str:
+    # エンコーディングが違っても同じ表現として扱えるよう弱い ETag にする
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+class CompressedCache:
+    """Thread-safe LRU of compressed bodies, bounded by total size."""
+
+    def __init__(self, max_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0}
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get((etag, encoding))
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._data.move_to_end((etag, encoding))
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, etag: str, encoding: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop((etag, encoding), None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._data[(etag, encoding)] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "entries": len(self._data), "bytes": self.size}
+
+compressed_cache = CompressedCache()
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses compressible responses."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, encodings=None, cache: Optional[CompressedCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings(encodings)
+        self.cache = cache if cache is not None else compressed_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.cache)
+        await self.app(scope, receive, responder)
+
+class _CompressionResponder:
+    def __init__(self, send, encoding: str, minimum_size: int, cache: CompressedCache):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.start_message = None
+        self.compressor = None
+        self.passthrough = False
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers or self.start_message["status"] in (204, 304):
+            return False
+        return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = MutableHeaders(raw=message["headers"])
+            self.passthrough = not self._compressible(headers)
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=self.start_message["headers"])
+
+        if self.compressor is None:
+            if not more_body:
+                await self._send_whole(headers, body)
+                return
+            # ストリーミング応答は長さが分からないので、チャンクごとに圧縮して送る
+            self.compressor = _compressobj(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            del headers["Content-Length"]
+            await self.send(self.start_message)
+
+        data = self.compressor.compress(body) if body else b""
+        if not more_body:
+            data += self.compressor.flush()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _send_whole(self, headers: MutableHeaders, body: bytes):
+        headers.add_vary_header("Accept-Encoding")
+        if len(body) < self.minimum_size:
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+        etag = headers.get("etag")
+        compressed = self.cache.get(etag, self.encoding) if etag else None
+        if compressed is None:
+            compressed = compress(body, self.encoding)
+            if etag:
+                self.cache.set(etag, self.encoding, compressed)
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        await self.send(self.start_message)
+        await self.send({"type": "http.response.body", "body": compressed})
@@ -1,18 +1,46 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, func, or_, update, delete
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from . import models
-from .database import SessionLocal # Import SessionLocal for background tasks
+from . import models, recognition
+from .cache import query_cache, normalize_search_params
+from .serialization import dumps, rows_to_dicts, schema_columns
+from .database import SessionLocal, may_miss_recent_writes # Import SessionLocal for background tasks
+from .jobs import JobInterrupted, check_interrupted
 from .youtube_api import (
     extract_video_id,
-    get_youtube_video_details,
-    get_transcript_from_youtube,
-    get_high_quality_transcript
+    get_youtube_video_metadata,
+    get_caption_transcript,
+    get_high_quality_transcript,
+    prepare_audio,
+    AUTO_CAPTION_LANGUAGES,
+    AUTO_ACCEPT_GENERATED_CAPTIONS
+)
+
+# 近似重複の既存文字起こしがあれば、有料の高品質文字起こしを行わずに再利用する
+DEDUP_SKIP_PAID_TRANSCRIPTION = os.getenv("DEDUP_SKIP_PAID_TRANSCRIPTION", "true").lower() == "true"
+# 再利用してよい文字起こしの取得元（自動生成字幕は高品質の代わりにならない）
+REUSABLE_TRANSCRIPT_SOURCES = ("speech", "youtube_manual")
+# /bootstrap で最初に返す動画の件数
+BOOTSTRAP_PAGE_SIZE = int(os.getenv("BOOTSTRAP_PAGE_SIZE", "100"))
+
+# 音声の準備が済んだジョブの認識をまとめて投入し、1つのスレッドで結果を待つ
+# （コールバックはこの下で定義するので、呼び出し時に名前を解決する）
+recognition_scheduler = recognition.RecognitionScheduler(
+    on_submitted=lambda video_ids, operation_name: _record_recognition_submitted(video_ids, operation_name),
+    on_result=lambda video_id, transcript, error: finish_high_quality_transcription(video_id, transcript, error),
 )
 
 def run_high_quality_transcription(video_id: int):
-    """This function runs in the background to get the transcript."""
+    """This function runs in the background to get the transcript.
+
+    With the recognition scheduler (the default) it only prepares the audio and
+    queues it; ``finish_high_quality_transcription`` stores the result later.
+    """
     db = SessionLocal()
     try:
         print(f"[Background Task] Starting transcription for video_id: {video_id}")
@@ -25,36 +53,134 @@ def run_high_quality_transcription(video_id: int):
         if not video_id_yt:
             raise ValueError("Could not extract YouTube ID from URL")
 
-        transcript = get_high_quality_transcript(video_id_yt)
-        
-        if transcript is not None:
-            db_video.transcript = transcript
-            db_video.status = 'completed'
-            print(f"[Background Task] Transcription successful for video_id: {video_id}")
-        else:
-            raise ValueError("Transcription failed to produce a result.")
+        def save_checkpoint(stage, **data):
+            db_video.transcription_stage = stage
+            db_video.heartbeat_at = datetime.now(timezone.utc)
+            for field, value in data.items():
+                setattr(db_video, field, value)
+            db.commit()
+            # 停止処理中なら、保存したチェックポイントから他のレプリカに引き継ぐ
+            check_interrupted()
 
-        db.commit()
+        checkpoint = {
+            "stage": db_video.transcription_stage,
+            "audio_sha256": db_video.audio_sha256,
+            "gcs_uri": db_video.gcs_uri,
+            "operation_name": db_video.operation_name,
+        }
+        if recognition.RECOGNITION_BACKEND == "blocking":
+            transcript = get_high_quality_transcript(video_id_yt, checkpoint=checkpoint, on_checkpoint=save_checkpoint)
+            if transcript is None:
+                raise ValueError("Transcription failed to produce a result.")
+            finish_high_quality_transcription(video_id, transcript)
+            return
+
+        if db_video.operation_name:
+            # 投入済みの認識操作はスケジューラのポーリングに引き継ぐ
+            print(f"[Background Task] Resuming recognition operation for video_id: {video_id}")
+            if not recognition_scheduler.track(db_video.operation_name, {db_video.gcs_uri or f"video:{video_id}": video_id}):
+                raise JobInterrupted("Recognition scheduler has stopped")
+            return
+        check_interrupted()
+        _, flac_path, gcs_uri = prepare_audio(video_id_yt, checkpoint, save_checkpoint, job_id=video_id)
+        check_interrupted()
+        if not recognition_scheduler.enqueue(video_id, gcs_uri or flac_path):
+            raise JobInterrupted("Recognition scheduler has stopped")
+        print(f"[Background Task] Audio queued for recognition for video_id: {video_id}")
 
+    except JobInterrupted:
+        # チェックポイントは残したまま interrupted に戻し、他のレプリカに再開させる
+        db.rollback()
+        mark_transcriptions_interrupted([video_id])
+        print(f"[Background Task] Transcription interrupted for video_id: {video_id}")
     except Exception as e:
         db_video.status = 'failed'
         db_video.memo = f"Transcription failed: {str(e)}"
         print(f"[Background Task] Transcription failed for video_id: {video_id}. Error: {e}")
         db.commit()
+        invalidate_cache()
+    finally:
+        db.close()
+
+def _record_recognition_submitted(video_ids: List[int], operation_name: str):
+    db = SessionLocal()
+    try:
+        db.query(models.Video).filter(models.Video.id.in_(video_ids)).update(
+            {"transcription_stage": "submitted", "operation_name": operation_name},
+            synchronize_session=False,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def finish_high_quality_transcription(video_id: int, transcript: Optional[str], error: Optional[str] = None):
+    """Store the result of a high-quality transcription (or its failure) on the video."""
+    db = SessionLocal()
+    try:
+        db_video = get_video(db, video_id)
+        if not db_video:
+            print(f"[Background Task] Video not found: {video_id}")
+            return
+        if error is None and transcript is None:
+            error = "Transcription failed to produce a result."
+        db_video.operation_name = None
+        if error is None:
+            db_video.transcript = transcript
+            db_video.summary = summarize_transcript(transcript)
+            db_video.status = 'completed'
+            db_video.transcript_source = 'speech'
+            db_video.transcription_stage = 'completed'
+            flag_duplicate(db, db_video)
+            print(f"[Background Task] Transcription successful for video_id: {video_id}")
+        else:
+            db_video.status = 'failed'
+            db_video.memo = f"Transcription failed: {error}"
+            # 再試行時は変換・アップロード済みの音声から認識をやり直す
+            if db_video.transcription_stage == 'submitted':
+                db_video.transcription_stage = 'uploaded' if db_video.gcs_uri else 'converted'
+            print(f"[Background Task] Transcription failed for video_id: {video_id}. Error: {error}")
+        db.commit()
+        invalidate_cache()
+        if error is None:
+            index_video_embeddings([video_id])
+    finally:
+        db.close()
+
+def process_imported_videos(video_ids: List[int]):
+    """Fill in what a bulk import skips: summaries, duplicate signatures and embeddings."""
+    db = SessionLocal()
+    try:
+        for index, video_id in enumerate(video_ids, 1):
+            db_video = get_video(db, video_id)
+            if db_video and db_video.transcript:
+                if db_video.summary is None:
+                    db_video.summary = summarize_transcript(db_video.transcript)
+                flag_duplicate(db, db_video)
+            if index % 100 == 0:
+                db.commit()
+        db.commit()
+        invalidate_cache()
     finally:
         db.close()
+    index_video_embeddings(video_ids)
+
+def summarize_transcript(transcript: Optional[str]) -> Optional[str]:
+    # numpy/scipy の読み込みを起動時ではなく初回の要約まで遅らせる
+    from .summarizer import summarize
+
+    # 要約に失敗しても文字起こし自体は保存する
+    try:
+        return summarize(transcript)
+    except Exception as e:
+        print(f"Summarization failed: {e}")
+        return None
 
 def get_video(db: Session, video_id: int) -> Optional[models.Video]:
     return db.query(models.Video).filter(models.Video.id == video_id).first()
 
-def search_videos(
-    db: Session, 
-    title_query: Optional[str] = None, 
-    tags_query: Optional[str] = None, 
-    sort_by: str = "id", 
-    sort_order: str = "asc"
-) -> List[models.Video]:
-    query = db.query(models.Video)
+def _filter_videos(query, title_query: Optional[str] = None, tags_query: Optional[str] = None, channel_id: Optional[str] = None):
+    if channel_id:
+        query = query.filter(models.Video.channel_id == channel_id)
 
     if title_query:
         query = query.filter(models.Video.title.ilike(f"%{title_query}%"))
@@ -63,45 +189,172 @@ def search_videos(
         tags = [tag.strip() for tag in tags_query.split(',') if tag.strip()]
         for tag in tags:
             query = query.filter(models.Video.tags.ilike(f"%{tag}%"))
+    return query
+
+def search_videos(
+    db: Session, 
+    title_query: Optional[str] = None, 
+    tags_query: Optional[str] = None, 
+    sort_by: str = "id", 
+    sort_order: str = "asc",
+    channel_id: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> List[models.Video]:
+    query = _filter_videos(db.query(models.Video), title_query, tags_query, channel_id)
+    return _order_and_page(query, sort_by, sort_order, skip, limit).all()
 
-    sort_column = getattr(models.Video, sort_by, models.Video.id)
+def _order_and_page(query, sort_by: str, sort_order: str, skip: int = 0, limit: Optional[int] = None):
+    # インデックスのない列での全件ソートを防ぐため、ホワイトリスト外は id で並べる
+    sort_column = models.SORTABLE_COLUMNS.get(sort_by, models.Video.id)
     if sort_order.lower() == "desc":
         query = query.order_by(sort_column.desc())
     else:
         query = query.order_by(sort_column.asc())
-    
-    return query.all()
 
-def create_video(db: Session, video: models.VideoCreate) -> models.Video:
+    if skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+# レスポンス用の列（ORMオブジェクトを作らずタプルで取得する）
+LIST_FIELDS = schema_columns(models.VideoListSchema, models.Video)
+DETAIL_FIELDS = schema_columns(models.VideoSchema, models.Video)
+
+def _select_fields(db: Session, fields):
+    return db.query(*[column for _, column in fields if column is not None])
+
+def search_video_rows(
+    db: Session,
+    title_query: Optional[str] = None,
+    tags_query: Optional[str] = None,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    channel_id: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    batch_size: Optional[int] = None
+):
+    """Like ``search_videos`` but yields response dicts built from column tuples."""
+    query = _filter_videos(_select_fields(db, LIST_FIELDS), title_query, tags_query, channel_id)
+    query = _order_and_page(query, sort_by, sort_order, skip, limit)
+    if batch_size:
+        query = query.yield_per(batch_size)
+    return rows_to_dicts(query, LIST_FIELDS)
+
+def get_video_dict(db: Session, video_id: int) -> Optional[dict]:
+    row = _select_fields(db, DETAIL_FIELDS).filter(models.Video.id == video_id).first()
+    if row is None:
+        return None
+    return next(rows_to_dicts([row], DETAIL_FIELDS))
+
+def get_video_json(db: Session, video_id: int) -> Optional[bytes]:
+    video = get_video_dict(db, video_id)
+    return None if video is None else dumps(video)
+
+def search_videos_cached(
+    db: Session,
+    title_query: Optional[str] = None,
+    tags_query: Optional[str] = None,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> bytes:
+    """Return the search result as encoded JSON, served from the query cache when possible."""
+    params = normalize_search_params(title_query, tags_query, sort_by, sort_order, skip, limit, models.SORTABLE_COLUMNS)
+
+    def compute():
+        return list(search_video_rows(
+            db,
+            params["title_query"],
+            ",".join(params["tags_query"] or []),
+            params["sort_by"],
+            params["sort_order"],
+            skip=params["skip"],
+            limit=params["limit"],
+        ))
+
+    return query_cache.get_or_compute_encoded("videos", params, compute, store=not may_miss_recent_writes(db))
+
+def create_video(db: Session, video: models.VideoCreate, admit: Optional[Callable[[], None]] = None) -> models.Video:
+    """Add a video; ``admit()`` is called before inserting a row that needs paid transcription.
+
+    ``admit`` raises (e.g. 429 from the job executor) to refuse the job
+    before anything is written.
+    """
     video_id_yt = extract_video_id(video.url)
     if not video_id_yt:
         raise HTTPException(status_code=400, detail="Invalid YouTube URL")
 
-    title, channel_name = get_youtube_video_details(video_id_yt)
-    if not title or not channel_name:
+    metadata = get_youtube_video_metadata(video_id_yt)
+    if not metadata:
         raise HTTPException(status_code=500, detail="Could not retrieve video details from YouTube API.")
+    channel = upsert_channel(db, metadata["channel_id"], metadata["channel_name"])
 
     transcript = None
+    transcript_source = None
     status = 'completed' # Default status
+    # 自動生成字幕も候補にして探したか（見つからなければ重複検出の手がかりもない）
+    searched_generated = False
 
     if video.transcriptionOption == 'standard':
-        transcript = get_transcript_from_youtube(video_id_yt)
+        transcript, transcript_source = get_caption_transcript(video_id_yt, accept_generated=True)
     elif video.transcriptionOption == 'high_quality':
         # Set status to processing, transcript will be fetched in the background
         status = 'processing'
+    elif video.transcriptionOption == 'auto':
+        # 条件を満たす字幕があればそれを使い、なければ高品質文字起こしに回す
+        transcript, transcript_source = get_caption_transcript(
+            video_id_yt,
+            languages=AUTO_CAPTION_LANGUAGES,
+            accept_generated=AUTO_ACCEPT_GENERATED_CAPTIONS,
+        )
+        searched_generated = AUTO_ACCEPT_GENERATED_CAPTIONS
+        if transcript is None:
+            status = 'processing'
+
+    summary = None
+    duplicate_of = None
+    if (status == 'processing' and not searched_generated and DEDUP_SKIP_PAID_TRANSCRIPTION
+            and db.query(models.VideoSignature.video_id).first()):
+        # 自動生成字幕を手がかりに、同じ内容の完了済み文字起こしを探す。
+        # auto で自動生成字幕まで探して見つからなかった場合は取り直さない
+        probe_text, _ = get_caption_transcript(video_id_yt, accept_generated=True)
+        original = find_reusable_transcript(db, probe_text, metadata["duration_seconds"])
+        if original is not None:
+            print(f"Reusing transcript of near-duplicate video {original.id} for {video.url}")
+            transcript, transcript_source, summary = original.transcript, original.transcript_source, original.summary
+            duplicate_of = original.id
+            status = 'completed'
+
+    if status == 'processing' and admit is not None:
+        admit()
+    heartbeat_at = datetime.now(timezone.utc) if status == 'processing' else None
 
     db_video = models.Video(
         url=video.url,
-        title=title,
-        channel_name=channel_name,
+        title=metadata["title"],
+        channel_name=metadata["channel_name"],
+        channel_id=channel.id if channel else None,
+        duration_seconds=metadata["duration_seconds"],
         tags=video.tags,
         memo=video.memo,
         transcript=transcript,
-        status=status
+        transcript_source=transcript_source,
+        summary=summary if summary is not None else summarize_transcript(transcript),
+        duplicate_of=duplicate_of,
+        status=status,
+        heartbeat_at=heartbeat_at,
     )
     
     db.add(db_video)
+    db.flush()
+    if transcript:
+        flag_duplicate(db, db_video)
     db.commit()
+    invalidate_cache()
     db.refresh(db_video)
     return db_video
 
@@ -114,37 +367,596 @@ def update_video(db: Session, video_id: int, video: models.VideoUpdate) -> Optio
         video_id_yt = extract_video_id(video.url)
         if not video_id_yt:
             raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-        title, channel_name = get_youtube_video_details(video_id_yt)
-        if not title or not channel_name:
+        metadata = get_youtube_video_metadata(video_id_yt)
+        if not metadata:
             raise HTTPException(status_code=500, detail="Could not retrieve video details.")
-        db_video.title = title
-        db_video.channel_name = channel_name
+        channel = upsert_channel(db, metadata["channel_id"], metadata["channel_name"])
+        db_video.title = metadata["title"]
+        db_video.channel_name = metadata["channel_name"]
+        db_video.channel_id = channel.id if channel else None
+        db_video.duration_seconds = metadata["duration_seconds"]
     
     db_video.url = video.url
     db_video.tags = video.tags
     db_video.memo = video.memo
 
     db.commit()
+    invalidate_cache()
     db.refresh(db_video)
     return db_video
 
+def _delete_video_dependents(db: Session, ids: List[int]):
+    # SQLite では外部キーの ON DELETE が効かないため明示的に消す
+    db.execute(delete(models.VideoEmbedding).where(models.VideoEmbedding.video_id.in_(ids)))
+    db.execute(delete(models.VideoLSHBand).where(models.VideoLSHBand.video_id.in_(ids)))
+    db.execute(delete(models.VideoSignature).where(models.VideoSignature.video_id.in_(ids)))
+    db.execute(
+        update(models.Video)
+        .where(models.Video.duplicate_of.in_(ids))
+        .values(duplicate_of=None)
+        .execution_options(synchronize_session=False)
+    )
+
 def delete_video(db: Session, video_id: int) -> Optional[models.Video]:
+    from . import embeddings
+
     db_video = get_video(db, video_id)
     if not db_video:
         return None
     
+    _delete_video_dependents(db, [video_id])
     db.delete(db_video)
     db.commit()
+    invalidate_cache()
+    embeddings.index.remove([video_id])
     return db_video
 
-def get_all_tags(db: Session) -> List[str]:
+def get_tag_counts(db: Session) -> List[dict]:
+    """Every tag with the number of videos carrying it, sorted by name."""
     results = db.query(models.Video.tags).filter(models.Video.tags.isnot(None)).all()
-    all_tags = set()
+    counts = Counter()
     for row in results:
         if row[0]:
-            tags = [tag.strip() for tag in row[0].split(',') if tag.strip()]
-            all_tags.update(tags)
-    return sorted(list(all_tags))
+            counts.update(set(_split_tags(row[0])))
+    return [{"name": tag, "count": counts[tag]} for tag in sorted(counts)]
+
+def get_all_tags(db: Session) -> List[str]:
+    return [tag["name"] for tag in get_tag_counts(db)]
+
+def get_all_tags_cached(db: Session) -> List[str]:
+    return query_cache.get_or_compute("tags", {}, lambda: get_all_tags(db), store=not may_miss_recent_writes(db))
+
+def get_tag_counts_cached(db: Session) -> List[dict]:
+    return query_cache.get_or_compute("tag_counts", {}, lambda: get_tag_counts(db), store=not may_miss_recent_writes(db))
+
+def _begin_snapshot(db: Session):
+    # 一覧とタグを同じスナップショットから読む。PostgreSQL は READ COMMITTED だと
+    # 文ごとに見える内容が変わるので、読み取り専用の REPEATABLE READ で始める
+    if db.get_bind().dialect.name == "postgresql" and not db.in_transaction():
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True})
+
+def get_bootstrap(db: Session, sort_by: str = "id", sort_order: str = "asc", limit: int = BOOTSTRAP_PAGE_SIZE) -> bytes:
+    """First page of the list, tag counts and the data version as one encoded JSON document.
+
+    Both parts are read in one session and snapshot, and cached per data version.
+    """
+    params = normalize_search_params(None, None, sort_by, sort_order, 0, limit, models.SORTABLE_COLUMNS)
+
+    def compute():
+        # 読み取り前の版を返す（途中で更新されても、クライアントは古い版として再取得できる）
+        version = query_cache.version_token()
+        _begin_snapshot(db)
+        videos = list(search_video_rows(db, sort_by=params["sort_by"], sort_order=params["sort_order"], limit=limit + 1))
+        return {
+            "version": version,
+            "videos": videos[:limit],
+            "has_more": len(videos) > limit,
+            "tags": get_tag_counts(db),
+        }
+
+    return query_cache.get_or_compute_encoded("bootstrap", params, compute, store=not may_miss_recent_writes(db))
+
+def get_list_delta(db: Session, upserted: List[int] = (), removed: List[int] = ()) -> dict:
+    """What a mutation changed in the list view, so the client can patch it instead of refetching."""
+    rows = _select_fields(db, LIST_FIELDS).filter(models.Video.id.in_(upserted)) if upserted else []
+    return {
+        "version": query_cache.version_token(),
+        "upserted": list(rows_to_dicts(rows, LIST_FIELDS)),
+        "removed": list(removed),
+        "tags": get_tag_counts_cached(db),
+    }
+
+def invalidate_cache():
+    """Bump the data version so cached search and tag results are no longer served."""
+    query_cache.bump_version()
+
+def upsert_channel(db: Session, channel_id: Optional[str], title: str) -> Optional[models.Channel]:
+    """Create or refresh the cached channel row. The caller commits."""
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    if not channel_id:
+        return None
+    # 同じチャンネルの動画が同時に登録されても主キー違反にならないよう、1文で INSERT ... ON CONFLICT する
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = insert(models.Channel).values(id=channel_id, title=title)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.Channel.id],
+        set_={"title": stmt.excluded.title, "updated_at": func.now()},
+        where=models.Channel.title != stmt.excluded.title,
+    ))
+    return db.get(models.Channel, channel_id, populate_existing=True)
+
+def _channel_stats_query(db: Session):
+    video_count = func.count(models.Video.id)
+    return (
+        db.query(
+            models.Channel,
+            video_count.label("video_count"),
+            func.coalesce(func.sum(models.Video.duration_seconds), 0).label("total_duration_seconds"),
+            func.count(models.Video.transcript).label("transcript_count"),
+        )
+        .outerjoin(models.Video, models.Video.channel_id == models.Channel.id)
+        .group_by(models.Channel.id)
+    )
+
+def _channel_stats_to_dict(row) -> dict:
+    channel, video_count, total_duration, transcript_count = row
+    return {
+        "id": channel.id,
+        "title": channel.title,
+        "video_count": video_count,
+        "total_duration_seconds": int(total_duration or 0),
+        "transcript_count": transcript_count,
+        "transcript_coverage": (transcript_count / video_count) if video_count else 0.0,
+        "updated_at": channel.updated_at,
+    }
+
+def get_channels(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+    rows = _channel_stats_query(db).order_by(models.Channel.title).offset(skip).limit(limit).all()
+    return [_channel_stats_to_dict(row) for row in rows]
+
+def get_channel(db: Session, channel_id: str) -> Optional[dict]:
+    row = _channel_stats_query(db).filter(models.Channel.id == channel_id).first()
+    return _channel_stats_to_dict(row) if row else None
+
+def index_video_embeddings(video_ids: List[int]):
+    """Embed videos and store their vectors. Runs in the background, off the request path."""
+    from . import embeddings
+
+    db = SessionLocal()
+    try:
+        for start in range(0, len(video_ids), embeddings.EMBEDDING_BATCH_SIZE):
+            batch = video_ids[start:start + embeddings.EMBEDDING_BATCH_SIZE]
+            rows = db.query(
+                models.Video.id, models.Video.title, models.Video.tags,
+                models.Video.summary, models.Video.transcript,
+            ).filter(models.Video.id.in_(batch)).all()
+            if not rows:
+                continue
+            vectors = embeddings.embed_texts([
+                embeddings.video_text(row.title, row.tags, row.summary, row.transcript) for row in rows
+            ])
+            for row, vector in zip(rows, vectors):
+                db.merge(models.VideoEmbedding(
+                    video_id=row.id,
+                    model=embeddings.model_name(),
+                    dim=len(vector),
+                    vector=embeddings.to_bytes(vector),
+                ))
+            db.commit()
+            embeddings.index.upsert([row.id for row in rows], vectors)
+    except Exception as e:
+        db.rollback()
+        print(f"[Background Task] Embedding failed for video_ids: {video_ids}. Error: {e}")
+    finally:
+        db.close()
+
+def backfill_embeddings(batch_size: int = 500) -> int:
+    """Embed every video that has no embedding for the current model. Returns how many were embedded."""
+    from . import embeddings
+
+    total = 0
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            ids = [row.id for row in db.query(models.Video.id)
+                   .outerjoin(models.VideoEmbedding, and_(
+                       models.VideoEmbedding.video_id == models.Video.id,
+                       models.VideoEmbedding.model == embeddings.model_name(),
+                   ))
+                   .filter(models.VideoEmbedding.video_id.is_(None), models.Video.id > last_id)
+                   .order_by(models.Video.id).limit(batch_size)]
+        finally:
+            db.close()
+        if not ids:
+            break
+        index_video_embeddings(ids)
+        total += len(ids)
+        last_id = ids[-1]
+        print(f"[Backfill] Embedded {total} videos")
+    return total
+
+def backfill_signatures(batch_size: int = 500) -> int:
+    """Index every transcript that has no duplicate signature yet. Returns how many videos were checked."""
+    total = 0
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            videos = (db.query(models.Video)
+                      .outerjoin(models.VideoSignature, models.VideoSignature.video_id == models.Video.id)
+                      .filter(models.VideoSignature.video_id.is_(None), models.Video.transcript.isnot(None),
+                              models.Video.id > last_id)
+                      .order_by(models.Video.id).limit(batch_size).all())
+            if not videos:
+                break
+            # ID 順に処理するので、古い動画が重複元になる
+            for db_video in videos:
+                flag_duplicate(db, db_video)
+            db.commit()
+            total += len(videos)
+            last_id = videos[-1].id
+        finally:
+            db.close()
+        print(f"[Backfill] Checked signatures of {total} videos")
+    if total:
+        invalidate_cache()
+    return total
+
+def _scored_videos(db: Session, results) -> List[dict]:
+    ids = [video_id for video_id, _ in results]
+    rows = _select_fields(db, LIST_FIELDS).filter(models.Video.id.in_(ids)) if ids else []
+    videos = {video["id"]: video for video in rows_to_dicts(rows, LIST_FIELDS)}
+    # 削除済みの動画は結果から除く
+    return [{**videos[video_id], "score": score} for video_id, score in results if video_id in videos]
+
+def get_related_videos(db: Session, video_id: int, limit: int = 10) -> Optional[List[dict]]:
+    from . import embeddings
+
+    if get_video(db, video_id) is None:
+        return None
+    # インデックスはバックグラウンドで読み込む（embeddings.start_index_refresher）
+    vector = embeddings.index.get(video_id)
+    if vector is None:
+        row = db.get(models.VideoEmbedding, video_id)
+        if row is None or row.model != embeddings.model_name():
+            return []
+        vector = embeddings.from_bytes(row.vector)
+    return _scored_videos(db, embeddings.index.search(vector, limit, exclude=video_id))
+
+def semantic_search(db: Session, q: str, limit: int = 10) -> List[dict]:
+    from . import embeddings
+
+    vector = embeddings.embed_texts([q])[0]
+    return _scored_videos(db, embeddings.index.search(vector, limit))
+
+def index_video_signature(db: Session, video_id: int, transcript: Optional[str]):
+    """Store the MinHash signature and LSH buckets of a transcript (caller commits). Returns the signature."""
+    from . import dedup
+
+    db.query(models.VideoLSHBand).filter(models.VideoLSHBand.video_id == video_id).delete(synchronize_session=False)
+    db.query(models.VideoSignature).filter(models.VideoSignature.video_id == video_id).delete(synchronize_session=False)
+    sig = dedup.signature(transcript)
+    if sig is None:
+        return None
+    db.add(models.VideoSignature(video_id=video_id, num_perm=len(sig), signature=dedup.to_bytes(sig)))
+    db.add_all([
+        models.VideoLSHBand(video_id=video_id, band=band, bucket=bucket)
+        for band, bucket in enumerate(dedup.band_buckets(sig))
+    ])
+    return sig
+
+def find_duplicates(db: Session, sig, exclude: Optional[int] = None, min_similarity: Optional[float] = None, limit: int = 10) -> List[Tuple[int, float]]:
+    """``(video_id, similarity)`` of near-duplicates of a signature, most similar first.
+
+    Candidates come from an indexed ``(band, bucket)`` lookup, so the cost
+    depends on the number of matches, not on the number of videos.
+    """
+    from . import dedup
+
+    if min_similarity is None:
+        min_similarity = dedup.DEDUP_THRESHOLD
+    buckets = dedup.band_buckets(sig)
+    candidates = db.query(models.VideoLSHBand.video_id).filter(or_(*[
+        and_(models.VideoLSHBand.band == band, models.VideoLSHBand.bucket == bucket)
+        for band, bucket in enumerate(buckets)
+    ]))
+    if exclude is not None:
+        candidates = candidates.filter(models.VideoLSHBand.video_id != exclude)
+    rows = db.query(models.VideoSignature.video_id, models.VideoSignature.signature).filter(
+        models.VideoSignature.video_id.in_(candidates.distinct().scalar_subquery()),
+        models.VideoSignature.num_perm == len(sig),
+    )
+    scored = [(video_id, dedup.similarity(sig, dedup.from_bytes(data))) for video_id, data in rows]
+    # 同程度に似ているなら古い（ID の小さい）動画を優先する
+    scored = sorted((item for item in scored if item[1] >= min_similarity), key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+def _original_of(db: Session, video_id: int) -> int:
+    duplicate_of = db.query(models.Video.duplicate_of).filter(models.Video.id == video_id).scalar()
+    return duplicate_of or video_id
+
+def flag_duplicate(db: Session, db_video: models.Video):
+    """Index ``db_video``'s transcript and point ``duplicate_of`` at the original it nearly matches."""
+    sig = index_video_signature(db, db_video.id, db_video.transcript)
+    if sig is None:
+        return
+    matches = find_duplicates(db, sig, exclude=db_video.id, limit=1)
+    if matches:
+        db_video.duplicate_of = _original_of(db, matches[0][0])
+
+def find_reusable_transcript(db: Session, probe_text: Optional[str], duration_seconds: Optional[int] = None) -> Optional[models.Video]:
+    """A completed video whose transcript nearly matches ``probe_text`` (e.g. auto-generated captions).
+
+    The probe threshold is low, so a clip would also match its full source;
+    candidates whose transcript length or duration differs by more than
+    ``DEDUP_MIN_LENGTH_RATIO`` are skipped.
+    """
+    from . import dedup
+
+    sig = dedup.signature(probe_text)
+    if sig is None:
+        return None
+    probe_length = len(dedup.normalize(probe_text))
+    for video_id, _ in find_duplicates(db, sig, min_similarity=dedup.DEDUP_PROBE_THRESHOLD):
+        video = get_video(db, _original_of(db, video_id))
+        if not (video and video.status == 'completed' and video.transcript and video.transcript_source in REUSABLE_TRANSCRIPT_SOURCES):
+            continue
+        if dedup.length_ratio(probe_length, len(dedup.normalize(video.transcript))) < dedup.DEDUP_MIN_LENGTH_RATIO:
+            continue
+        if (duration_seconds and video.duration_seconds
+                and dedup.length_ratio(duration_seconds, video.duration_seconds) < dedup.DEDUP_MIN_LENGTH_RATIO):
+            continue
+        return video
+    return None
+
+def get_duplicate_videos(db: Session, video_id: int, limit: int = 10) -> Optional[List[dict]]:
+    from . import dedup
+
+    db_video = get_video(db, video_id)
+    if db_video is None:
+        return None
+    row = db.get(models.VideoSignature, video_id)
+    if row is not None:
+        sig = dedup.from_bytes(row.signature)
+    else:
+        # 署名がまだない動画はその場で計算するだけで保存しない（保存は backfill_signatures で行う）
+        sig = dedup.signature(db_video.transcript)
+        if sig is None:
+            return []
+    matches = dict(find_duplicates(db, sig, exclude=video_id, limit=limit))
+    rows = _select_fields(db, LIST_FIELDS).filter(models.Video.id.in_(matches)) if matches else []
+    results = [{**video, "similarity": matches[video["id"]]} for video in rows_to_dicts(rows, LIST_FIELDS)]
+    return sorted(results, key=lambda video: (-video["similarity"], video["id"]))
+
+def transcription_state(row) -> dict:
+    """The columns ``request_transcription`` overwrites, for ``mark_transcription_rejected`` to restore."""
+    return {"status": row.status, "transcription_stage": row.transcription_stage, "operation_name": row.operation_name}
+
+def request_transcription(db: Session, video_id: int) -> Optional[models.Video]:
+    """Mark a video for (re-)transcription. Checkpoints from a failed attempt are kept so it resumes."""
+    db_video = get_video(db, video_id)
+    if not db_video:
+        return None
+    values = {"status": 'processing', "heartbeat_at": datetime.now(timezone.utc)}
+    if db_video.transcription_stage == 'completed':
+        # 完了済みの文字起こしをやり直す場合は最初から実行する
+        values.update(transcription_stage=None, operation_name=None)
+    # 状態の確認と更新を1文で行い、同時に来た依頼の片方だけが processing にできるようにする
+    result = db.execute(
+        update(models.Video)
+        .where(models.Video.id == video_id, models.Video.status != 'processing')
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Transcription already in progress")
+    db.commit()
+    invalidate_cache()
+    db.refresh(db_video)
+    return db_video
+
+def _select_batch(db: Session, selection: models.VideoSelection, *columns, for_update: bool = False):
+    """Fetch the targeted rows and the requested IDs that do not exist.
+
+    With ``for_update`` the rows stay locked until the caller commits, so a
+    read-modify-write cannot lose a concurrent update (no-op on SQLite).
+    """
+    if not selection.ids and not selection.title_query and not selection.tags_query:
+        raise HTTPException(status_code=400, detail="Specify ids or a search filter")
+    query = _filter_videos(db.query(models.Video.id, *columns), selection.title_query, selection.tags_query)
+    if selection.ids:
+        query = query.filter(models.Video.id.in_(selection.ids))
+    if for_update:
+        query = query.with_for_update(of=models.Video)
+    rows = query.order_by(models.Video.id).all()
+    found = {row.id for row in rows}
+    missing = [video_id for video_id in dict.fromkeys(selection.ids or []) if video_id not in found]
+    return rows, missing
+
+def _split_tags(tags: Optional[str]) -> List[str]:
+    return [tag.strip() for tag in (tags or "").split(',') if tag.strip()]
+
+def batch_update_tags(db: Session, selection: models.VideoSelection, add: List[str], remove: List[str]) -> List[dict]:
+    rows, missing = _select_batch(db, selection, models.Video.tags, for_update=True)
+    add = [tag.strip() for tag in add if tag.strip()]
+    remove = {tag.strip() for tag in remove if tag.strip()}
+    now = datetime.now(timezone.utc)
+
+    results, mappings = [], []
+    for row in rows:
+        current = _split_tags(row.tags)
+        updated = [tag for tag in dict.fromkeys(current + add) if tag not in remove]
+        if updated == current:
+            results.append({"id": row.id, "status": "unchanged"})
+            continue
+        mappings.append({"id": row.id, "tags": ",".join(updated) or None, "updated_at": now})
+        results.append({"id": row.id, "status": "updated"})
+
+    if mappings:
+        # 主キー指定の一括UPDATEを1トランザクションで実行する
+        db.execute(update(models.Video), mappings)
+        db.commit()
+        invalidate_cache()
+    else:
+        db.rollback()  # 行ロックを解放する
+    return results + [{"id": video_id, "status": "not_found"} for video_id in missing]
+
+def batch_delete_videos(db: Session, selection: models.VideoSelection) -> List[dict]:
+    from . import embeddings
+
+    rows, missing = _select_batch(db, selection)
+    ids = [row.id for row in rows]
+    if ids:
+        _delete_video_dependents(db, ids)
+        db.execute(delete(models.Video).where(models.Video.id.in_(ids)))
+        db.commit()
+        invalidate_cache()
+        embeddings.index.remove(ids)
+    return [{"id": video_id, "status": "deleted"} for video_id in ids] + \
+        [{"id": video_id, "status": "not_found"} for video_id in missing]
+
+def batch_request_transcription(db: Session, selection: models.VideoSelection, limit: Optional[int] = None) -> Tuple[List[dict], Dict[int, dict]]:
+    """Mark videos for (re-)transcription in one statement.
+
+    Returns per-item results and ``{video_id: transcription_state}`` of the
+    queued videos as they were before. At most ``limit`` videos are queued;
+    the rest are reported as ``rejected``.
+    """
+    rows, missing = _select_batch(
+        db, selection, models.Video.status, models.Video.transcription_stage, models.Video.operation_name,
+    )
+    results, queued = [], {}
+    for row in rows:
+        if row.status == 'processing':
+            results.append({"id": row.id, "status": "skipped", "detail": "Transcription already in progress"})
+        elif limit is not None and len(queued) >= limit:
+            results.append({"id": row.id, "status": "rejected", "detail": "Transcription queue is full"})
+        else:
+            queued[row.id] = transcription_state(row)
+            results.append({"id": row.id, "status": "queued"})
+
+    if queued:
+        # 読んだ後に他の依頼が processing にした行は書き換えない。実際に更新できた行だけをキューに入れる
+        claimed = set(db.execute(
+            update(models.Video)
+            .where(models.Video.id.in_(queued), models.Video.status != 'processing')
+            .values(status='processing', heartbeat_at=datetime.now(timezone.utc))
+            .returning(models.Video.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+        if claimed:
+            # 完了済みの文字起こしは最初からやり直し、失敗したものはチェックポイントから再開する
+            db.execute(
+                update(models.Video)
+                .where(models.Video.id.in_(claimed), models.Video.transcription_stage == 'completed')
+                .values(transcription_stage=None, operation_name=None)
+                .execution_options(synchronize_session=False)
+            )
+        db.commit()
+        invalidate_cache()
+        results = [
+            {"id": r["id"], "status": "skipped", "detail": "Transcription already in progress"}
+            if r["status"] == "queued" and r["id"] not in claimed else r
+            for r in results
+        ]
+        queued = {video_id: state for video_id, state in queued.items() if video_id in claimed}
+    return results + [{"id": video_id, "status": "not_found"} for video_id in missing], queued
+
+def mark_transcription_rejected(db: Session, video_id: int, previous: dict):
+    """Undo ``processing`` for a job the queue turned away, restoring ``previous`` (see ``transcription_state``).
+
+    A completed video whose re-transcription was turned away stays completed.
+    """
+    db.execute(
+        update(models.Video)
+        .where(models.Video.id == video_id, models.Video.status == 'processing')
+        .values(**previous)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    invalidate_cache()
+
+def mark_transcriptions_interrupted(video_ids: List[int]) -> List[int]:
+    """Hand unfinished jobs back on shutdown. Checkpoints are kept so the resumed job skips finished stages."""
+    if not video_ids:
+        return []
+    db = SessionLocal()
+    try:
+        interrupted = [row.id for row in db.query(models.Video.id).filter(
+            models.Video.id.in_(video_ids), models.Video.status == 'processing'
+        )]
+        if interrupted:
+            db.execute(
+                update(models.Video)
+                .where(models.Video.id.in_(interrupted), models.Video.status == 'processing')
+                .values(status='interrupted')
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            invalidate_cache()
+        return interrupted
+    finally:
+        db.close()
+
+def heartbeat_transcriptions(video_ids: List[int]):
+    """Renew the lease on processing jobs this replica still owns."""
+    if not video_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(models.Video)
+            .where(models.Video.id.in_(video_ids), models.Video.status == 'processing')
+            # 一覧の並び順や差分に影響しないよう updated_at は据え置く
+            .values(heartbeat_at=datetime.now(timezone.utc), updated_at=models.Video.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def claim_interrupted_transcriptions(limit: int, lease_seconds: Optional[float] = None) -> List[int]:
+    """Take over up to ``limit`` unfinished jobs (from any replica) and mark them processing again.
+
+    Besides ``interrupted`` rows this claims ``processing`` rows whose
+    heartbeat is older than ``lease_seconds``: their replica stopped without
+    handing them back. Rows without a heartbeat (written by a replica that
+    predates it) count as expired only once ``updated_at`` is that old too.
+    """
+    now = datetime.now(timezone.utc)
+    claimable = models.Video.status == 'interrupted'
+    if lease_seconds is not None:
+        cutoff = now - timedelta(seconds=lease_seconds)
+        expired = or_(
+            models.Video.heartbeat_at < cutoff,
+            and_(models.Video.heartbeat_at.is_(None), models.Video.updated_at < cutoff),
+        )
+        claimable = or_(claimable, and_(models.Video.status == 'processing', expired))
+    db = SessionLocal()
+    try:
+        candidates = [row.id for row in db.query(models.Video.id)
+                      .filter(models.Video.status.in_(('processing', 'interrupted')), claimable)
+                      .order_by(models.Video.heartbeat_at.asc().nullsfirst(), models.Video.id).limit(limit)]
+        claimed = []
+        for video_id in candidates:
+            # 複数のレプリカが同時に再開しても、状態を書き換えられた1つだけが引き受ける
+            result = db.execute(
+                update(models.Video)
+                .where(models.Video.id == video_id, claimable)
+                .values(status='processing', heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if result.rowcount:
+                claimed.append(video_id)
+        if claimed:
+            invalidate_cache()
+        return claimed
+    finally:
+        db.close()
 
 def get_or_create_transcript(db: Session, video_id: int) -> dict:
     db_video = get_video(db, video_id)
@@ -152,4 +964,4 @@ def get_or_create_transcript(db: Session, video_id: int) -> dict:
         raise HTTPException(status_code=404, detail="Video not found")
 
     # This endpoint now simply returns the current state
-    return {"transcript": db_video.transcript, "status": db_video.status}
\ No newline at end of file
+    return {"transcript": db_video.transcript, "status": db_video.status}
@@ -1,10 +1,32 @@
+import itertools
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from starlette.responses import Response
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/mydatabase")
 
+# 読み取り専用エンドポイントはレプリカに振り分ける（カンマ区切り、未設定ならプライマリのみ）
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# この秒数を超えて遅れているレプリカは使わない
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# 遅延の計測結果を使い回す秒数
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "2"))
+# 更新したクライアントの読み取りをプライマリに固定する秒数
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+STICKY_COOKIE = "primary_until"
+
+# alembic.ini は backend ディレクトリ直下にある
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+# create_all 時代のスキーマに相当するリビジョン
+BASELINE_REVISION = "0001"
+
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -17,12 +39,146 @@ def get_db():
     finally:
         db.close()
 
+# プライマリでは 0、レプリカでは WAL の再生が追いついていなければ最後の再生からの経過秒数
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+def measure_replica_lag(replica_engine) -> float:
+    """Return the replication lag of ``replica_engine`` in seconds (0 for non-Postgres stand-ins)."""
+    if replica_engine.dialect.name != "postgresql":
+        return 0.0
+    with replica_engine.connect() as connection:
+        return float(connection.execute(REPLICA_LAG_SQL).scalar() or 0.0)
+
+class Replica:
+    def __init__(self, url: Optional[str] = None, bind=None):
+        self.engine = bind if bind is not None else create_engine(url)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info={"replica": True})
+        self.lag = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current_lag(self) -> float:
+        with self._lock:
+            if self.lag is None or time.monotonic() - self.checked_at >= REPLICA_LAG_CHECK_SECONDS:
+                try:
+                    self.lag = measure_replica_lag(self.engine)
+                except Exception as e:
+                    print(f"Replica lag check failed: {e}")
+                    self.lag = float("inf")
+                self.checked_at = time.monotonic()
+            return self.lag
+
+replicas = [Replica(url) for url in DATABASE_REPLICA_URLS]
+_next_replica = itertools.count()
+
+def is_sticky(request: Optional[Request]) -> bool:
+    if request is None:
+        return False
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+def may_miss_recent_writes(db) -> bool:
+    """Whether ``db`` reads from a replica that may not have the latest write yet.
+
+    Results read that way must not be cached: the cache key carries the new
+    data version, so a stale result would be served to every client.
+    """
+    if not db.info.get("replica"):
+        return False
+    from .cache import query_cache
+
+    age = query_cache.seconds_since_write()
+    return age is not None and age < REPLICA_MAX_LAG_SECONDS
+
+def read_sessionmaker(request: Optional[Request] = None):
+    """Pick the session factory for a read-only request.
+
+    Uses a replica (round robin) unless the client has just written (sticky
+    cookie) or every replica is lagging by more than ``REPLICA_MAX_LAG_SECONDS``.
+    """
+    if not replicas or is_sticky(request):
+        return SessionLocal
+    start = next(_next_replica)
+    for offset in range(len(replicas)):
+        replica = replicas[(start + offset) % len(replicas)]
+        if replica.current_lag() <= REPLICA_MAX_LAG_SECONDS:
+            return replica.SessionLocal
+    return SessionLocal
+
+class ReadYourWritesMiddleware:
+    """Pin clients that have just written to the primary with the sticky cookie.
+
+    A plain ASGI middleware: requests pass straight through unless replicas
+    are configured and the method can write.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replicas or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # 更新したクライアントはしばらくプライマリから読み、自分の書き込みを確実に見られるようにする
+                sticky = Response()
+                sticky.set_cookie(
+                    STICKY_COOKIE, str(time.time() + READ_YOUR_WRITES_SECONDS),
+                    max_age=int(READ_YOUR_WRITES_SECONDS) + 1, httponly=True, samesite="lax",
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (name, value) for name, value in sticky.raw_headers if name == b"set-cookie"
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+def get_read_db(request: Request):
+    db = read_sessionmaker(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_alembic_config(connection=None):
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def run_migrations():
+    """Upgrade the database to the latest Alembic revision.
+
+    Databases created by the old ``create_all`` path have a ``videos`` table but
+    no ``alembic_version``; they are stamped at the baseline revision first.
+    """
+    from alembic import command
+
+    with engine.begin() as connection:
+        config = get_alembic_config(connection)
+        table_names = inspect(connection).get_table_names()
+        if "videos" in table_names and "alembic_version" not in table_names:
+            print(f"Existing schema without migration history; stamping {BASELINE_REVISION}.")
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
+
 def create_tables():
-    # Note: This is for development. For production, use Alembic migrations.
+    # スキーマは Alembic マイグレーションで管理する
     try:
-        print("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
-        print("Database tables created successfully.")
+        print("Running database migrations...")
+        run_migrations()
+        print("Database migrations applied successfully.")
     except Exception as e:
-        print(f"Error creating database tables: {e}")
-
+        print(f"Error running database migrations: {e}")
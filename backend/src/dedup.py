@@ -0,0 +1,109 @@
+"""MinHash signatures and LSH banding for near-duplicate transcripts.
+
+Transcripts are normalized (whitespace removed, lower-cased) and cut into
+character shingles, which works for Japanese text without a tokenizer. Shingle
+hashes are computed with a vectorized rolling hash over the code points and
+the MinHash permutations are multiply-shift hashes, all in NumPy uint64
+arithmetic. A signature is ``DEDUP_NUM_PERM`` uint32 values (512 bytes by
+default).
+
+For lookup the signature is split into ``DEDUP_BANDS`` bands; each band is
+hashed to one bucket key. Two transcripts with Jaccard similarity ``s`` share
+at least one bucket with probability ``1 - (1 - s**r)**b``, so candidates are
+found with an indexed ``(band, bucket)`` lookup instead of a full scan, then
+checked against their signatures.
+"""
+import hashlib
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "32"))
+# 推定 Jaccard 類似度がこの値以上なら重複とみなす
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# 有料の文字起こしを省く判定に使う閾値（字幕と音声認識の比較なので低めにする）
+DEDUP_PROBE_THRESHOLD = float(os.getenv("DEDUP_PROBE_THRESHOLD", "0.5"))
+# 短すぎる文字起こしは誤判定が多いので対象外にする
+DEDUP_MIN_CHARS = int(os.getenv("DEDUP_MIN_CHARS", "200"))
+# 切り抜きと元動画のように長さが大きく違うものは、似ていても文字起こしを流用しない
+DEDUP_MIN_LENGTH_RATIO = float(os.getenv("DEDUP_MIN_LENGTH_RATIO", "0.8"))
+
+# 一度に処理するシングル数（メモリ使用量 = NUM_PERM * CHUNK * 8 バイト）
+_CHUNK = 8192
+_MASK32 = np.uint64(0xFFFFFFFF)
+_WHITESPACE = re.compile(r"\s+")
+
+def _permutations(num_perm: int):
+    rng = np.random.default_rng(0x5EED)
+    # multiply-shift ハッシュ用の奇数の乗数と加数
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+_A, _B = _permutations(DEDUP_NUM_PERM)
+
+def normalize(text: Optional[str]) -> str:
+    return _WHITESPACE.sub("", text or "").lower()
+
+def shingle_hashes(text: str, k: int = DEDUP_SHINGLE_SIZE) -> np.ndarray:
+    """Unique 64-bit hashes of the character k-grams of normalized ``text``."""
+    codes = np.frombuffer(normalize(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < k:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+    base = np.uint64(1099511628211)
+    with np.errstate(over="ignore"):
+        for offset in range(k):
+            hashes = hashes * base + codes[offset:offset + len(hashes)]
+        # 上位ビットに情報を寄せる（multiply-shift は上位ビットを使うため）
+        hashes ^= hashes >> np.uint64(29)
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(32)
+    return np.unique(hashes)
+
+def signature(text: Optional[str]) -> Optional[np.ndarray]:
+    """MinHash signature (uint32[DEDUP_NUM_PERM]) of ``text``, or None if it is too short."""
+    if len(normalize(text)) < DEDUP_MIN_CHARS:
+        return None
+    hashes = shingle_hashes(text)
+    if len(hashes) == 0:
+        return None
+    mins = np.full(DEDUP_NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(hashes), _CHUNK):
+            chunk = hashes[start:start + _CHUNK][None, :]
+            permuted = (_A * chunk + _B) >> np.uint64(32)
+            np.minimum(mins, permuted.min(axis=1), out=mins)
+    return (mins & _MASK32).astype(np.uint32)
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return np.asarray(sig, dtype="<u4").tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4")
+
+def band_buckets(sig: np.ndarray, bands: int = DEDUP_BANDS) -> List[int]:
+    """One signed 63-bit bucket key per band (fits a BIGINT column)."""
+    rows = len(sig) // bands
+    data = np.asarray(sig, dtype="<u4")
+    buckets = []
+    for band in range(bands):
+        digest = hashlib.blake2b(data[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "little") >> 1)
+    return buckets
+
+def length_ratio(a, b) -> float:
+    """Shorter / longer of two lengths (1.0 when equal, 0.0 when either is empty)."""
+    if not a or not b:
+        return 0.0
+    return min(a, b) / max(a, b)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    if len(a) != len(b):
+        return 0.0
+    return float(np.count_nonzero(a == b)) / len(a)
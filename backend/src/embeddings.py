@@ -0,0 +1,268 @@
+"""Text embeddings and an in-process nearest-neighbour index for videos.
+
+The default embedder is a CPU-only feature-hashing model over the same tokens
+the summarizer uses (word tokens and CJK character bigrams), so it needs no
+model download. If ``EMBEDDING_MODEL`` names a sentence-transformers model and
+the package is installed, that model is used instead.
+
+Vectors are L2-normalized and stored as float16 (kept as float32 in memory
+for BLAS-backed search). The index uses hnswlib (HNSW)
+when it is installed and falls back to an exact NumPy inner-product scan.
+
+The index is loaded and refreshed by a background thread
+(``start_index_refresher``), never on the request path. Every
+``EMBEDDING_INDEX_REFRESH_SECONDS`` it reads embeddings written since the last
+refresh, re-reading an ``EMBEDDING_INDEX_OVERLAP_SECONDS`` window because
+``updated_at`` is the writing transaction's start time and commits can land
+out of order. Every ``EMBEDDING_INDEX_RECONCILE_SECONDS`` it rebuilds the
+index from the table, which also drops videos deleted on other replicas.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .summarizer import _tokens
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# 埋め込みに使う文字起こしの先頭文字数
+EMBEDDING_MAX_CHARS = int(os.getenv("EMBEDDING_MAX_CHARS", "20000"))
+INDEX_REFRESH_SECONDS = float(os.getenv("EMBEDDING_INDEX_REFRESH_SECONDS", "60"))
+INDEX_OVERLAP_SECONDS = float(os.getenv("EMBEDDING_INDEX_OVERLAP_SECONDS", "300"))
+INDEX_RECONCILE_SECONDS = float(os.getenv("EMBEDDING_INDEX_RECONCILE_SECONDS", "900"))
+
+_model = None
+_model_lock = threading.Lock()
+
+def _sentence_transformer():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    return _model
+
+def model_name() -> str:
+    return EMBEDDING_MODEL or f"hashing-{EMBEDDING_DIM}"
+
+def _hash_token(token: str) -> Tuple[int, float]:
+    # プロセス間で安定したハッシュが必要なので hash() は使わない
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % EMBEDDING_DIM, 1.0 if (value >> 63) & 1 else -1.0
+
+def _hashing_embed(texts: Sequence[str]) -> np.ndarray:
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        counts = {}
+        for token in _tokens(text or ""):
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            column, sign = _hash_token(token)
+            vectors[row, column] += sign * (1.0 + np.log(count))
+    return vectors
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """Embed texts in batches. Returns L2-normalized float32 vectors."""
+    if EMBEDDING_MODEL:
+        vectors = _sentence_transformer().encode(list(texts), batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True)
+        vectors = vectors.astype(np.float32)
+    else:
+        vectors = _hashing_embed(texts)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def video_text(title: Optional[str], tags: Optional[str], summary: Optional[str], transcript: Optional[str]) -> str:
+    parts = [title or "", tags or "", summary or "", (transcript or "")[:EMBEDDING_MAX_CHARS]]
+    return "\n".join(part for part in parts if part)
+
+def to_bytes(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+class VectorIndex:
+    """Incrementally updatable nearest-neighbour index keyed by video ID."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self.reconciled_at = 0.0
+        self._ids: List[int] = []
+        self._rows = {}
+        # 追加のたびに配列全体をコピーしないよう、容量を倍々に確保して先頭から使う
+        self._buffer = np.zeros((0, dim), dtype=np.float32)
+        self._hnsw = None
+        self._hnsw_deleted = set()
+        try:
+            import hnswlib
+            self._hnsw = hnswlib.Index(space="ip", dim=dim)
+            self._hnsw.init_index(max_elements=1024, ef_construction=200, M=16)
+            self._hnsw.set_ef(64)
+        except ImportError:
+            pass
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def _vectors(self) -> np.ndarray:
+        return self._buffer[:len(self._ids)]
+
+    def upsert(self, ids: Sequence[int], vectors: np.ndarray):
+        with self.lock:
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+            if self._hnsw is not None:
+                needed = self._hnsw.element_count + len(ids)
+                if needed > self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(max(needed, 2 * self._hnsw.get_max_elements()))
+                for video_id in ids:
+                    if video_id in self._hnsw_deleted:
+                        self._hnsw.unmark_deleted(video_id)
+                        self._hnsw_deleted.discard(video_id)
+                self._hnsw.add_items(vectors, list(ids))
+            existing = len(self._vectors)
+            new_vectors = []
+            for video_id, vector in zip(ids, vectors):
+                row = self._rows.get(video_id)
+                if row is None:
+                    self._rows[video_id] = len(self._ids)
+                    self._ids.append(video_id)
+                    new_vectors.append(vector)
+                elif row >= existing:
+                    new_vectors[row - existing] = vector
+                else:
+                    self._vectors[row] = vector
+            if new_vectors:
+                count = len(self._ids)
+                if count > len(self._buffer):
+                    grown = np.zeros((max(count, 2 * len(self._buffer), 1024), self.dim), dtype=np.float32)
+                    grown[:existing] = self._buffer[:existing]
+                    self._buffer = grown
+                self._buffer[existing:count] = new_vectors
+
+    def replace_with(self, other: "VectorIndex"):
+        """Take over the contents of an index built elsewhere (searches keep working meanwhile)."""
+        with self.lock:
+            self._ids, self._rows, self._buffer = other._ids, other._rows, other._buffer
+            self._hnsw, self._hnsw_deleted = other._hnsw, other._hnsw_deleted
+
+    def remove(self, ids: Iterable[int]):
+        with self.lock:
+            for video_id in ids:
+                row = self._rows.pop(video_id, None)
+                if row is None:
+                    continue
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(video_id)
+                    self._hnsw_deleted.add(video_id)
+                # 末尾の行を削除位置に移動して詰める
+                last = len(self._ids) - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._ids[row] = moved_id
+                    self._vectors[row] = self._vectors[last]
+                    self._rows[moved_id] = row
+                self._ids.pop()
+
+    def get(self, video_id: int) -> Optional[np.ndarray]:
+        with self.lock:
+            row = self._rows.get(video_id)
+            return None if row is None else self._vectors[row].copy()
+
+    def search(self, vector: np.ndarray, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        with self.lock:
+            count = len(self._rows)
+            if count == 0:
+                return []
+            wanted = min(count, k + (1 if exclude is not None else 0))
+            if self._hnsw is not None:
+                labels, distances = self._hnsw.knn_query(np.asarray(vector, dtype=np.float32), k=wanted)
+                # space="ip" の距離は 1 - 内積
+                results = [(int(label), float(1.0 - distance)) for label, distance in zip(labels[0], distances[0])]
+            else:
+                scores = self._vectors @ np.asarray(vector, dtype=np.float32)
+                top = np.argpartition(-scores, wanted - 1)[:wanted]
+                top = top[np.argsort(-scores[top])]
+                results = [(self._ids[i], float(scores[i])) for i in top]
+        return [(video_id, score) for video_id, score in results if video_id != exclude][:k]
+
+index = VectorIndex(EMBEDDING_DIM)
+
+def _load_rows(target: VectorIndex, query):
+    watermark = None
+    ids, vectors = [], []
+    for video_id, data, updated_at in query.yield_per(1000):
+        ids.append(video_id)
+        vectors.append(from_bytes(data))
+        if updated_at is not None and (watermark is None or updated_at > watermark):
+            watermark = updated_at
+        if len(ids) >= 1000:
+            target.upsert(ids, np.vstack(vectors))
+            ids, vectors = [], []
+    if ids:
+        target.upsert(ids, np.vstack(vectors))
+    return watermark
+
+def refresh_index(db, force: bool = False):
+    """Load embeddings written since the last refresh, or rebuild the whole index when due."""
+    from . import models
+
+    now = time.monotonic()
+    if not force and index.loaded and now - index.refreshed_at < INDEX_REFRESH_SECONDS:
+        return
+    query = db.query(
+        models.VideoEmbedding.video_id,
+        models.VideoEmbedding.vector,
+        models.VideoEmbedding.updated_at,
+    ).filter(models.VideoEmbedding.model == model_name())
+    if force or not index.loaded or now - index.reconciled_at >= INDEX_RECONCILE_SECONDS:
+        # 新しいインデックスを別に組み立ててから差し替える（組み立て中も検索できる）
+        rebuilt = VectorIndex(index.dim)
+        watermark = _load_rows(rebuilt, query)
+        index.replace_with(rebuilt)
+        index.reconciled_at = now
+    else:
+        # 後から確定した書き込みは updated_at が透かしより前になりうるので、一定時間分を読み直す
+        since = index.watermark - timedelta(seconds=INDEX_OVERLAP_SECONDS) if index.watermark is not None else None
+        if since is not None:
+            query = query.filter(models.VideoEmbedding.updated_at >= since)
+        watermark = _load_rows(index, query)
+    with index.lock:
+        if watermark is not None and (index.watermark is None or watermark > index.watermark):
+            index.watermark = watermark
+        index.loaded = True
+        index.refreshed_at = now
+
+_refresher = None
+
+def _refresh_loop():
+    from .database import SessionLocal
+
+    while True:
+        db = SessionLocal()
+        try:
+            refresh_index(db)
+        except Exception as e:
+            print(f"[Embeddings] Could not refresh the vector index: {e}")
+        finally:
+            db.close()
+        time.sleep(INDEX_REFRESH_SECONDS)
+
+def start_index_refresher():
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="embedding-index", daemon=True)
+        _refresher.start()
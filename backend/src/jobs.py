@@ -0,0 +1,254 @@
+"""Bounded job executor with admission control for expensive transcription work.
+
+Each transcription mode that runs in the background gets its own executor with
+a fixed number of worker threads and a bounded queue. Jobs are queued per
+client and dispatched round robin across clients, so one bulk importer gets
+its share of the workers instead of all of them. A client can hold at most
+``max_queue_per_client`` queued jobs and the whole queue at most ``max_queue``;
+beyond that ``submit`` raises ``429`` with a ``Retry-After`` estimate. After
+``stop_accepting`` (graceful shutdown) it raises ``503`` instead.
+
+Running jobs cannot be killed. On shutdown ``shutdown`` is set and jobs call
+``check_interrupted()`` at their checkpoints, which raises ``JobInterrupted``
+so the job can hand its work back and return.
+
+Settings (per mode, e.g. ``HIGH_QUALITY``):
+    JOBS_<MODE>_CONCURRENCY        worker threads (default 2)
+    JOBS_<MODE>_QUEUE              queued jobs across all clients (default 50)
+    JOBS_<MODE>_QUEUE_PER_CLIENT   queued jobs per client (default 10)
+
+Clients are told apart by peer address. ``X-Client-Id`` and
+``X-Forwarded-For`` are only honoured on requests from ``TRUSTED_PROXIES``
+(comma separated addresses or networks), since anyone else could send a
+fresh value per request to get a queue of their own.
+"""
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Hashable, Optional
+
+from fastapi import HTTPException
+
+# 実行時間の実績がまだないときの見積もり（秒）
+DEFAULT_JOB_SECONDS = 120.0
+# 停止中に受け付けを断ったとき、別のレプリカで再試行するまでの目安（秒）
+DRAINING_RETRY_AFTER = 5
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+]
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+def client_key(request) -> str:
+    """Identify the caller for fair sharing by peer address.
+
+    Behind a trusted proxy the proxy's ``X-Client-Id``, or else the last
+    ``X-Forwarded-For`` hop (the address the proxy saw), is used instead.
+    """
+    host = request.client.host if request.client else "unknown"
+    if _is_trusted_proxy(host):
+        client_id = request.headers.get("x-client-id")
+        if client_id:
+            return f"id:{client_id.strip()[:64]}"
+        forwarded = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if forwarded:
+            return f"ip:{forwarded[-1]}"
+    return f"ip:{host}"
+
+# 停止処理で実行中のジョブに中断を求める
+shutdown = threading.Event()
+
+class JobInterrupted(Exception):
+    """Raised by ``check_interrupted`` once shutdown has asked running jobs to stop."""
+
+def check_interrupted():
+    if shutdown.is_set():
+        raise JobInterrupted("Server is shutting down")
+
+class JobExecutor:
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_queue_per_client: int):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.accepting = True
+        self.running = {}
+        self.avg_seconds = None
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        # client -> deque[(key, fn, args)]、先頭のクライアントから順に1件ずつ取り出す
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_concurrency:
+            worker = threading.Thread(target=self._work, name=f"jobs-{self.name}-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def retry_after(self, ahead: int) -> int:
+        """Seconds until roughly ``ahead`` more jobs have finished."""
+        per_job = self.avg_seconds or DEFAULT_JOB_SECONDS
+        return max(1, int(per_job * max(ahead, 1) / self.max_concurrency))
+
+    def capacity(self, client: str) -> int:
+        """How many more jobs ``client`` may queue right now."""
+        with self._cond:
+            if not self.accepting:
+                return 0
+            queued = len(self._queues.get(client, ()))
+            return max(0, min(self.max_queue - self._queued, self.max_queue_per_client - queued))
+
+    def ensure_accepting(self):
+        """Raise 503 once the executor has stopped accepting jobs for shutdown."""
+        if not self.accepting:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is shutting down; retry later",
+                headers={"Retry-After": str(DRAINING_RETRY_AFTER)},
+            )
+
+    def _check(self, client: str):
+        self.ensure_accepting()
+        client_queued = len(self._queues.get(client, ()))
+        if self._queued >= self.max_queue or client_queued >= self.max_queue_per_client:
+            self.stats["rejected"] += 1
+            ahead = self._queued if self._queued >= self.max_queue else client_queued
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many queued {self.name} jobs; retry later",
+                headers={"Retry-After": str(self.retry_after(ahead))},
+            )
+
+    def admit(self, client: str):
+        """Raise 429 now if ``client`` could not queue another job (checked before doing any work)."""
+        with self._cond:
+            self._check(client)
+
+    def submit(self, client: str, key: Hashable, fn: Callable, *args) -> int:
+        """Queue ``fn(*args)`` for ``client``. Returns the job's position (1 = next to start)."""
+        with self._cond:
+            self._check(client)
+            self._queues.setdefault(client, deque()).append((key, fn, args))
+            self._queued += 1
+            self.stats["submitted"] += 1
+            self._start_workers()
+            self._cond.notify()
+            return self._position(key)
+
+    def _dispatch_order(self):
+        # ラウンドロビンで取り出される順序を、キューを変更せずに再現する
+        queues = [list(q) for q in self._queues.values()]
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            for q in queues:
+                if depth < len(q):
+                    yield q[depth][0]
+            depth += 1
+
+    def _position(self, key: Hashable) -> Optional[int]:
+        for index, queued_key in enumerate(self._dispatch_order()):
+            if queued_key == key:
+                return index + 1
+        return None
+
+    def position(self, key: Hashable) -> Optional[int]:
+        """Queue position of ``key``: 0 while running, None if unknown."""
+        with self._cond:
+            if key in self.running.values():
+                return 0
+            return self._position(key)
+
+    def _next(self):
+        client, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        # 取り出したクライアントを末尾に回して公平に順番を回す
+        del self._queues[client]
+        if queue:
+            self._queues[client] = queue
+        self._queued -= 1
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queued:
+                    self._cond.wait()
+                key, fn, args = self._next()
+                self.running[threading.get_ident()] = key
+            started = time.monotonic()
+            outcome = "completed"
+            try:
+                fn(*args)
+            except Exception as e:
+                outcome = "failed"
+                print(f"[Jobs:{self.name}] Job {key} failed: {e}")
+            elapsed = time.monotonic() - started
+            with self._cond:
+                del self.running[threading.get_ident()]
+                self.stats[outcome] += 1
+                self.avg_seconds = elapsed if self.avg_seconds is None else 0.8 * self.avg_seconds + 0.2 * elapsed
+                self._cond.notify_all()
+
+    def keys(self) -> list:
+        """Keys of the running and queued jobs."""
+        with self._cond:
+            return list(self.running.values()) + list(self._dispatch_order())
+
+    def stop_accepting(self):
+        with self._cond:
+            self.accepting = False
+
+    def drain_queue(self) -> list:
+        """Remove the jobs that have not started yet and return their keys."""
+        with self._cond:
+            keys = list(self._dispatch_order())
+            self._queues.clear()
+            self._queued = 0
+            return keys
+
+    def wait_idle(self, timeout: float) -> list:
+        """Wait up to ``timeout`` seconds for running jobs; return the keys still running."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.running and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return list(self.running.values())
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.stats,
+                "accepting": self.accepting,
+                "running": len(self.running),
+                "queued": self._queued,
+                # クライアントキー（IP やクライアント ID）は認証なしの統計に出さない
+                "clients": len(self._queues),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "max_queue_per_client": self.max_queue_per_client,
+                "avg_seconds": self.avg_seconds,
+            }
+
+def _executor_from_env(mode: str, concurrency: int, queue: int, per_client: int) -> JobExecutor:
+    prefix = f"JOBS_{mode.upper()}_"
+    return JobExecutor(
+        mode,
+        max_concurrency=int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+        max_queue=int(os.getenv(prefix + "QUEUE", str(queue))),
+        max_queue_per_client=int(os.getenv(prefix + "QUEUE_PER_CLIENT", str(per_client))),
+    )
+
+# 高品質文字起こし（auto モードで字幕がなかった場合も含む）
+executors = {
+    "high_quality": _executor_from_env("high_quality", 2, 50, 10),
+}
@@ -0,0 +1,163 @@
+"""Graceful shutdown: readiness, draining and resuming interrupted transcriptions.
+
+On shutdown (uvicorn's lifespan shutdown after SIGTERM, or ``POST /drain``
+from a pre-stop hook) the replica reports not-ready on ``/ready``, stops
+accepting transcription jobs (new ones get ``503`` with ``Retry-After``),
+hands back the jobs that have not started, and waits for running ones. For
+the last ``SHUTDOWN_CANCEL_SECONDS`` of ``SHUTDOWN_DRAIN_SECONDS`` running
+jobs are asked to stop: at their next checkpoint they mark themselves
+``interrupted`` and return. Audio waiting for or under recognition is handed
+back once the scheduler has stopped. Checkpoints (cached audio, uploaded GCS
+object, recognition operation) are kept.
+
+Rows are only handed back when nothing is still working on them. A job that
+does not reach a checkpoint in time stays ``processing``; so do the jobs of a
+replica that crashed. Every replica renews ``heartbeat_at`` on the
+``processing`` rows it owns, and rows whose heartbeat is older than
+``PROCESSING_LEASE_SECONDS`` are taken over like ``interrupted`` ones.
+
+Every replica claims such rows on startup and then every
+``RESUME_INTERVAL_SECONDS``, so work handed back by a replica that is going
+away is picked up by the others and continues from its last checkpoint
+instead of being paid for twice.
+
+Settings:
+    SHUTDOWN_DRAIN_SECONDS    how long running jobs may finish (default 25; keep it
+                              below the orchestrator's termination grace period)
+    SHUTDOWN_CANCEL_SECONDS   final part of that time in which running jobs are asked to stop (default 5)
+    RESUME_INTERVAL_SECONDS   how often unfinished jobs are claimed (default 60, 0 disables)
+    PROCESSING_LEASE_SECONDS  heartbeat age after which a processing job is taken over (default 300)
+    DRAIN_TOKEN               token for ``POST /drain`` (empty disables the endpoint)
+"""
+import hmac
+import os
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from . import crud, jobs
+from .jobs import executors
+
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "25"))
+SHUTDOWN_CANCEL_SECONDS = float(os.getenv("SHUTDOWN_CANCEL_SECONDS", "5"))
+RESUME_INTERVAL_SECONDS = float(os.getenv("RESUME_INTERVAL_SECONDS", "60"))
+PROCESSING_LEASE_SECONDS = float(os.getenv("PROCESSING_LEASE_SECONDS", "300"))
+DRAIN_TOKEN = os.getenv("DRAIN_TOKEN", "")
+# リースが切れる前に何度か更新できる間隔でハートビートを送る
+HEARTBEAT_INTERVAL_SECONDS = PROCESSING_LEASE_SECONDS / 5
+
+# 再開したジョブはこのクライアント名で公平キューに入れる
+RESUME_CLIENT = "resume"
+
+_draining = threading.Event()
+_drain_lock = threading.Lock()
+_drain_result = None
+_resumer = None
+
+def is_draining() -> bool:
+    return _draining.is_set()
+
+def check_drain_token(token: Optional[str]):
+    if not DRAIN_TOKEN or not token or not hmac.compare_digest(token.encode(), DRAIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Draining is not allowed")
+
+def _remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.monotonic())
+
+def drain(deadline_seconds: float = SHUTDOWN_DRAIN_SECONDS) -> dict:
+    """Stop taking jobs, hand back the queued ones and let running ones finish or stop at a checkpoint.
+
+    Safe to call more than once (pre-stop hook, then lifespan shutdown); later
+    calls return the first result.
+    """
+    global _drain_result
+    with _drain_lock:
+        if _drain_result is not None:
+            return _drain_result
+        _draining.set()
+        deadline = time.monotonic() + deadline_seconds
+        cancel_at = deadline - min(SHUTDOWN_CANCEL_SECONDS, deadline_seconds / 2)
+        print(f"[Shutdown] Draining transcription jobs (deadline {deadline_seconds:.0f}s)")
+
+        # 開始前のジョブは誰も触っていないので、そのまま引き渡せる
+        unstarted = []
+        for executor in executors.values():
+            executor.stop_accepting()
+            unstarted += executor.drain_queue()
+        for executor in executors.values():
+            executor.wait_idle(_remaining(cancel_at))
+
+        # 実行中のジョブには次のチェックポイントで止まってもらう（自分で interrupted に戻す）
+        jobs.shutdown.set()
+        scheduled = crud.recognition_scheduler.stop(_remaining(deadline))
+        running = []
+        for executor in executors.values():
+            running += executor.wait_idle(_remaining(deadline))
+
+        interrupted = crud.mark_transcriptions_interrupted(list(dict.fromkeys(unstarted + scheduled)))
+        print(f"[Shutdown] Handed back {len(interrupted)} unfinished transcriptions: {interrupted}")
+        if running:
+            # まだ動いているジョブの行には触れない。ハートビートが途絶えれば他のレプリカが引き継ぐ
+            print(f"[Shutdown] {len(running)} transcriptions did not stop in time; leaving them to expire: {running}")
+        _drain_result = {"interrupted": interrupted, "running": running}
+        return _drain_result
+
+def owned_transcriptions() -> list:
+    """Videos this replica is transcribing: queued, running, or waiting for recognition."""
+    owned = []
+    for executor in executors.values():
+        owned += executor.keys()
+    return list(dict.fromkeys(owned + crud.recognition_scheduler.video_ids()))
+
+def resume_interrupted() -> list:
+    """Claim interrupted (or expired) transcriptions, as many as the executor will accept, and queue them."""
+    if is_draining():
+        return []
+    executor = executors["high_quality"]
+    limit = executor.capacity(RESUME_CLIENT)
+    if not limit:
+        return []
+    claimed = crud.claim_interrupted_transcriptions(limit, lease_seconds=PROCESSING_LEASE_SECONDS)
+    for video_id in claimed:
+        try:
+            executor.submit(RESUME_CLIENT, video_id, crud.run_high_quality_transcription, video_id)
+        except HTTPException:
+            crud.mark_transcriptions_interrupted([video_id])
+    if claimed:
+        print(f"[Resume] Resuming {len(claimed)} interrupted transcriptions: {claimed}")
+    return claimed
+
+def _resume_loop():
+    next_resume = time.monotonic()
+    while True:
+        try:
+            crud.heartbeat_transcriptions(owned_transcriptions())
+        except Exception as e:
+            print(f"[Resume] Could not renew transcription heartbeats: {e}")
+        if RESUME_INTERVAL_SECONDS > 0 and time.monotonic() >= next_resume:
+            next_resume = time.monotonic() + RESUME_INTERVAL_SECONDS
+            try:
+                resume_interrupted()
+            except Exception as e:
+                print(f"[Resume] Could not resume interrupted transcriptions: {e}")
+        wait = HEARTBEAT_INTERVAL_SECONDS
+        if RESUME_INTERVAL_SECONDS > 0:
+            wait = min(wait, max(0.0, next_resume - time.monotonic()))
+        if _draining.wait(wait):
+            return
+
+def start_resuming():
+    # 再開を無効にしても、自分のジョブのハートビートは送り続ける
+    global _resumer
+    if _resumer is None:
+        _resumer = threading.Thread(target=_resume_loop, name="resume-interrupted", daemon=True)
+        _resumer.start()
+
+def get_status() -> dict:
+    return {
+        "status": "draining" if is_draining() else "ready",
+        "jobs": {mode: executor.get_stats()["running"] for mode, executor in executors.items()},
+        "interrupted": (_drain_result or {}).get("interrupted", []),
+    }
@@ -1,22 +1,81 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse
+from src import backfill, crud, database, embeddings, lifecycle
 from src.database import create_tables
 from src.seeder import seed_data
-from src.routers import videos, tags
+from src.cache import query_cache
+from src.compression import CompressionMiddleware, compressed_cache
+from src.jobs import executors
+from src.profiling import ProfilingMiddleware
+from src.routers import videos, tags, channels, search
 import os
+import threading
 
 app = FastAPI()
+# 最後に追加したミドルウェアが最も外側になる。プロファイラは最後に追加し、
+# 圧縮や read-your-writes の Cookie 付与も含めてリクエスト全体を計測する
+app.add_middleware(database.ReadYourWritesMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 # /apiプレフィックスを環境変数で制御できるようにする
 API_PREFIX = os.getenv("API_PREFIX", "/api")
 
+# 起動時の処理は環境変数で制御する。
+# シードはYouTube APIへのネットワーク呼び出しを含むため、既定ではバックグラウンドで実行する。
+CREATE_TABLES_ON_STARTUP = os.getenv("CREATE_TABLES_ON_STARTUP", "true").lower() == "true"
+SEED_ON_STARTUP = os.getenv("SEED_ON_STARTUP", "true").lower() == "true"
+SEED_IN_BACKGROUND = os.getenv("SEED_IN_BACKGROUND", "true").lower() == "true"
+# 埋め込みのない既存の動画を起動時にバックグラウンドで埋め込む
+BACKFILL_ON_STARTUP = os.getenv("BACKFILL_ON_STARTUP", "true").lower() == "true"
+
 app.include_router(videos.router, prefix=API_PREFIX)
 app.include_router(tags.router, prefix=API_PREFIX)
+app.include_router(channels.router, prefix=API_PREFIX)
+app.include_router(search.router, prefix=API_PREFIX)
 
 @app.on_event("startup")
 def startup_event():
-    create_tables()
-    seed_data()
+    if CREATE_TABLES_ON_STARTUP:
+        create_tables()
+    if SEED_ON_STARTUP:
+        if SEED_IN_BACKGROUND:
+            threading.Thread(target=seed_data, name="seed-data", daemon=True).start()
+        else:
+            seed_data()
+    # 停止したレプリカから引き渡された文字起こしを再開する
+    lifecycle.start_resuming()
+    # 類似検索のインデックスはリクエストの外で読み込み、定期的に更新する
+    embeddings.start_index_refresher()
+    if BACKFILL_ON_STARTUP:
+        threading.Thread(target=backfill.run_backfill, name="backfill", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    lifecycle.drain()
 
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
+
+@app.get("/ready")
+def read_readiness():
+    # ロードバランサーは 503 を見てこのレプリカへの振り分けを止める
+    status = lifecycle.get_status()
+    return JSONResponse(status, status_code=503 if lifecycle.is_draining() else 200)
+
+@app.post("/drain")
+def drain(x_drain_token: str = Header(None)):
+    # Kubernetes の preStop フックなどから呼び、SIGTERM の前に排出を始める
+    lifecycle.check_drain_token(x_drain_token)
+    return lifecycle.drain()
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    return {**query_cache.get_stats(), "compressed": compressed_cache.get_stats()}
+
+@app.get("/jobs/stats")
+def read_job_stats():
+    stats = {mode: executor.get_stats() for mode, executor in executors.items()}
+    stats["recognition"] = crud.recognition_scheduler.get_stats()
+    return stats
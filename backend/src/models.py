@@ -1,11 +1,19 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from sqlalchemy import BigInteger, Column, Float, Integer, SmallInteger, String, Text, DateTime, ForeignKey, Index, LargeBinary, func, text
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 from .database import Base
 
 # SQLAlchemy Model
+class Channel(Base):
+    __tablename__ = "channels"
+
+    id = Column(String(64), primary_key=True)  # YouTube channel ID
+    title = Column(String(255), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Video(Base):
     __tablename__ = "videos"
 
@@ -13,19 +21,94 @@ class Video(Base):
     url = Column(Text, nullable=False)
     title = Column(String(255), nullable=False)
     channel_name = Column(String(255), nullable=False)
+    channel_id = Column(String(64), ForeignKey("channels.id"), nullable=True)
+    duration_seconds = Column(Integer, nullable=True)
     tags = Column(Text, nullable=True)
     memo = Column(Text, nullable=True)
     transcript = Column(Text, nullable=True)
-    status = Column(String(50), nullable=False, default='completed') # processing, completed, failed
+    summary = Column(Text, nullable=True)
+    transcript_source = Column(String(32), nullable=True) # youtube_manual, youtube_generated, speech
+    status = Column(String(50), nullable=False, default='completed') # processing, interrupted, completed, failed
+    # 高品質文字起こしのチェックポイント（再試行時に完了済みの段階を飛ばす）
+    transcription_stage = Column(String(32), nullable=True) # downloaded, converted, uploaded, submitted, completed
+    audio_sha256 = Column(String(64), nullable=True)
+    gcs_uri = Column(Text, nullable=True)
+    operation_name = Column(Text, nullable=True)
+    # 処理中のジョブを持つレプリカが定期的に更新する。途絶えた processing 行は他のレプリカが引き継ぐ
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    # 直近の音声ダウンロードの実績
+    download_bytes = Column(BigInteger, nullable=True)
+    download_seconds = Column(Float, nullable=True)
+    # 文字起こしがほぼ同一の既存動画（MinHash/LSH で判定）
+    duplicate_of = Column(Integer, ForeignKey("videos.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # インデックスは migrations/versions にも定義する（Alembic が正）
+    __table_args__ = (
+        Index('ix_videos_status', 'status'),
+        Index('ix_videos_created_at', 'created_at'),
+        Index('ix_videos_updated_at', 'updated_at'),
+        Index('ix_videos_channel_name', 'channel_name'),
+        Index('ix_videos_title', 'title'),
+        Index('ix_videos_channel_id', 'channel_id'),
+        Index('ix_videos_duplicate_of', 'duplicate_of'),
+        Index(
+            'ix_videos_processing', 'updated_at',
+            postgresql_where=text("status = 'processing'"),
+            sqlite_where=text("status = 'processing'"),
+        ),
+        Index(
+            'ix_videos_unfinished', 'status', 'heartbeat_at',
+            postgresql_where=text("status IN ('processing', 'interrupted')"),
+            sqlite_where=text("status IN ('processing', 'interrupted')"),
+        ),
+    )
+
+class VideoEmbedding(Base):
+    __tablename__ = "video_embeddings"
+
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(255), nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float16
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
+
+class VideoSignature(Base):
+    __tablename__ = "video_signatures"
+
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    num_perm = Column(Integer, nullable=False)
+    signature = Column(LargeBinary, nullable=False)  # uint32 little-endian
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class VideoLSHBand(Base):
+    __tablename__ = "video_lsh_bands"
+
+    video_id = Column(Integer, ForeignKey("videos.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index('ix_video_lsh_bands_band_bucket', 'band', 'bucket'),
+    )
+
+# search_videos で並べ替えに使える列（すべてインデックス付き）
+SORTABLE_COLUMNS = {
+    "id": Video.id,
+    "title": Video.title,
+    "channel_name": Video.channel_name,
+    "status": Video.status,
+    "created_at": Video.created_at,
+    "updated_at": Video.updated_at,
+}
+
 # Pydantic Models (Schemas)
 class VideoBase(BaseModel):
     url: str
     tags: Optional[str] = None
     memo: Optional[str] = None
-    transcriptionOption: Optional[str] = None # This is not stored in DB, used for creation logic
+    transcriptionOption: Optional[str] = None # standard, high_quality, auto. Not stored in DB, used for creation logic
 
 class VideoCreate(VideoBase):
     pass
@@ -33,14 +116,61 @@ class VideoCreate(VideoBase):
 class VideoUpdate(VideoBase):
     pass
 
-class VideoSchema(VideoBase):
+class VideoListSchema(VideoBase):
+    """List item: carries the summary instead of the full transcript."""
     id: int
     title: str
     channel_name: str
-    transcript: Optional[str] = None
+    channel_id: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    summary: Optional[str] = None
+    transcript_source: Optional[str] = None
+    duplicate_of: Optional[int] = None
     status: str
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True # Replaces orm_mode = True
+
+class VideoSchema(VideoListSchema):
+    transcript: Optional[str] = None
+    transcription_stage: Optional[str] = None
+    download_bytes: Optional[int] = None
+    download_seconds: Optional[float] = None
+
+class ScoredVideoSchema(VideoListSchema):
+    score: float
+
+class DuplicateVideoSchema(VideoListSchema):
+    similarity: float
+
+class VideoSelection(BaseModel):
+    """Targets of a batch operation: explicit IDs and/or a search filter."""
+    ids: Optional[List[int]] = None
+    title_query: Optional[str] = None
+    tags_query: Optional[str] = None
+
+class BatchTagUpdate(VideoSelection):
+    add: List[str] = []
+    remove: List[str] = []
+
+class BatchItemResult(BaseModel):
+    id: int
+    status: str # updated, unchanged, deleted, queued, skipped, rejected, not_found
+    detail: Optional[str] = None
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
+
+class ChannelSchema(BaseModel):
+    id: str
+    title: str
+    video_count: int = 0
+    total_duration_seconds: int = 0
+    transcript_count: int = 0
+    transcript_coverage: float = 0.0
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,280 @@
+"""Opt-in per-request profiling (stack samples + SQL timings) in speedscope format.
+
+A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>`` or is
+picked by ``PROFILING_SAMPLE_RATE``. While it runs, a sampler thread records
+the stacks of the event-loop thread and of the worker threads that execute SQL
+for the request (FastAPI runs sync endpoints in a thread pool), and every SQL
+statement is timed. The result is a speedscope file
+(https://www.speedscope.app) with one sampled profile per thread and an
+evented "SQL" profile; the statements are also listed under ``"sql"``.
+
+Results are written to ``PROFILING_DIR``, which keeps the newest
+``PROFILING_MAX_FILES`` profiles. Requests that sent the admin token also get
+``X-Profile-File``, or the profile instead of the response body when they send
+``X-Profile-Output: inline``. Sampled requests come from anyone, so their
+profiles (SQL text, source paths) only ever go to disk and the response is
+left untouched.
+
+When no request is being profiled the cost is one header lookup per request
+and one context-variable read per SQL statement.
+
+Settings:
+    PROFILING_TOKEN        admin token for the X-Profile header (empty disables the header)
+    PROFILING_SAMPLE_RATE  fraction of requests profiled automatically (default 0)
+    PROFILING_INTERVAL_MS  sampling interval (default 2)
+    PROFILING_DIR          where profiles are written
+    PROFILING_MAX_FILES    profiles kept in PROFILING_DIR, oldest removed first (default 200)
+"""
+import contextvars
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "2"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "summaryoutube-profiles"))
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "200"))
+PROFILE_SUFFIX = ".speedscope.json"
+
+# SQL 文は長すぎるとファイルが肥大化するので切り詰める（パラメータは記録しない）
+MAX_STATEMENT_CHARS = 2000
+MAX_STACK_DEPTH = 128
+
+_current = contextvars.ContextVar("summaryoutube_profile", default=None)
+
+class RequestProfile:
+    def __init__(self, name: str, interval: float = PROFILING_INTERVAL_MS / 1000):
+        self.name = name
+        self.interval = interval
+        self.threads = {threading.get_ident()}
+        self.samples = []  # (thread_id, elapsed, stack)
+        self.sql = []
+        self.frames = []
+        self._frame_index = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+            self._stop.set()
+            self._sampler.join()
+
+    def add_thread(self, thread_id: int):
+        if thread_id not in self.threads:
+            with self._lock:
+                self.threads.add(thread_id)
+
+    def _frame_id(self, code, line: int) -> int:
+        key = (code, line)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = len(self.frames)
+            self._frame_index[key] = index
+            self.frames.append({
+                "name": getattr(code, "co_qualname", code.co_name),
+                "file": code.co_filename,
+                "line": line,
+            })
+        return index
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            elapsed = time.perf_counter() - self.started
+            with self._lock:
+                threads = list(self.threads)
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._frame_id(frame.f_code, frame.f_lineno))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.append((thread_id, elapsed, stack))
+
+    def record_sql(self, statement: str, started: float, duration: float, executemany: bool):
+        with self._lock:
+            self.sql.append({
+                "statement": statement[:MAX_STATEMENT_CHARS],
+                "start_ms": (started - self.started) * 1000,
+                "duration_ms": duration * 1000,
+                "executemany": executemany,
+                "thread": threading.get_ident(),
+            })
+
+    def to_speedscope(self) -> dict:
+        end_ms = (self.duration or 0.0) * 1000
+        frames = list(self.frames)
+        profiles = []
+        for thread_id in sorted({tid for tid, _, _ in self.samples}):
+            samples = [(elapsed, stack) for tid, elapsed, stack in self.samples if tid == thread_id]
+            profiles.append({
+                "type": "sampled",
+                "name": f"thread {thread_id}",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": end_ms,
+                "samples": [stack for _, stack in samples],
+                "weights": [self.interval * 1000] * len(samples),
+            })
+        if self.sql:
+            events = []
+            for query in sorted(self.sql, key=lambda q: q["start_ms"]):
+                index = len(frames)
+                frames.append({"name": query["statement"]})
+                events.append({"type": "O", "frame": index, "at": query["start_ms"]})
+                events.append({"type": "C", "frame": index, "at": query["start_ms"] + query["duration_ms"]})
+            profiles.append({
+                "type": "evented",
+                "name": "SQL",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": max(end_ms, events[-1]["at"]),
+                "events": events,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "summaryoutube",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "duration_ms": end_ms,
+            "sql": self.sql,
+        }
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None:
+        profile.add_thread(threading.get_ident())
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None and conn.info.get("profile_started"):
+        started = conn.info["profile_started"].pop()
+        profile.record_sql(statement, started, time.perf_counter() - started, executemany)
+
+def should_profile(headers: Headers) -> Optional[str]:
+    """``"admin"`` for requests with the profiling token, ``"sampled"`` for sampled ones, else None."""
+    token = headers.get("x-profile")
+    if token and PROFILING_TOKEN and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode()):
+        return "admin"
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+def profile_path(profile: RequestProfile, directory: str = PROFILING_DIR) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", profile.name).strip("-")[:80]
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{stamp}-{os.urandom(3).hex()}-{slug}{PROFILE_SUFFIX}")
+
+def _prune_profiles(directory: str, keep: Optional[int] = None):
+    # 古いプロファイルから削除し、サンプリングでディレクトリが膨らみ続けないようにする
+    keep = PROFILING_MAX_FILES if keep is None else keep
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(PROFILE_SUFFIX)]
+    if len(paths) <= keep:
+        return
+    paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+    for path in paths[:len(paths) - keep]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def write_profile(profile: RequestProfile, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(profile.to_speedscope(), f)
+    _prune_profiles(os.path.dirname(path))
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles opted-in requests."""
+
+    def __init__(self, app, directory: Optional[str] = None):
+        self.app = app
+        self.directory = directory or PROFILING_DIR
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        reason = should_profile(headers)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        # プロファイルの中身やファイル名を返すのはトークンを送った管理者だけ
+        admin = reason == "admin"
+        inline = admin and headers.get("x-profile-output") == "inline"
+        profile = RequestProfile(f"{scope['method']} {scope['path']}")
+        path = None if inline else profile_path(profile, self.directory)
+        token = _current.set(profile)
+        profile.start()
+        start_message = None
+
+        async def send_profiled(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                if not inline:
+                    if admin:
+                        # プロファイルはレスポンス完了後にこのパスへ書き出される
+                        MutableHeaders(raw=message["headers"])["X-Profile-File"] = os.path.basename(path)
+                    await send(message)
+                return
+            if inline:
+                if not message.get("more_body", False):
+                    profile.stop()
+                    body = json.dumps(profile.to_speedscope()).encode("utf-8")
+                    await send({
+                        "type": "http.response.start",
+                        "status": 200,
+                        "headers": [
+                            (b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode()),
+                            (b"x-profiled-status", str(start_message["status"]).encode()),
+                        ],
+                    })
+                    await send({"type": "http.response.body", "body": body})
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            _current.reset(token)
+            profile.stop()
+            if not inline:
+                try:
+                    # 大きなプロファイルの書き出しでイベントループを止めない
+                    await run_in_threadpool(write_profile, profile, path)
+                    print(f"[Profile] Written: {path} ({profile.duration * 1000:.1f} ms, {len(profile.sql)} SQL)")
+                except OSError as e:
+                    print(f"[Profile] Could not write profile: {e}")
@@ -0,0 +1,311 @@
+"""Batched speech recognition with a single asynchronous poller.
+
+Transcription workers only prepare audio (download, convert, upload) and hand
+the result to the scheduler; they no longer block on a recognition operation.
+The scheduler groups ready files from several jobs into one request, submits
+it, and tracks every open operation from one thread, fanning each file's
+result back out to its video through ``on_result``. Worker threads are free
+again as soon as their audio is uploaded, so recognition throughput depends on
+the backend rather than on ``JOBS_HIGH_QUALITY_CONCURRENCY``.
+
+Backends:
+    batch   Speech-to-Text v2 ``batch_recognize``: up to ``RECOGNITION_BATCH_SIZE``
+            GCS files per operation (needs ``GCS_SPEECH_BUCKET`` and ``GOOGLE_CLOUD_PROJECT``)
+    single  Speech-to-Text v1 ``long_running_recognize``, one operation per file,
+            polled by the same thread (used when v2 is not configured)
+
+Settings:
+    RECOGNITION_BACKEND             auto (default), batch, single, or blocking
+                                    (the previous in-worker recognition)
+    RECOGNITION_BATCH_SIZE          files per batch operation (default 15, the v2 limit)
+    RECOGNITION_BATCH_WAIT_SECONDS  how long a partial batch waits for more files (default 10)
+    RECOGNITION_POLL_SECONDS        interval between operation polls (default 15)
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from . import youtube_api
+
+RECOGNITION_BACKEND = os.getenv("RECOGNITION_BACKEND", "auto")
+RECOGNITION_BATCH_SIZE = int(os.getenv("RECOGNITION_BATCH_SIZE", "15"))
+RECOGNITION_BATCH_WAIT_SECONDS = float(os.getenv("RECOGNITION_BATCH_WAIT_SECONDS", "10"))
+RECOGNITION_POLL_SECONDS = float(os.getenv("RECOGNITION_POLL_SECONDS", "15"))
+
+class BatchBackend:
+    """Speech-to-Text v2 batch_recognize; refs are GCS URIs."""
+    name = "batch"
+
+    def __init__(self, max_batch: int = RECOGNITION_BATCH_SIZE):
+        self.max_batch = max(1, min(max_batch, 15))
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            self._client = youtube_api.speech_v2_client()
+        return self._client
+
+    def submit(self, refs: List[str], lang_code: str) -> str:
+        return youtube_api.submit_batch_recognition(self.client(), refs, lang_code)
+
+    def poll(self, operation_name: str, refs: List[str]) -> Optional[dict]:
+        return youtube_api.poll_batch_recognition(self.client(), operation_name)
+
+class SingleBackend:
+    """Speech-to-Text v1 long_running_recognize; refs are GCS URIs or local FLAC paths."""
+    name = "single"
+    max_batch = 1
+
+    def __init__(self):
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            self._client = youtube_api._lazy("speech").SpeechClient()
+        return self._client
+
+    def submit(self, refs: List[str], lang_code: str) -> str:
+        ref = refs[0]
+        if ref.startswith("gs://"):
+            operation = youtube_api.submit_recognition(self.client(), lang_code, gcs_uri=ref)
+        else:
+            operation = youtube_api.submit_recognition(self.client(), lang_code, flac_path=ref)
+        return operation.operation.name
+
+    def poll(self, operation_name: str, refs: List[str]) -> Optional[dict]:
+        transcript = youtube_api.poll_recognition(self.client(), operation_name)
+        if transcript is None:
+            return None
+        return {ref: (transcript, None) for ref in refs}
+
+def create_backend(name: str = RECOGNITION_BACKEND):
+    if name == "auto":
+        name = "batch" if os.getenv("GCS_SPEECH_BUCKET") and os.getenv("GOOGLE_CLOUD_PROJECT") else "single"
+    if name == "batch":
+        return BatchBackend()
+    if name == "single":
+        return SingleBackend()
+    raise ValueError(f"Unknown recognition backend: {name}")
+
+class RecognitionScheduler:
+    """Groups queued files into recognition requests and polls the operations from one thread.
+
+    ``on_submitted(video_ids, operation_name)`` is called once a request is
+    accepted, and ``on_result(video_id, transcript, error)`` once per file when
+    its operation finishes (or fails). Both run on the scheduler thread.
+    """
+
+    def __init__(
+        self,
+        on_submitted: Callable,
+        on_result: Callable,
+        backend=None,
+        lang_code: str = "ja-JP",
+        batch_wait: float = RECOGNITION_BATCH_WAIT_SECONDS,
+        poll_interval: float = RECOGNITION_POLL_SECONDS,
+        timeout: float = youtube_api.RECOGNITION_TIMEOUT,
+    ):
+        self.on_submitted = on_submitted
+        self.on_result = on_result
+        self._backend = backend
+        self.lang_code = lang_code
+        self.batch_wait = batch_wait
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.stats = {"submitted_files": 0, "operations": 0, "completed": 0, "failed": 0}
+        self._pending = []  # [(video_id, ref, queued_at)]
+        # operation_name -> {"refs": {ref: [video_id, ...]}, "since": 投入（または追跡開始）時刻}
+        # 同じ動画の行は同じ音声（GCS オブジェクトやキャッシュ）を指すので、1つの ref に複数の行が付く
+        self._operations: Dict[str, dict] = {}
+        self._next_poll = 0.0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = create_backend()
+        return self._backend
+
+    def _start(self):
+        if self._thread is None and not self._stopped:
+            self._thread = threading.Thread(target=self._run, name="recognition-scheduler", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, video_id: int, ref: str) -> bool:
+        """Queue prepared audio (a GCS URI, or a local path for the single backend) for recognition.
+
+        Returns False once the scheduler has stopped; the caller hands the job back.
+        """
+        with self._cond:
+            if self._stopped:
+                # 停止後に届いた音声は、再開時にチェックポイントから投入し直される
+                print(f"[Recognition] Stopped; not queueing video {video_id}")
+                return False
+            for operation in self._operations.values():
+                if ref in operation["refs"]:
+                    # 同じ音声の認識が進行中なら、その結果を待つ
+                    operation["refs"][ref].append(video_id)
+                    return True
+            self._pending.append((video_id, ref, time.monotonic()))
+            self._start()
+            self._cond.notify()
+            return True
+
+    def track(self, operation_name: str, refs: Dict[str, int]) -> bool:
+        """Resume polling an operation submitted earlier (e.g. before a restart); False once stopped."""
+        with self._cond:
+            if self._stopped:
+                return False
+            operation = self._operations.setdefault(operation_name, {"refs": {}, "since": time.monotonic()})
+            for ref, video_id in refs.items():
+                operation["refs"].setdefault(ref, []).append(video_id)
+            self._start()
+            self._cond.notify()
+            return True
+
+    def _take_batch(self, now: float) -> list:
+        if not self._pending:
+            return []
+        max_batch = self.backend.max_batch
+        distinct = len({ref for _, ref, _ in self._pending})
+        if distinct < max_batch and now - self._pending[0][2] < self.batch_wait:
+            return []
+        # 上限はファイル数で数え、同じ音声を待つ行は同じバッチに入れる
+        refs, batch, rest = set(), [], []
+        for item in self._pending:
+            if item[1] in refs or len(refs) < max_batch:
+                refs.add(item[1])
+                batch.append(item)
+            else:
+                rest.append(item)
+        self._pending = rest
+        return batch
+
+    def _wait_seconds(self, now: float) -> float:
+        waits = []
+        if self._operations:
+            waits.append(self._next_poll - now)
+        if self._pending:
+            waits.append(self._pending[0][2] + self.batch_wait - now)
+        return max(0.0, min(waits)) if waits else None
+
+    def stop(self, timeout: float = 10.0) -> List[int]:
+        """Stop submitting and polling; return the videos still waiting for a result.
+
+        A submit or poll already under way is given ``timeout`` seconds to
+        finish. The returned rows keep ``operation_name`` (or the uploaded
+        audio), so whoever resumes them re-attaches instead of paying again.
+        If the thread is still busy after ``timeout`` nothing is returned: it
+        may yet store results, so its rows are left to expire instead.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                print("[Recognition] Scheduler did not stop in time; leaving its videos to expire")
+                return []
+        video_ids = self.video_ids()
+        with self._cond:
+            self._pending, self._operations = [], {}
+        return video_ids
+
+    def video_ids(self) -> List[int]:
+        """Videos waiting for submission or for a result."""
+        with self._cond:
+            video_ids = [video_id for video_id, _, _ in self._pending]
+            for operation in self._operations.values():
+                for ref_video_ids in operation["refs"].values():
+                    video_ids.extend(ref_video_ids)
+            return video_ids
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                batch = self._take_batch(now)
+                poll_due = bool(self._operations) and now >= self._next_poll
+                if not batch and not poll_due:
+                    self._cond.wait(self._wait_seconds(now))
+                    continue
+            if batch:
+                self._submit(batch)
+            if poll_due:
+                self._poll()
+                with self._cond:
+                    self._next_poll = time.monotonic() + self.poll_interval
+
+    def _submit(self, batch: list):
+        refs = {}
+        for video_id, ref, _ in batch:
+            refs.setdefault(ref, []).append(video_id)
+        video_ids = [video_id for ref_video_ids in refs.values() for video_id in ref_video_ids]
+        try:
+            operation_name = self.backend.submit(list(refs), self.lang_code)
+        except Exception as e:
+            print(f"[Recognition] Could not submit {len(refs)} files: {e}")
+            for video_id in video_ids:
+                self._finish(video_id, None, f"Could not submit recognition: {e}")
+            return
+        print(f"[Recognition] Submitted {len(refs)} files as {operation_name}")
+        with self._cond:
+            self._operations[operation_name] = {"refs": refs, "since": time.monotonic()}
+            self.stats["submitted_files"] += len(refs)
+            self.stats["operations"] += 1
+            # 新しい操作は次の通常のポーリングで確認する
+            if len(self._operations) == 1:
+                self._next_poll = time.monotonic() + self.poll_interval
+        try:
+            self.on_submitted(video_ids, operation_name)
+        except Exception as e:
+            print(f"[Recognition] Could not record operation {operation_name}: {e}")
+
+    def _poll(self):
+        with self._cond:
+            operations = [
+                (name, {ref: list(ids) for ref, ids in op["refs"].items()}, op["since"])
+                for name, op in self._operations.items()
+            ]
+        for operation_name, refs, since in operations:
+            try:
+                results = self.backend.poll(operation_name, list(refs))
+            except Exception as e:
+                results = {ref: (None, f"Recognition failed: {e}") for ref in refs}
+            if results is None:
+                if time.monotonic() - since < self.timeout:
+                    continue
+                results = {ref: (None, "Recognition timed out") for ref in refs}
+            with self._cond:
+                # 投入後に同じ音声を待ち始めた行も含めて結果を配る
+                operation = self._operations.pop(operation_name, None)
+                if operation is not None:
+                    refs = operation["refs"]
+            for ref, video_ids in refs.items():
+                transcript, error = results.get(ref, (None, "No recognition result for this file"))
+                for video_id in video_ids:
+                    self._finish(video_id, transcript, error)
+
+    def _finish(self, video_id: int, transcript: Optional[str], error: Optional[str]):
+        with self._cond:
+            self.stats["failed" if error else "completed"] += 1
+        try:
+            self.on_result(video_id, transcript, error)
+        except Exception as e:
+            print(f"[Recognition] Could not store result for video {video_id}: {e}")
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.stats,
+                "backend": self._backend.name if self._backend else None,
+                "pending": len(self._pending),
+                "in_flight_operations": len(self._operations),
+                "in_flight_files": sum(len(op["refs"]) for op in self._operations.values()),
+                "in_flight_videos": sum(len(ids) for op in self._operations.values() for ids in op["refs"].values()),
+            }
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from src import crud, models
+from src.database import get_db
+from src.serialization import FastJSONResponse
+
+router = APIRouter()
+
+@router.get("/channels/", response_model=List[models.ChannelSchema])
+def read_channels(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return crud.get_channels(db, skip=skip, limit=limit)
+
+@router.get("/channels/{channel_id}", response_model=models.ChannelSchema)
+def read_channel(channel_id: str, db: Session = Depends(get_db)):
+    channel = crud.get_channel(db, channel_id)
+    if channel is None:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    return channel
+
+@router.get("/channels/{channel_id}/videos", response_model=List[models.VideoListSchema])
+def read_channel_videos(
+    channel_id: str,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    if db.get(models.Channel, channel_id) is None:
+        raise HTTPException(status_code=404, detail="Channel not found")
+    # 一覧と同じく文字起こし本文は読まず、列タプルから直接JSONを組み立てる
+    rows = crud.search_video_rows(db, sort_by=sort_by, sort_order=sort_order, channel_id=channel_id, skip=skip, limit=limit)
+    return FastJSONResponse(list(rows))
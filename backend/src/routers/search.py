@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+
+from src import crud, models
+from src.database import get_db
+
+router = APIRouter()
+
+@router.get("/search/semantic", response_model=List[models.ScoredVideoSchema])
+def search_semantic(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    return crud.semantic_search(db, q, limit=limit)
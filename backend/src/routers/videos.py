@@ -1,53 +1,247 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from src import crud, models
-from src.database import get_db
+from src import crud, models, transfer
+from src.jobs import client_key, executors
+from src.cache import query_cache
+from src.database import get_db, get_read_db, read_sessionmaker, SessionLocal
+from src.compression import etag_matches, make_etag
+from src.serialization import FastJSONResponse, dumps, streaming_json_response
+
+# キャッシュなしで一覧を返すときに一度に取得する行数
+STREAM_BATCH_SIZE = 200
 
 router = APIRouter()
 
+def _queue_transcription(db: Session, request: Request, response: Response, video_id: int, previous: Optional[dict] = None):
+    # 受付後に枠が埋まっていた場合は processing を取り消してから 429 を返す。
+    # この依頼で作成した行（previous なし）は削除し、再試行で同じ動画の行が重複しないようにする。
+    # 既存の行は依頼前の状態に戻す
+    try:
+        position = executors["high_quality"].submit(client_key(request), video_id, crud.run_high_quality_transcription, video_id)
+    except HTTPException as e:
+        if e.status_code == 503:
+            # 停止処理中に受け付けた分は、他のレプリカが再開できるよう引き渡す
+            crud.mark_transcriptions_interrupted([video_id])
+            return
+        if previous is None:
+            crud.delete_video(db, video_id)
+        else:
+            crud.mark_transcription_rejected(db, video_id, previous)
+        raise
+    response.headers["X-Queue-Position"] = str(position)
+
+def _with_delta(db: Session, video_id: int, **changes) -> Response:
+    # ?delta=true のときは一覧への差分とタグ件数を添え、クライアントが再取得せずに済むようにする
+    return FastJSONResponse({**crud.get_video_dict(db, video_id), "delta": crud.get_list_delta(db, **changes)})
+
+@router.get("/bootstrap")
+def read_bootstrap(
+    request: Request,
+    sort_by: str = "id",
+    sort_order: str = "asc",
+    limit: int = Query(crud.BOOTSTRAP_PAGE_SIZE, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+):
+    """Everything the main page needs on load: first page of videos, tag counts and the data version."""
+    return _etag_json_response(request, crud.get_bootstrap(db, sort_by, sort_order, limit))
+
 @router.post("/videos/", response_model=models.VideoSchema)
-def create_video(video: models.VideoCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    db_video = crud.create_video(db=db, video=video)
+def create_video(video: models.VideoCreate, request: Request, response: Response, background_tasks: BackgroundTasks, delta: bool = False, db: Session = Depends(get_db)):
+    executor, client = executors["high_quality"], client_key(request)
+    # 高品質文字起こしの依頼は YouTube API を呼ぶ前に受け付け可能か確認する。
+    # auto は字幕で済むかどうかが分かってから、行を作る直前に確認する
+    if video.transcriptionOption == 'high_quality':
+        executor.admit(client)
+    db_video = crud.create_video(db=db, video=video, admit=lambda: executor.admit(client))
     
-    # If high-quality transcription is requested, run it in the background
+    # If high-quality transcription is requested, run it on the bounded job executor
     if db_video.status == 'processing':
-        background_tasks.add_task(crud.run_high_quality_transcription, db_video.id)
-        
+        _queue_transcription(db, request, response, db_video.id)
+        db.refresh(db_video)
+    else:
+        background_tasks.add_task(crud.index_video_embeddings, [db_video.id])
+
+    if delta:
+        result = _with_delta(db, db_video.id, upserted=[db_video.id])
+        if "X-Queue-Position" in response.headers:
+            result.headers["X-Queue-Position"] = response.headers["X-Queue-Position"]
+        return result
     return db_video
 
-@router.get("/videos/", response_model=List[models.VideoSchema])
+@router.get("/videos/", response_model=List[models.VideoListSchema])
 def read_videos(
+    request: Request,
     title_query: Optional[str] = None, 
     tags_query: Optional[str] = None, 
     sort_by: str = "id", 
     sort_order: str = "asc",
-    db: Session = Depends(get_db)
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_read_db)
 ):
-    return crud.search_videos(db, title_query, tags_query, sort_by, sort_order)
+    # ORMオブジェクトとPydanticの再検証を通さず、列タプルから直接JSONを組み立てる
+    if query_cache.enabled:
+        return FastJSONResponse(crud.search_videos_cached(db, title_query, tags_query, sort_by, sort_order, skip=skip, limit=limit))
+    return streaming_json_response(_stream_rows(read_sessionmaker(request), title_query, tags_query, sort_by, sort_order, skip, limit))
+
+def _stream_rows(session_factory, title_query, tags_query, sort_by, sort_order, skip, limit):
+    # レスポンス送信中もカーソルを保持するため、依存性注入とは別にセッションを開く
+    db = session_factory()
+    try:
+        yield from crud.search_video_rows(
+            db, title_query, tags_query, sort_by, sort_order,
+            skip=skip, limit=limit, batch_size=STREAM_BATCH_SIZE,
+        )
+    finally:
+        db.close()
+
+def _stream_export(fmt: str):
+    # レスポンス送信中もカーソルを保持するため、依存性注入とは別にセッションを開く
+    db = SessionLocal()
+    try:
+        if fmt == "parquet":
+            yield from transfer.iter_parquet(db)
+        else:
+            yield from transfer.iter_ndjson(db)
+    finally:
+        db.close()
+
+# /videos/{video_id} より先に定義すること
+@router.get("/videos/export")
+def export_videos(format: str = "ndjson"):
+    if format not in transfer.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    if format == "parquet":
+        try:
+            transfer._pyarrow()
+        except RuntimeError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+        media_type = "application/vnd.apache.parquet"
+    else:
+        media_type = "application/x-ndjson"
+    return StreamingResponse(
+        _stream_export(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="videos.{format}"'},
+    )
+
+@router.post("/videos/import")
+def import_videos(background_tasks: BackgroundTasks, format: str = "ndjson", file: UploadFile = File(...), db: Session = Depends(get_db)):
+    if format not in transfer.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    ids = []
+    try:
+        count = transfer.import_file(db, file.file, format, ids=ids)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # 要約・重複判定・埋め込みは応答後にまとめて計算する
+    background_tasks.add_task(crud.process_imported_videos, ids)
+    return {"imported": count}
+
+@router.post("/videos/batch/tags", response_model=models.BatchResult)
+def batch_update_tags(batch: models.BatchTagUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    results = crud.batch_update_tags(db, batch, batch.add, batch.remove)
+    updated = [r["id"] for r in results if r["status"] == "updated"]
+    if updated:
+        background_tasks.add_task(crud.index_video_embeddings, updated)
+    return {"results": results}
+
+@router.post("/videos/batch/delete", response_model=models.BatchResult)
+def batch_delete_videos(selection: models.VideoSelection, db: Session = Depends(get_db)):
+    return {"results": crud.batch_delete_videos(db, selection)}
+
+@router.post("/videos/batch/transcribe", response_model=models.BatchResult)
+def batch_transcribe_videos(selection: models.VideoSelection, request: Request, response: Response, db: Session = Depends(get_db)):
+    executor = executors["high_quality"]
+    executor.ensure_accepting()
+    client = client_key(request)
+    # キューの空き枠を超えた分は rejected として返し、状態は変更しない
+    results, queued = crud.batch_request_transcription(db, selection, limit=executor.capacity(client))
+    for video_id, previous in queued.items():
+        try:
+            executor.submit(client, video_id, crud.run_high_quality_transcription, video_id)
+        except HTTPException:
+            crud.mark_transcription_rejected(db, video_id, previous)
+            results = [
+                {"id": video_id, "status": "rejected", "detail": "Transcription queue is full"} if r["id"] == video_id else r
+                for r in results
+            ]
+    if any(r["status"] == "rejected" for r in results):
+        response.headers["Retry-After"] = str(executor.retry_after(executor.max_queue_per_client))
+    return {"results": results}
+
+def _etag_json_response(request: Request, body: bytes) -> Response:
+    # 完了済みの文字起こしは ETag で再検証させ、圧縮済みの本文もこの ETag でキャッシュする
+    etag = make_etag(body)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return FastJSONResponse(body, headers={"ETag": etag})
 
 @router.get("/videos/{video_id}", response_model=models.VideoSchema)
-def read_video(video_id: int, db: Session = Depends(get_db)):
-    db_video = crud.get_video(db, video_id=video_id)
-    if db_video is None:
+def read_video(video_id: int, request: Request, db: Session = Depends(get_read_db)):
+    video = crud.get_video_dict(db, video_id)
+    if video is None:
         raise HTTPException(status_code=404, detail="Video not found")
-    return db_video
+    if video["status"] == "completed":
+        return _etag_json_response(request, dumps(video))
+    return FastJSONResponse(video)
 
 @router.put("/videos/{video_id}", response_model=models.VideoSchema)
-def update_video(video_id: int, video: models.VideoUpdate, db: Session = Depends(get_db)):
+def update_video(video_id: int, video: models.VideoUpdate, background_tasks: BackgroundTasks, delta: bool = False, db: Session = Depends(get_db)):
     db_video = crud.update_video(db=db, video_id=video_id, video=video)
     if db_video is None:
         raise HTTPException(status_code=404, detail="Video not found")
+    background_tasks.add_task(crud.index_video_embeddings, [db_video.id])
+    if delta:
+        return _with_delta(db, db_video.id, upserted=[db_video.id])
     return db_video
 
 @router.delete("/videos/{video_id}")
-def delete_video(video_id: int, db: Session = Depends(get_db)):
+def delete_video(video_id: int, delta: bool = False, db: Session = Depends(get_db)):
     db_video = crud.delete_video(db, video_id=video_id)
     if db_video is None:
         raise HTTPException(status_code=404, detail="Video not found")
+    if delta:
+        return {"message": "Video deleted successfully", "delta": crud.get_list_delta(db, removed=[video_id])}
     return {"message": "Video deleted successfully"}
 
+@router.post("/videos/{video_id}/transcribe", response_model=models.VideoSchema)
+def transcribe_video(video_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    executors["high_quality"].admit(client_key(request))
+    # 失敗したジョブは最後に完了した段階から再開する
+    db_video = crud.get_video(db, video_id)
+    if db_video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    previous = crud.transcription_state(db_video)
+    db_video = crud.request_transcription(db, video_id)
+    if db_video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    _queue_transcription(db, request, response, db_video.id, previous)
+    db.refresh(db_video)
+    return db_video
+
+@router.get("/videos/{video_id}/related", response_model=List[models.ScoredVideoSchema])
+def read_related_videos(video_id: int, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    related = crud.get_related_videos(db, video_id, limit=limit)
+    if related is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return related
+
+@router.get("/videos/{video_id}/duplicates", response_model=List[models.DuplicateVideoSchema])
+def read_duplicate_videos(video_id: int, limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    duplicates = crud.get_duplicate_videos(db, video_id, limit=limit)
+    if duplicates is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return duplicates
+
 @router.get("/videos/{video_id}/transcript", response_model=dict)
-def read_transcript(video_id: int, db: Session = Depends(get_db)):
-    return crud.get_or_create_transcript(db, video_id=video_id)
\ No newline at end of file
+def read_transcript(video_id: int, request: Request, db: Session = Depends(get_read_db)):
+    transcript = crud.get_or_create_transcript(db, video_id=video_id)
+    if transcript["status"] == "completed":
+        return _etag_json_response(request, dumps(transcript))
+    return transcript
\ No newline at end of file
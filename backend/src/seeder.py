@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from src.database import SessionLocal
 from src.models import Video
-from src.youtube_api import extract_video_id, get_youtube_video_details
+from src.youtube_api import extract_video_id, get_youtube_video_metadata
+from src.crud import upsert_channel
 
 def seed_data():
     db = SessionLocal()
@@ -33,12 +34,16 @@ def seed_data():
             for video_data in videos_to_seed:
                 video_id_yt = extract_video_id(video_data["url"])
                 if video_id_yt:
-                    title, channel_name = get_youtube_video_details(video_id_yt)
-                    if title and channel_name:
+                    metadata = get_youtube_video_metadata(video_id_yt)
+                    if metadata:
+                        title, channel_name = metadata["title"], metadata["channel_name"]
+                        channel = upsert_channel(db, metadata["channel_id"], channel_name)
                         db_video = Video(
                             url=video_data["url"],
                             title=title,
                             channel_name=channel_name,
+                            channel_id=channel.id if channel else None,
+                            duration_seconds=metadata["duration_seconds"],
                             tags=video_data["tags"],
                             memo=video_data["memo"],
                             status='completed' # Default status for seeded data
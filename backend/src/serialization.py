@@ -0,0 +1,65 @@
+"""Fast JSON response path.
+
+Rows are read as column tuples (no ORM objects) and encoded with orjson,
+skipping Pydantic re-validation. Large lists can be streamed row by row.
+"""
+import json
+from datetime import date, datetime
+from typing import Iterable, Iterator
+
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is a declared dependency
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+def iter_json_array(rows: Iterable[dict]) -> Iterator[bytes]:
+    """Encode rows as a JSON array, one element per chunk."""
+    yield b"["
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield dumps(row)
+        else:
+            yield b"," + dumps(row)
+    yield b"]"
+
+def streaming_json_response(rows: Iterable[dict]) -> StreamingResponse:
+    return StreamingResponse(iter_json_array(rows), media_type="application/json")
+
+def schema_columns(schema, model):
+    """Map the fields of a Pydantic schema to model columns (None for non-column fields)."""
+    return [(name, getattr(model, name, None)) for name in schema.model_fields]
+
+def rows_to_dicts(rows, fields) -> Iterator[dict]:
+    """Turn column tuples selected with ``schema_columns`` into response dicts."""
+    names = [name for name, _ in fields]
+    present = [column is not None for _, column in fields]
+    for row in rows:
+        values = iter(row)
+        yield {name: (next(values) if has_column else None) for name, has_column in zip(names, present)}
@@ -0,0 +1,116 @@
+"""Extractive summarization of transcripts (CPU only, no LLM).
+
+Sentences are weighted with TF-IDF over word tokens and CJK character bigrams,
+ranked with TextRank over their cosine-similarity graph, and the top-ranked
+sentences are returned in their original order.
+"""
+import math
+import os
+import re
+from typing import List, Optional
+
+import numpy as np
+from scipy import sparse
+
+SUMMARY_MAX_SENTENCES = int(os.getenv("SUMMARY_MAX_SENTENCES", "5"))
+SUMMARY_RATIO = float(os.getenv("SUMMARY_RATIO", "0.1"))
+# 句読点のない自動字幕はこの長さで区切って「文」として扱う
+MAX_SENTENCE_CHARS = 120
+
+_SENTENCE_END = re.compile(r'(?<=[。．！？!?])|(?<=[.])\s+|\n+')
+_CJK = r'぀-ヿ㐀-䶿一-鿿ｦ-ﾟ'
+_TOKEN = re.compile(rf'[{_CJK}]+|[^\W{_CJK}_]+', re.UNICODE)
+_CJK_RUN = re.compile(rf'^[{_CJK}]+$')
+_CJK_END = re.compile(rf'[{_CJK}。．！？]$')
+
+def _chunk(text: str) -> List[str]:
+    # 長すぎる文は空白位置でおおよそ MAX_SENTENCE_CHARS ごとに区切る
+    if len(text) <= MAX_SENTENCE_CHARS:
+        return [text]
+    chunks, current = [], ""
+    for word in text.split(" "):
+        if current and len(current) + len(word) + 1 > MAX_SENTENCE_CHARS:
+            chunks.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        chunks.append(current)
+    # 空白のない長文（日本語など）は文字数で区切る
+    return [piece[i:i + MAX_SENTENCE_CHARS] for piece in chunks for i in range(0, len(piece), MAX_SENTENCE_CHARS)]
+
+def split_sentences(text: str) -> List[str]:
+    """Split Japanese/English text into sentences."""
+    sentences = []
+    for part in _SENTENCE_END.split(text or ""):
+        part = part.strip() if part else ""
+        if part:
+            sentences.extend(_chunk(part))
+    return sentences
+
+def _tokens(sentence: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall(sentence.lower()):
+        if _CJK_RUN.match(token):
+            # 日本語は分かち書きせず文字バイグラムを特徴量にする
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif len(token) > 1:
+            tokens.append(token)
+    return tokens
+
+def _tfidf_matrix(sentences: List[str]) -> sparse.csr_matrix:
+    vocabulary = {}
+    indptr, indices = [0], []
+    for sentence in sentences:
+        for token in _tokens(sentence):
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    # 重複する (行, 列) は sum_duplicates で語頻度になる
+    tf = sparse.csr_matrix((data, np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                           shape=(len(sentences), max(len(vocabulary), 1)))
+    tf.sum_duplicates()
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    idf = np.log((1 + len(sentences)) / (1 + df)).astype(np.float32) + 1.0
+    tfidf = tf.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(tfidf).tocsr()
+
+def textrank_scores(matrix: sparse.csr_matrix, damping: float = 0.85, max_iter: int = 100, tol: float = 1e-6) -> np.ndarray:
+    n = matrix.shape[0]
+    similarity = matrix.dot(matrix.T).toarray()
+    np.fill_diagonal(similarity, 0.0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # 孤立した文は全体に一様に遷移させる
+    transition = np.divide(similarity, row_sums, out=np.full_like(similarity, 1.0 / n), where=row_sums > 0)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = (1 - damping) / n + damping * transition.T.dot(scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+def summarize(text: Optional[str], max_sentences: int = SUMMARY_MAX_SENTENCES, ratio: float = SUMMARY_RATIO) -> Optional[str]:
+    """Return an extractive summary of ``text``, or None if there is nothing to summarize."""
+    sentences = split_sentences(text)
+    if not sentences:
+        return None
+    count = max(1, min(max_sentences, math.ceil(len(sentences) * ratio)))
+    if len(sentences) <= count:
+        selected = sentences
+    else:
+        scores = textrank_scores(_tfidf_matrix(sentences))
+        top = np.argsort(-scores, kind="stable")[:count]
+        selected = [sentences[i] for i in sorted(top)]
+
+    summary = ""
+    for sentence in selected:
+        if summary and not _CJK_END.search(summary):
+            summary += " "
+        summary += sentence
+    return summary
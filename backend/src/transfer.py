@@ -0,0 +1,262 @@
+"""Bulk export/import of videos as NDJSON or Parquet.
+
+Exports stream rows with a server-side cursor (``yield_per``) so memory stays
+constant regardless of table size. Imports insert in batches; summaries,
+duplicate signatures and embeddings of the imported rows are computed
+afterwards by ``crud.process_imported_videos``.
+
+CLI (from the backend directory):
+    python -m src.transfer export --format ndjson -o videos.ndjson
+    python -m src.transfer import --format parquet -i videos.parquet
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import query_cache
+
+BATCH_SIZE = int(os.getenv("TRANSFER_BATCH_SIZE", "500"))
+FORMATS = ("ndjson", "parquet")
+
+EXPORT_COLUMNS = [
+    models.Video.id,
+    models.Video.url,
+    models.Video.title,
+    models.Video.channel_name,
+    models.Video.channel_id,
+    models.Video.duration_seconds,
+    models.Video.tags,
+    models.Video.memo,
+    models.Video.transcript,
+    models.Video.summary,
+    models.Video.transcript_source,
+    models.Video.status,
+    models.Video.created_at,
+    models.Video.updated_at,
+]
+# インポート時は id を採番し直す
+IMPORT_FIELDS = ["url", "title", "channel_name", "channel_id", "duration_seconds", "tags", "memo", "transcript", "summary", "transcript_source", "status", "created_at", "updated_at"]
+REQUIRED_FIELDS = ["url", "title", "channel_name"]
+# 実行中だったジョブは移行先では誰も完了させないので、再実行できる失敗として取り込む
+UNFINISHED_STATUSES = ("processing", "interrupted")
+
+def iter_video_rows(db: Session, batch_size: int = BATCH_SIZE) -> Iterator[dict]:
+    """Yield every video as a dict, fetching ``batch_size`` rows at a time."""
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .order_by(models.Video.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.execute(stmt):
+        yield row._asdict()
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def iter_ndjson(db: Session, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    for row in iter_video_rows(db, batch_size):
+        yield (json.dumps(row, ensure_ascii=False, default=_json_default) + "\n").encode("utf-8")
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Parquet support requires the 'pyarrow' package.") from e
+    return pyarrow, pyarrow.parquet
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("url", pa.string()),
+        ("title", pa.string()),
+        ("channel_name", pa.string()),
+        ("channel_id", pa.string()),
+        ("duration_seconds", pa.int64()),
+        ("tags", pa.string()),
+        ("memo", pa.string()),
+        ("transcript", pa.string()),
+        ("summary", pa.string()),
+        ("transcript_source", pa.string()),
+        ("status", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+def _batched(rows: Iterable[dict], batch_size: int) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class _ChunkSink:
+    """Minimal writable file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_parquet(db: Session, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    """Yield a Parquet file in chunks, one row group per batch."""
+    pa, pq = _pyarrow()
+    schema = _parquet_schema(pa)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _batched(iter_video_rows(db, batch_size), batch_size):
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = sink.drain()
+    if data:
+        yield data
+
+def _normalize_import_row(row: dict) -> dict:
+    if not isinstance(row, dict):
+        raise ValueError(f"Each row must be a JSON object, got {type(row).__name__}")
+    missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    values = {field: row.get(field) for field in IMPORT_FIELDS if row.get(field) is not None}
+    for field in ("created_at", "updated_at"):
+        if isinstance(values.get(field), str):
+            values[field] = datetime.fromisoformat(values[field])
+    values.setdefault("status", "completed")
+    if values["status"] in UNFINISHED_STATUSES:
+        values["status"] = "failed"
+    return values
+
+def _ensure_channels(db: Session, batch: list):
+    # channel_id は channels への外部キーなので、未登録のチャンネルを先に作る
+    channels = {row["channel_id"]: row["channel_name"] for row in batch if row.get("channel_id")}
+    if not channels:
+        return
+    existing = {channel_id for (channel_id,) in db.query(models.Channel.id).filter(models.Channel.id.in_(channels))}
+    missing = [{"id": channel_id, "title": title} for channel_id, title in channels.items() if channel_id not in existing]
+    if missing:
+        db.execute(insert(models.Channel), missing)
+
+def import_rows(db: Session, rows: Iterable[dict], batch_size: int = BATCH_SIZE, ids: Optional[list] = None) -> int:
+    """Insert rows in batches within one transaction. Returns the number inserted.
+
+    The new video IDs are appended to ``ids`` when given.
+    """
+    count = 0
+    try:
+        for batch in _batched((_normalize_import_row(row) for row in rows), batch_size):
+            _ensure_channels(db, batch)
+            inserted = db.execute(insert(models.Video).returning(models.Video.id), batch).scalars().all()
+            if ids is not None:
+                ids.extend(inserted)
+            count += len(batch)
+        db.commit()
+        query_cache.bump_version()
+    except Exception:
+        db.rollback()
+        raise
+    return count
+
+def iter_ndjson_rows(lines: Iterable) -> Iterator[dict]:
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def iter_parquet_rows(source, batch_size: int = BATCH_SIZE) -> Iterator[dict]:
+    _, pq = _pyarrow()
+    parquet_file = pq.ParquetFile(source)
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield from record_batch.to_pylist()
+
+def import_file(db: Session, fileobj, fmt: str, batch_size: int = BATCH_SIZE, ids: Optional[list] = None) -> int:
+    if fmt == "ndjson":
+        rows = iter_ndjson_rows(fileobj)
+    elif fmt == "parquet":
+        rows = iter_parquet_rows(fileobj, batch_size)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+    return import_rows(db, rows, batch_size, ids)
+
+def export_to_file(db: Session, fileobj, fmt: str, batch_size: int = BATCH_SIZE) -> None:
+    if fmt == "ndjson":
+        chunks = iter_ndjson(db, batch_size)
+    elif fmt == "parquet":
+        chunks = iter_parquet(db, batch_size)
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+    for chunk in chunks:
+        fileobj.write(chunk)
+
+def main(argv: Optional[list] = None):
+    from .crud import process_imported_videos
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export or import videos in bulk.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    export_parser.add_argument("-o", "--output", default="-", help="Output path ('-' for stdout)")
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    import_parser.add_argument("-i", "--input", required=True, help="Input path")
+    for sub in (export_parser, import_parser):
+        sub.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "export":
+            if args.output == "-":
+                export_to_file(db, sys.stdout.buffer, args.format, args.batch_size)
+            else:
+                with open(args.output, "wb") as f:
+                    export_to_file(db, f, args.format, args.batch_size)
+        else:
+            ids = []
+            with open(args.input, "rb") as f:
+                count = import_file(db, f, args.format, args.batch_size, ids)
+            print(f"Imported {count} videos.", file=sys.stderr)
+            process_imported_videos(ids)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
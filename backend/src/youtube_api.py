@@ -3,133 +3,445 @@ import re
 import shutil
 import tempfile
 import subprocess
-import yt_dlp
-from google.cloud import speech
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from youtube_transcript_api import YouTubeTranscriptApi
-from google.cloud import storage
+import importlib
+import time
+from typing import Optional
 
-def get_youtube_video_details(video_id: str):
+# 重いSDK（yt-dlp, Google Cloud, googleapiclient）は初回利用時に読み込む。
+# Webレプリカの起動時間を短くするため、モジュール読み込み時には import しない。
+_LAZY_IMPORTS = {
+    "yt_dlp": ("yt_dlp", None),
+    "speech": ("google.cloud.speech", None),
+    "speech_v2": ("google.cloud.speech_v2", None),
+    "storage": ("google.cloud.storage", None),
+    "build": ("googleapiclient.discovery", "build"),
+    "HttpError": ("googleapiclient.errors", "HttpError"),
+    "YouTubeTranscriptApi": ("youtube_transcript_api", "YouTubeTranscriptApi"),
+}
+
+def _lazy(name: str):
+    """Return a lazily imported SDK object, importing it on first use.
+
+    The value is cached in the module globals so that later lookups (and
+    ``unittest.mock.patch`` on ``src.youtube_api.<name>``) see the same object.
+    """
+    if name in globals():
+        return globals()[name]
+    module_name, attr = _LAZY_IMPORTS[name]
+    module = importlib.import_module(module_name)
+    value = getattr(module, attr) if attr else module
+    globals()[name] = value
+    return value
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _parse_iso8601_duration(value: str):
+    # YouTube の contentDetails.duration（例: PT1H2M3S）を秒に変換する
+    if not value:
+        return None
+    match = re.fullmatch(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?', value)
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def get_youtube_video_metadata(video_id: str):
+    """Fetch title, channel and duration for a video in a single API call.
+
+    Returns a dict with ``title``, ``channel_id``, ``channel_name`` and
+    ``duration_seconds``, or None if the video was not found.
+    """
     youtube_api_key = os.getenv("YOUTUBE_API_KEY")
     if not youtube_api_key:
         raise ValueError("YouTube API key is not set.")
     
+    build = _lazy("build")
+    HttpError = _lazy("HttpError")
     youtube = build('youtube', 'v3', developerKey=youtube_api_key)
     
     try:
         request = youtube.videos().list(
-            part="snippet",
+            part="snippet,contentDetails",
             id=video_id
         )
         response = request.execute()
         
         if not response.get("items"):
-            return None, None
+            return None
 
-        video_snippet = response["items"][0]["snippet"]
-        title = video_snippet["title"]
-        channel_title = video_snippet["channelTitle"]
-        
-        return title, channel_title
+        item = response["items"][0]
+        video_snippet = item["snippet"]
+        return {
+            "title": video_snippet["title"],
+            "channel_id": video_snippet.get("channelId"),
+            "channel_name": video_snippet["channelTitle"],
+            "duration_seconds": _parse_iso8601_duration(item.get("contentDetails", {}).get("duration")),
+        }
         
     except HttpError as e:
         print(f"An HTTP error {e.resp.status} occurred: {e.content}")
+        return None
+
+def get_youtube_video_details(video_id: str):
+    metadata = get_youtube_video_metadata(video_id)
+    if not metadata:
         return None, None
+    return metadata["title"], metadata["channel_name"]
+
+# 文字起こしジョブのチェックポイント（この順に進む）
+STAGES = ["downloaded", "converted", "uploaded", "submitted"]
+RECOGNITION_TIMEOUT = int(os.getenv("RECOGNITION_TIMEOUT", "3600"))
+
+def _stage_reached(checkpoint: dict, stage: str) -> bool:
+    current = (checkpoint or {}).get("stage")
+    return current in STAGES and STAGES.index(current) >= STAGES.index(stage)
+
+# 音声のダウンロード設定
+# 音声認識には 16kHz モノラルで足りるので、条件を満たす最小の音声のみストリームを選ぶ。
+# abr が不明な形式も候補に残し（>=?）、音声のみがなければ最小の動画付き形式を使う。
+DOWNLOAD_FORMAT = os.getenv("DOWNLOAD_FORMAT", "wa[abr>=?32]/wa/w")
+DOWNLOAD_CONCURRENT_FRAGMENTS = int(os.getenv("DOWNLOAD_CONCURRENT_FRAGMENTS", "4"))
+DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(200 * 1024 ** 2)))
+DOWNLOAD_MAX_DURATION_SECONDS = int(os.getenv("DOWNLOAD_MAX_DURATION_SECONDS", str(4 * 3600)))
+# 途中まで落とした .part ファイルは再試行で再開できるよう残す。この秒数を過ぎたものは削除する
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", os.path.join(tempfile.gettempdir(), "summaryoutube-downloads"))
+DOWNLOAD_PARTIAL_TTL_SECONDS = int(os.getenv("DOWNLOAD_PARTIAL_TTL_SECONDS", str(24 * 3600)))
+
+class DownloadLimitExceeded(Exception):
+    pass
 
-def get_transcript_from_youtube(video_id: str):
+def _sweep_stale_downloads(root: str, keep: str):
     try:
-        api = YouTubeTranscriptApi()
-        transcript_list = api.fetch(video_id, languages=['ja', 'en'])
-        transcript = " ".join([item['text'] for item in transcript_list.to_raw_data()])
-        return transcript
-    except Exception as e:
-        print(f"Could not retrieve transcript for video {video_id}: {e}")
+        entries = os.listdir(root)
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - DOWNLOAD_PARTIAL_TTL_SECONDS
+    for name in entries:
+        path = os.path.join(root, name)
+        try:
+            if path != keep and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+def download_dir(video_id: str, job_id: Optional[int] = None) -> str:
+    """Per-job download directory; kept across retries so partial downloads resume.
+
+    Keyed by the video row id when given, so two rows transcribing the same
+    YouTube video never write to (or delete) each other's files.
+    """
+    return os.path.join(DOWNLOAD_DIR, video_id if job_id is None else f"{job_id}-{video_id}")
+
+def download_audio(video_id: str, work_dir: str, stats: dict = None) -> str:
+    """Download the smallest speech-quality audio stream into ``work_dir``.
+
+    Partial ``.part`` files left by an earlier attempt are resumed. Raises
+    ``DownloadLimitExceeded`` when the video is longer than
+    ``DOWNLOAD_MAX_DURATION_SECONDS`` or the download grows past
+    ``DOWNLOAD_MAX_BYTES``. ``stats`` receives ``download_bytes`` and
+    ``download_seconds``.
+    """
+    yt_dlp = _lazy("yt_dlp")
+    video_url = f"https://www.youtube.com/watch?v={video_id}"
+    os.makedirs(work_dir, exist_ok=True)
+    _sweep_stale_downloads(os.path.dirname(work_dir), keep=work_dir)
+    rejected = []
+    received = {}
+
+    def check_duration(info, *, incomplete=False):
+        duration = info.get("duration")
+        if duration and duration > DOWNLOAD_MAX_DURATION_SECONDS:
+            reason = f"Video is {int(duration)}s long; the limit is {DOWNLOAD_MAX_DURATION_SECONDS}s"
+            rejected.append(reason)
+            return reason
         return None
 
-def get_high_quality_transcript(video_id: str, lang_code: str = "ja-JP"):
-    audio_path = None
-    temp_dir = None
-    try:
-        temp_dir = tempfile.mkdtemp()
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
-        
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'wav', 'preferredquality': '192'}],
-            'outtmpl': os.path.join(temp_dir, '%(id)s.%(ext)s'),
-            'quiet': True,
-        }
+    def check_progress(progress):
+        # 断片ごとのダウンロードではファイルサイズが事前に分からないので、受信量でも打ち切る
+        received[progress.get("filename")] = progress.get("downloaded_bytes") or 0
+        if sum(received.values()) > DOWNLOAD_MAX_BYTES:
+            raise DownloadLimitExceeded(f"Download exceeded {DOWNLOAD_MAX_BYTES} bytes")
+
+    ydl_opts = {
+        'format': DOWNLOAD_FORMAT,
+        'outtmpl': os.path.join(work_dir, '%(id)s.%(ext)s'),
+        'concurrent_fragment_downloads': DOWNLOAD_CONCURRENT_FRAGMENTS,
+        'continuedl': True,
+        'max_filesize': DOWNLOAD_MAX_BYTES,
+        'match_filter': check_duration,
+        'progress_hooks': [check_progress],
+        'quiet': True,
+        'noprogress': True,
+    }
 
-        print(f"Downloading audio for video: {video_id}")
+    print(f"Downloading audio for video: {video_id}")
+    started = time.monotonic()
+    try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
-        
-        audio_path = os.path.join(temp_dir, f"{video_id}.wav")
-        print(f"Audio downloaded to: {audio_path}")
-
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError("Audio file was not created.")
-
-        # 1) ffmpeg で 16kHz / mono / FLAC に変換してサイズ削減
-        flac_path = os.path.join(temp_dir, f"{video_id}.flac")
-        print("Converting audio to 16kHz mono FLAC...")
-        subprocess.run([
-            "ffmpeg", "-y", "-i", audio_path,
-            "-ac", "1", "-ar", "16000", "-c:a", "flac",
-            flac_path
-        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        # 2) 環境変数 GCS_SPEECH_BUCKET があれば GCS にアップロードして URI で認識
-        bucket_name = os.getenv("GCS_SPEECH_BUCKET")
-        client = speech.SpeechClient()
-        if bucket_name:
-            print(f"Uploading audio to GCS bucket: {bucket_name}")
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(bucket_name)
-            blob_path = f"speech/{video_id}.flac"
-            blob = bucket.blob(blob_path)
-            blob.upload_from_filename(flac_path, content_type="audio/flac")
-
-            gcs_uri = f"gs://{bucket_name}/{blob_path}"
-            audio = speech.RecognitionAudio(uri=gcs_uri)
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.FLAC,
-                sample_rate_hertz=16000,
-                language_code=lang_code,
-                enable_automatic_punctuation=True
-            )
-            print("Transcribing from GCS URI with long_running_recognize...")
-            operation = client.long_running_recognize(config=config, audio=audio)
-            print("Waiting for transcription to complete...")
-            response = operation.result(timeout=3600)
+            info = ydl.extract_info(video_url, download=True)
+        if rejected:
+            raise DownloadLimitExceeded(rejected[0])
+    except DownloadLimitExceeded:
+        # 上限を超えた .part ファイルを再試行で再開しないよう削除する
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+    elapsed = time.monotonic() - started
+
+    downloads = (info or {}).get("requested_downloads") or [{}]
+    audio_path = downloads[0].get("filepath")
+    if not audio_path or not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file was not created (limit {DOWNLOAD_MAX_BYTES} bytes).")
+    size = os.path.getsize(audio_path)
+    print(f"Audio downloaded to: {audio_path} ({size} bytes, {downloads[0].get('format_id')}, {elapsed:.1f}s)")
+    if stats is not None:
+        stats.update(download_bytes=size, download_seconds=round(elapsed, 3))
+    return audio_path
+
+def convert_to_flac(audio_path: str, flac_path: str) -> str:
+    # ffmpeg で 16kHz / mono / FLAC に変換してサイズ削減（動画付き形式の場合は映像を捨てる）
+    print("Converting audio to 16kHz mono FLAC...")
+    subprocess.run([
+        "ffmpeg", "-y", "-i", audio_path,
+        "-vn", "-ac", "1", "-ar", "16000", "-c:a", "flac",
+        flac_path
+    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return flac_path
+
+def upload_audio(flac_path: str, bucket_name: str, video_id: str) -> str:
+    storage = _lazy("storage")
+    print(f"Uploading audio to GCS bucket: {bucket_name}")
+    storage_client = storage.Client()
+    bucket = storage_client.bucket(bucket_name)
+    blob_path = f"speech/{video_id}.flac"
+    blob = bucket.blob(blob_path)
+    blob.upload_from_filename(flac_path, content_type="audio/flac")
+    return f"gs://{bucket_name}/{blob_path}"
+
+def _recognition_config(lang_code: str):
+    speech = _lazy("speech")
+    return speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.FLAC,
+        sample_rate_hertz=16000,
+        language_code=lang_code,
+        enable_automatic_punctuation=True
+    )
+
+def submit_recognition(client, lang_code: str, gcs_uri: str = None, flac_path: str = None):
+    speech = _lazy("speech")
+    if gcs_uri:
+        print("Transcribing from GCS URI with long_running_recognize...")
+        audio = speech.RecognitionAudio(uri=gcs_uri)
+    else:
+        # フォールバック: 直接 content 送信（10MB制限に注意）
+        print("GCS_SPEECH_BUCKET not set; falling back to direct content upload.")
+        with open(flac_path, "rb") as audio_file:
+            content = audio_file.read()
+        audio = speech.RecognitionAudio(content=content)
+    return client.long_running_recognize(config=_recognition_config(lang_code), audio=audio)
+
+def attach_recognition(client, operation_name: str):
+    """Re-attach to a long-running recognition submitted earlier."""
+    speech = _lazy("speech")
+    from google.api_core import operation as ga_operation
+
+    operations_client = client.transport.operations_client
+    raw_operation = operations_client.get_operation(operation_name)
+    return ga_operation.from_gapic(
+        raw_operation,
+        operations_client,
+        speech.LongRunningRecognizeResponse,
+        metadata_type=speech.LongRunningRecognizeMetadata,
+    )
+
+def collect_transcript(response) -> str:
+    return "".join(result.alternatives[0].transcript for result in response.results if result.alternatives)
+
+def poll_recognition(client, operation_name: str):
+    """Return the transcript of a finished v1 operation, or None while it is still running."""
+    operation = attach_recognition(client, operation_name)
+    if not operation.done():
+        return None
+    return collect_transcript(operation.result())
+
+# Speech-to-Text v2 の batch_recognize（複数ファイルを1つの操作で認識する）
+SPEECH_V2_LOCATION = os.getenv("SPEECH_V2_LOCATION", "global")
+SPEECH_V2_MODEL = os.getenv("SPEECH_V2_MODEL", "long")
+
+def speech_v2_client():
+    speech_v2 = _lazy("speech_v2")
+    if SPEECH_V2_LOCATION == "global":
+        return speech_v2.SpeechClient()
+    from google.api_core.client_options import ClientOptions
+    return speech_v2.SpeechClient(client_options=ClientOptions(api_endpoint=f"{SPEECH_V2_LOCATION}-speech.googleapis.com"))
+
+def submit_batch_recognition(client, gcs_uris, lang_code: str) -> str:
+    """Start one batch_recognize operation for several GCS files. Returns the operation name."""
+    speech_v2 = _lazy("speech_v2")
+    project = os.getenv("GOOGLE_CLOUD_PROJECT")
+    request = speech_v2.BatchRecognizeRequest(
+        recognizer=f"projects/{project}/locations/{SPEECH_V2_LOCATION}/recognizers/_",
+        config=speech_v2.RecognitionConfig(
+            auto_decoding_config=speech_v2.AutoDetectDecodingConfig(),
+            language_codes=[lang_code],
+            model=SPEECH_V2_MODEL,
+            features=speech_v2.RecognitionFeatures(enable_automatic_punctuation=True),
+        ),
+        files=[speech_v2.BatchRecognizeFileMetadata(uri=uri) for uri in gcs_uris],
+        recognition_output_config=speech_v2.RecognitionOutputConfig(
+            inline_response_config=speech_v2.InlineOutputConfig(),
+        ),
+    )
+    print(f"Submitting batch recognition for {len(gcs_uris)} files...")
+    return client.batch_recognize(request=request).operation.name
+
+def poll_batch_recognition(client, operation_name: str):
+    """Return ``{gcs_uri: (transcript, error)}`` for a finished batch, or None while it is running."""
+    speech_v2 = _lazy("speech_v2")
+    raw_operation = client.transport.operations_client.get_operation(operation_name)
+    if not raw_operation.done:
+        return None
+    if raw_operation.HasField("error"):
+        raise RuntimeError(f"Batch recognition failed: {raw_operation.error.message}")
+    response = speech_v2.BatchRecognizeResponse.deserialize(raw_operation.response.value)
+    results = {}
+    for uri, file_result in response.results.items():
+        if file_result.error and file_result.error.code:
+            results[uri] = (None, file_result.error.message)
+        else:
+            results[uri] = (collect_transcript(file_result.inline_result.transcript), None)
+    return results
+
+# auto モードで字幕をそのまま採用する条件
+AUTO_CAPTION_LANGUAGES = [lang.strip() for lang in os.getenv("AUTO_CAPTION_LANGUAGES", "ja,en").split(",") if lang.strip()]
+AUTO_ACCEPT_GENERATED_CAPTIONS = os.getenv("AUTO_ACCEPT_GENERATED_CAPTIONS", "false").lower() == "true"
+
+def list_caption_tracks(video_id: str):
+    """List available caption tracks without downloading any of them."""
+    api = _lazy("YouTubeTranscriptApi")()
+    return list(api.list(video_id))
+
+def choose_caption_track(tracks, languages, accept_generated: bool):
+    """Pick the best qualifying track: manual captions first, in language priority order."""
+    for is_generated in ([False, True] if accept_generated else [False]):
+        for language in languages:
+            for track in tracks:
+                if track.is_generated == is_generated and track.language_code == language:
+                    return track
+    return None
+
+def get_caption_transcript(video_id: str, languages=None, accept_generated: bool = True):
+    """Return ``(transcript, source)`` from a qualifying caption track, or ``(None, None)``.
+
+    ``source`` is ``"youtube_manual"`` or ``"youtube_generated"``.
+    """
+    try:
+        tracks = list_caption_tracks(video_id)
+        track = choose_caption_track(tracks, languages or ['ja', 'en'], accept_generated)
+        if track is None:
+            print(f"No qualifying caption track for video {video_id}")
+            return None, None
+        fetched = track.fetch()
+        transcript = " ".join(item['text'] for item in fetched.to_raw_data())
+        return transcript, ("youtube_generated" if track.is_generated else "youtube_manual")
+    except Exception as e:
+        print(f"Could not retrieve captions for video {video_id}: {e}")
+        return None, None
+
+def prepare_audio(video_id: str, checkpoint: dict, record, job_id: Optional[int] = None):
+    """Make sure converted (and, with ``GCS_SPEECH_BUCKET``, uploaded) audio exists.
+
+    Returns ``(audio_sha256, flac_path, gcs_uri)``; ``gcs_uri`` is None without a
+    bucket. Stages already recorded in ``checkpoint`` are skipped and
+    ``record(stage, **data)`` is called for each stage that completes.
+    ``job_id`` (the video row id) selects the download directory.
+    """
+    from .audio_cache import audio_cache
+
+    cached = None
+    if checkpoint.get("audio_sha256"):
+        path = audio_cache.get(checkpoint["audio_sha256"])
+        cached = (checkpoint["audio_sha256"], path) if path else None
+    if cached is None:
+        cached = audio_cache.lookup(video_id)
+
+    if cached is not None:
+        audio_sha256, flac_path = cached
+        print(f"Using cached audio: {flac_path}")
+    else:
+        work_dir = download_dir(video_id, job_id)
+        download_stats = {}
+        audio_path = download_audio(video_id, work_dir, stats=download_stats)
+        record("downloaded", **download_stats)
+        # 変換もダウンロード先で行い、中断されても次回の掃除で消えるようにする
+        flac_path = convert_to_flac(audio_path, os.path.join(work_dir, f"{video_id}.16k.flac"))
+        audio_sha256, flac_path = audio_cache.put(video_id, flac_path)
+        record("converted", audio_sha256=audio_sha256)
+        # 変換済みの音声はキャッシュにあるので、ダウンロードした元ファイルは不要
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # 環境変数 GCS_SPEECH_BUCKET があれば GCS にアップロードして URI で認識
+    bucket_name = os.getenv("GCS_SPEECH_BUCKET")
+    gcs_uri = None
+    if bucket_name:
+        if checkpoint.get("gcs_uri") and checkpoint.get("audio_sha256") == audio_sha256 and _stage_reached(checkpoint, "uploaded"):
+            gcs_uri = checkpoint["gcs_uri"]
+            print(f"Using uploaded audio: {gcs_uri}")
         else:
-            # フォールバック: 直接 content 送信（10MB制限に注意）
-            print("GCS_SPEECH_BUCKET not set; falling back to direct content upload.")
-            with open(flac_path, "rb") as audio_file:
-                content = audio_file.read()
-            audio = speech.RecognitionAudio(content=content)
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.FLAC,
-                sample_rate_hertz=16000,
-                language_code=lang_code,
-                enable_automatic_punctuation=True
-            )
-            operation = client.long_running_recognize(config=config, audio=audio)
-            print("Waiting for transcription to complete...")
-            response = operation.result(timeout=3600)
-
-        transcript = "".join(result.alternatives[0].transcript for result in response.results)
+            gcs_uri = upload_audio(flac_path, bucket_name, video_id)
+            record("uploaded", gcs_uri=gcs_uri)
+    return audio_sha256, flac_path, gcs_uri
+
+def get_high_quality_transcript(video_id: str, lang_code: str = "ja-JP", checkpoint: dict = None, on_checkpoint=None):
+    """Download, convert, upload and recognize audio for a video, waiting for the result.
+
+    ``checkpoint`` holds the progress of an earlier attempt (``stage``,
+    ``audio_sha256``, ``gcs_uri``, ``operation_name``); finished stages are
+    skipped and a submitted recognition is re-attached instead of resubmitted.
+    ``on_checkpoint(stage, **data)`` is called after each stage completes.
+    """
+    speech = _lazy("speech")
+    checkpoint = dict(checkpoint or {})
+
+    def record(stage, **data):
+        checkpoint.update(data, stage=stage)
+        if on_checkpoint:
+            on_checkpoint(stage, **data)
+
+    try:
+        client = speech.SpeechClient()
+
+        if checkpoint.get("operation_name"):
+            try:
+                print(f"Re-attaching to recognition operation: {checkpoint['operation_name']}")
+                operation = attach_recognition(client, checkpoint["operation_name"])
+                response = operation.result(timeout=RECOGNITION_TIMEOUT)
+                transcript = collect_transcript(response)
+                print("Transcription finished.")
+                return transcript
+            except Exception as e:
+                # 操作が期限切れ・失敗していた場合は音声から再投入する
+                print(f"Could not resume recognition operation: {e}")
+                checkpoint["operation_name"] = None
+
+        _, flac_path, gcs_uri = prepare_audio(video_id, checkpoint, record)
+
+        operation = submit_recognition(client, lang_code, gcs_uri=gcs_uri, flac_path=flac_path)
+        operation_name = getattr(getattr(operation, "operation", None), "name", None)
+        if isinstance(operation_name, str):
+            record("submitted", operation_name=operation_name)
+        print("Waiting for transcription to complete...")
+        response = operation.result(timeout=RECOGNITION_TIMEOUT)
+
+        transcript = collect_transcript(response)
         print("Transcription finished.")
         return transcript
 
     except Exception as e:
         print(f"An error occurred during high-quality transcription: {e}")
         return None
-    finally:
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-            print(f"Removed temporary directory and its contents: {temp_dir}")
 
 
 def extract_video_id(url: str):
@@ -0,0 +1,39 @@
+import os
+
+from src.audio_cache import AudioCache, file_sha256
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_put_is_content_addressed(tmp_path):
+    cache = AudioCache(root=str(tmp_path / "cache"), max_bytes=10 ** 6)
+    src = _write(tmp_path / "a.flac", b"audio")
+    expected = file_sha256(src)
+
+    sha256, path = cache.put("vid1", src)
+
+    assert sha256 == expected
+    assert path.endswith(f"{sha256}.flac")
+    assert not os.path.exists(src)
+    assert cache.lookup("vid1") == (sha256, path)
+    assert cache.get(sha256) == path
+
+
+def test_lookup_missing(tmp_path):
+    cache = AudioCache(root=str(tmp_path / "cache"))
+    assert cache.lookup("nope") is None
+    assert cache.get("0" * 64) is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(root=str(tmp_path / "cache"), max_bytes=10)
+    sha_a, path_a = cache.put("a", _write(tmp_path / "a.flac", b"aaaaaa"))
+    os.utime(path_a, (0, 0))
+    sha_b, path_b = cache.put("b", _write(tmp_path / "b.flac", b"bbbbbb"))
+
+    assert cache.get(sha_a) is None
+    assert cache.lookup("a") is None
+    assert cache.get(sha_b) == path_b
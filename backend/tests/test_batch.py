@@ -0,0 +1,111 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+
+from src import crud, embeddings
+from src.models import Video, VideoSelection
+
+
+@pytest.fixture
+def videos(db_session):
+    rows = [
+        Video(url="u1", title="Python 入門", channel_name="c", tags="python, intro", status="completed"),
+        Video(url="u2", title="Python 応用", channel_name="c", tags="python", status="failed", transcription_stage="uploaded"),
+        Video(url="u3", title="旅行", channel_name="c", tags=None, status="processing"),
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    with patch.object(embeddings, "index", embeddings.VectorIndex(embeddings.EMBEDDING_DIM)):
+        yield [v.id for v in rows]
+
+
+def _status(results):
+    return {r["id"]: r["status"] for r in results}
+
+
+def test_batch_requires_a_target(db_session):
+    with pytest.raises(HTTPException) as exc_info:
+        crud.batch_delete_videos(db_session, VideoSelection())
+    assert exc_info.value.status_code == 400
+
+
+def test_batch_update_tags_by_ids(db_session, videos):
+    results = crud.batch_update_tags(db_session, VideoSelection(ids=videos + [999]), add=["new"], remove=["intro"])
+
+    assert _status(results) == {videos[0]: "updated", videos[1]: "updated", videos[2]: "updated", 999: "not_found"}
+    db_session.expire_all()
+    tags = {v.id: v.tags for v in db_session.query(Video)}
+    assert tags[videos[0]] == "python,new"
+    assert tags[videos[1]] == "python,new"
+    assert tags[videos[2]] == "new"
+
+
+def test_batch_update_tags_unchanged(db_session, videos):
+    results = crud.batch_update_tags(db_session, VideoSelection(ids=[videos[1]]), add=["python"], remove=[])
+    assert _status(results) == {videos[1]: "unchanged"}
+
+
+def test_batch_delete_by_filter(db_session, videos):
+    results = crud.batch_delete_videos(db_session, VideoSelection(title_query="python"))
+
+    assert _status(results) == {videos[0]: "deleted", videos[1]: "deleted"}
+    assert [v.id for v in db_session.query(Video)] == [videos[2]]
+
+
+def test_batch_request_transcription(db_session, videos):
+    results, queued = crud.batch_request_transcription(db_session, VideoSelection(ids=videos))
+
+    assert list(queued) == [videos[0], videos[1]]
+    assert _status(results)[videos[2]] == "skipped"
+    db_session.expire_all()
+    rows = {v.id: v for v in db_session.query(Video)}
+    assert rows[videos[0]].status == "processing"
+    # 失敗したジョブのチェックポイントは残す
+    assert rows[videos[1]].transcription_stage == "uploaded"
+
+
+def test_batch_request_transcription_respects_queue_capacity(db_session, videos):
+    results, queued = crud.batch_request_transcription(db_session, VideoSelection(ids=videos), limit=1)
+
+    assert list(queued) == [videos[0]]
+    assert _status(results)[videos[1]] == "rejected"
+    db_session.expire_all()
+    assert db_session.get(Video, videos[1]).status == "failed"
+
+
+def test_batch_request_transcription_skips_rows_claimed_meanwhile(db_session, videos):
+    select_batch = crud._select_batch
+
+    def select_then_race(db, selection, *columns, **kwargs):
+        rows, missing = select_batch(db, selection, *columns, **kwargs)
+        # 状態を読んだ直後に、別の依頼が同じ動画を processing にした
+        db.query(Video).filter(Video.id == videos[0]).update({"status": "processing"})
+        return rows, missing
+
+    with patch.object(crud, "_select_batch", side_effect=select_then_race):
+        results, queued = crud.batch_request_transcription(db_session, VideoSelection(ids=videos[:2]))
+
+    assert list(queued) == [videos[1]]
+    assert _status(results) == {videos[0]: "skipped", videos[1]: "queued"}
+
+
+def test_request_transcription_conflicts_when_already_claimed(db_session, videos):
+    crud.request_transcription(db_session, videos[0])
+    with pytest.raises(HTTPException) as exc_info:
+        crud.request_transcription(db_session, videos[0])
+    assert exc_info.value.status_code == 409
+
+
+def test_rejected_transcription_restores_previous_state(db_session, videos):
+    db_video = db_session.get(Video, videos[0])
+    db_video.transcription_stage = "completed"
+    db_session.commit()
+    previous = crud.transcription_state(db_video)
+
+    crud.request_transcription(db_session, videos[0])
+    # 枠の取り合いに負けても、完了済みの動画は failed にしない
+    crud.mark_transcription_rejected(db_session, videos[0], previous)
+
+    db_session.expire_all()
+    db_video = db_session.get(Video, videos[0])
+    assert (db_video.status, db_video.transcription_stage) == ("completed", "completed")
@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+
+from src import cache, crud, database
+from src.database import Base
+from src.models import Video
+
+
+@pytest.fixture
+def client(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([
+            Video(url="u1", title="A", channel_name="c", tags="news,tech", transcript="x" * 100, status="completed"),
+            Video(url="u2", title="B", channel_name="c", tags="tech", status="completed"),
+            Video(url="u3", title="C", channel_name="c", status="completed"),
+        ])
+        db.commit()
+    query_cache = cache.QueryCache()
+    with patch.object(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine)), \
+         patch.object(database, "replicas", []), \
+         patch.object(cache, "query_cache", query_cache), \
+         patch.object(crud, "query_cache", query_cache), \
+         patch.object(crud, "index_video_embeddings"):
+        from src.main import API_PREFIX, app
+        yield TestClient(app), API_PREFIX
+    engine.dispose()
+
+
+def test_bootstrap_returns_first_page_tags_and_version(client):
+    client, prefix = client
+    response = client.get(f"{prefix}/bootstrap", params={"limit": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert [video["title"] for video in body["videos"]] == ["A", "B"]
+    assert body["has_more"] is True
+    # 一覧と同じく文字起こし本文は含めない
+    assert "transcript" not in body["videos"][0]
+    assert body["tags"] == [{"name": "news", "count": 1}, {"name": "tech", "count": 2}]
+    assert body["version"] == crud.query_cache.version_token()
+
+    revalidated = client.get(f"{prefix}/bootstrap", params={"limit": 2}, headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_mutations_return_list_delta_on_request(client):
+    client, prefix = client
+    version = client.get(f"{prefix}/bootstrap").json()["version"]
+
+    response = client.put(f"{prefix}/videos/2", params={"delta": "true"}, json={"url": "u2", "tags": "tech,music"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == 2 and body["tags"] == "tech,music"
+    delta = body["delta"]
+    # 同じ出どころの版が1つ進んでいれば、クライアントは差分だけを当てられる
+    scope, number = version.rsplit(":", 1)
+    assert delta["version"] == f"{scope}:{int(number) + 1}"
+    assert [video["id"] for video in delta["upserted"]] == [2] and delta["removed"] == []
+    assert {"name": "music", "count": 1} in delta["tags"]
+
+    response = client.delete(f"{prefix}/videos/1", params={"delta": "true"})
+    delta = response.json()["delta"]
+    assert delta["upserted"] == [] and delta["removed"] == [1]
+    assert {tag["name"] for tag in delta["tags"]} == {"music", "tech"}
+
+    # delta を指定しなければ従来どおりのレスポンス
+    assert "delta" not in client.put(f"{prefix}/videos/2", json={"url": "u2", "tags": "tech"}).json()
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src import cache, crud, models
+from src.serialization import loads
+from src.models import Video
+
+
+@pytest.fixture
+def fresh_cache():
+    shared = cache.RedisBackend(client=cache.FakeRedis())
+    query_cache = cache.QueryCache(shared=shared)
+    with patch.object(crud, "query_cache", query_cache):
+        yield query_cache
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = cache.LRUBackend(max_entries=2)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    backend.get("a")
+    backend.set("c", "3")
+    assert backend.get("a") == "1"
+    assert backend.get("b") is None
+    assert backend.get("c") == "3"
+
+
+def test_get_or_compute_counts_hits_and_misses():
+    query_cache = cache.QueryCache()
+    compute = MagicMock(return_value=[1, 2])
+
+    assert query_cache.get_or_compute("ns", {"a": 1}, compute) == [1, 2]
+    assert query_cache.get_or_compute("ns", {"a": 1}, compute) == [1, 2]
+
+    compute.assert_called_once()
+    assert query_cache.stats["hits"] == 1
+    assert query_cache.stats["misses"] == 1
+
+
+def test_bump_version_invalidates_entries():
+    query_cache = cache.QueryCache()
+    query_cache.get_or_compute("ns", {}, lambda: "old")
+    query_cache.bump_version()
+    assert query_cache.get_or_compute("ns", {}, lambda: "new") == "new"
+
+
+def test_memory_only_entries_expire_and_versions_are_scoped():
+    worker_a = cache.QueryCache(local_ttl=0.05)
+    worker_b = cache.QueryCache(local_ttl=0.05)
+    assert worker_a.get_or_compute("ns", {}, lambda: "old") == "old"
+    # 別ワーカーの書き込みはこのプロセスの版を上げないので、期限切れで読み直す
+    time.sleep(0.1)
+    assert worker_a.get_or_compute("ns", {}, lambda: "new") == "new"
+    assert worker_a.version_token() != worker_b.version_token()
+
+    shared = cache.RedisBackend(client=cache.FakeRedis())
+    assert cache.QueryCache(shared=shared).version_token() == cache.QueryCache(shared=shared).version_token()
+
+
+def test_shared_store_is_seen_by_other_replicas():
+    shared = cache.RedisBackend(client=cache.FakeRedis())
+    replica_a = cache.QueryCache(shared=shared)
+    replica_b = cache.QueryCache(shared=shared)
+
+    replica_a.get_or_compute("ns", {}, lambda: "value")
+    assert replica_b.get_or_compute("ns", {}, lambda: "other") == "value"
+    assert replica_b.stats["shared_hits"] == 1
+
+    replica_a.bump_version()
+    assert replica_b.get_or_compute("ns", {}, lambda: "fresh") == "fresh"
+
+
+def test_shared_store_errors_fall_back_to_compute():
+    broken = MagicMock()
+    broken.get.side_effect = ConnectionError("down")
+    broken.set.side_effect = ConnectionError("down")
+    query_cache = cache.QueryCache(shared=broken)
+    assert query_cache.get_or_compute("ns", {}, lambda: 42) == 42
+    assert query_cache.stats["errors"] >= 2
+
+
+def test_normalize_search_params():
+    a = cache.normalize_search_params(" Foo ", "b, A", "bogus", "DESC", 0, None, models.SORTABLE_COLUMNS)
+    b = cache.normalize_search_params("foo", "a,b,a", "id", "desc", None, None, models.SORTABLE_COLUMNS)
+    assert a == b
+
+
+def test_search_videos_cached_invalidated_by_writes(db_session, fresh_cache):
+    db_session.add(Video(url="u", title="First", channel_name="c", status="completed"))
+    db_session.commit()
+
+    assert [v["title"] for v in loads(crud.search_videos_cached(db_session))] == ["First"]
+    assert [v["title"] for v in loads(crud.search_videos_cached(db_session))] == ["First"]
+    assert fresh_cache.stats["hits"] == 1
+
+    video = db_session.query(Video).first()
+    crud.delete_video(db_session, video.id)
+
+    assert loads(crud.search_videos_cached(db_session)) == []
+
+
+def test_search_videos_cached_pages(db_session, fresh_cache):
+    db_session.add_all([Video(url="u", title=f"T{i}", channel_name="c", status="completed") for i in range(5)])
+    db_session.commit()
+
+    page = loads(crud.search_videos_cached(db_session, skip=2, limit=2))
+
+    assert [v["title"] for v in page] == ["T2", "T3"]
+    assert "transcript" not in page[0]
@@ -0,0 +1,83 @@
+from src import crud
+from src.models import Channel, Video
+
+
+def _video(channel_id, duration, transcript):
+    return Video(
+        url="https://youtu.be/x",
+        title="t",
+        channel_name="name",
+        channel_id=channel_id,
+        duration_seconds=duration,
+        transcript=transcript,
+        status="completed",
+    )
+
+
+def test_upsert_channel_creates_and_refreshes(db_session):
+    crud.upsert_channel(db_session, "UC1", "Old Name")
+    db_session.commit()
+    crud.upsert_channel(db_session, "UC1", "New Name")
+    db_session.commit()
+
+    channels = crud.get_channels(db_session)
+    assert [c["title"] for c in channels] == ["New Name"]
+
+
+def test_upsert_channel_overwrites_a_row_written_elsewhere(db_session):
+    loaded = crud.upsert_channel(db_session, "UC1", "Old Name")
+    db_session.commit()
+    # 別の依頼が同じチャンネルを書き換えていても、読み込み済みの行ではなく INSERT ... ON CONFLICT で更新する
+    db_session.execute(Channel.__table__.update().values(title="Other Name"))
+
+    channel = crud.upsert_channel(db_session, "UC1", "New Name")
+    db_session.commit()
+
+    assert channel is loaded and channel.title == "New Name"
+    assert db_session.query(Channel).count() == 1
+
+
+def test_upsert_channel_without_id_is_noop(db_session):
+    assert crud.upsert_channel(db_session, None, "Name") is None
+
+
+def test_channel_aggregates(db_session):
+    crud.upsert_channel(db_session, "UC1", "A")
+    crud.upsert_channel(db_session, "UC2", "B")
+    db_session.add_all([
+        _video("UC1", 60, "text"),
+        _video("UC1", 120, None),
+        _video("UC1", None, "text"),
+    ])
+    db_session.commit()
+
+    stats = {c["id"]: c for c in crud.get_channels(db_session)}
+
+    assert stats["UC1"]["video_count"] == 3
+    assert stats["UC1"]["total_duration_seconds"] == 180
+    assert stats["UC1"]["transcript_count"] == 2
+    assert abs(stats["UC1"]["transcript_coverage"] - 2 / 3) < 1e-9
+    assert stats["UC2"]["video_count"] == 0
+    assert stats["UC2"]["transcript_coverage"] == 0.0
+
+
+def test_search_videos_filters_by_channel(db_session):
+    crud.upsert_channel(db_session, "UC1", "A")
+    crud.upsert_channel(db_session, "UC2", "B")
+    db_session.add_all([_video("UC1", 1, None), _video("UC2", 1, None)])
+    db_session.commit()
+
+    videos = crud.search_videos(db_session, channel_id="UC2")
+
+    assert [v.channel_id for v in videos] == ["UC2"]
+
+
+def test_channel_video_rows_are_paged_without_transcripts(db_session):
+    crud.upsert_channel(db_session, "UC1", "A")
+    db_session.add_all([_video("UC1", i, "text") for i in range(3)])
+    db_session.commit()
+
+    rows = list(crud.search_video_rows(db_session, sort_by="id", channel_id="UC1", skip=1, limit=1))
+
+    assert [row["duration_seconds"] for row in rows] == [1]
+    assert "transcript" not in rows[0]
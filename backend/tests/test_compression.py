@@ -0,0 +1,120 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from src import compression
+from src.compression import CompressedCache, CompressionMiddleware, choose_encoding, etag_matches, make_etag
+
+TEXT = "これは文字起こしのテキストです。" * 500
+
+
+def _client(cache=None):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, encodings=["gzip"], cache=cache or CompressedCache())
+
+    @app.get("/big")
+    def big():
+        return JSONResponse({"transcript": TEXT}, headers={"ETag": make_etag(TEXT.encode())})
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"[", TEXT.encode(), b"]"]), media_type="application/json")
+
+    return TestClient(app)
+
+
+def test_choose_encoding_honours_q_values_and_server_order():
+    available = ["zstd", "br", "gzip"]
+    assert choose_encoding("gzip, br", available) == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0.5", available) == "gzip"
+    assert choose_encoding("br;q=0, gzip", available) == "gzip"
+    assert choose_encoding("*", available) == "zstd"
+    assert choose_encoding("identity", available) is None
+    assert choose_encoding(None, available) is None
+
+
+def test_large_json_is_gzipped_and_small_is_not():
+    client = _client()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(TEXT.encode())
+    assert response.json()["transcript"] == TEXT
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed():
+    response = _client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"[" + TEXT.encode() + b"]"
+
+
+def test_responses_with_etag_reuse_compressed_body():
+    cache = CompressedCache()
+    client = _client(cache)
+    client.get("/big", headers={"Accept-Encoding": "gzip"})
+    client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+
+def test_compressed_cache_is_bounded_by_bytes():
+    cache = CompressedCache(max_bytes=10)
+    cache.set("a", "gzip", b"12345")
+    cache.set("b", "gzip", b"12345")
+    cache.set("c", "gzip", b"12345")
+    assert cache.get("a", "gzip") is None
+    assert cache.get("c", "gzip") == b"12345"
+    assert cache.size == 10
+
+
+def test_compress_round_trip_for_installed_encodings():
+    data = TEXT.encode()
+    assert gzip.decompress(compression.compress(data, "gzip")) == data
+    if compression.brotli is not None:
+        assert compression.brotli.decompress(compression.compress(data, "br")) == data
+    if compression.zstandard is not None:
+        assert compression.zstandard.ZstdDecompressor().decompressobj().decompress(compression.compress(data, "zstd")) == data
+
+
+def test_etag_matches_weak_comparison():
+    etag = make_etag(b"body")
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag[2:], etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_completed_transcript_gets_etag_and_304(db_session):
+    from src.database import get_read_db
+    from src.main import API_PREFIX, app
+    from src.models import Video
+
+    video = Video(url="u", title="T", channel_name="c", transcript=TEXT, status="completed")
+    db_session.add(video)
+    db_session.commit()
+    app.dependency_overrides[get_read_db] = lambda: db_session
+    try:
+        client = TestClient(app)
+        url = f"{API_PREFIX}/videos/{video.id}/transcript"
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["transcript"] == TEXT
+        etag = response.headers["etag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert client.get(f"{API_PREFIX}/videos/{video.id}").headers["etag"] != etag
+    finally:
+        app.dependency_overrides.clear()
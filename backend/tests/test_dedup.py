@@ -0,0 +1,146 @@
+import random
+
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from src import crud, dedup, models
+from src.models import Video
+
+random.seed(0)
+_CHARS = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+TEXT = "".join(random.choice(_CHARS) for _ in range(3000))
+OTHER = "".join(random.choice(_CHARS) for _ in range(3000))
+
+
+def test_signature_similarity_tracks_jaccard():
+    a = dedup.signature(TEXT)
+    assert a.dtype.name == "uint32" and len(dedup.to_bytes(a)) == dedup.DEDUP_NUM_PERM * 4
+    assert dedup.similarity(a, dedup.signature(" " + TEXT.upper() + "\n")) == 1.0
+    assert dedup.similarity(a, dedup.signature(TEXT[:2800])) > 0.8
+    assert dedup.similarity(a, dedup.signature(OTHER)) < 0.1
+    assert dedup.signature("短い") is None
+
+
+def test_band_buckets_match_for_identical_bands():
+    a = dedup.signature(TEXT)
+    buckets = dedup.band_buckets(a)
+    assert len(buckets) == dedup.DEDUP_BANDS
+    assert all(0 <= bucket < 2 ** 63 for bucket in buckets)
+    assert buckets == dedup.band_buckets(dedup.from_bytes(dedup.to_bytes(a)))
+
+
+def _add(db, transcript, **kwargs):
+    video = Video(url="u", title="T", channel_name="c", transcript=transcript, status="completed", **kwargs)
+    db.add(video)
+    db.flush()
+    crud.flag_duplicate(db, video)
+    db.commit()
+    return video
+
+
+def test_flag_duplicate_points_at_original(db_session):
+    original = _add(db_session, TEXT)
+    mirror = _add(db_session, TEXT[:2900])
+    clip_of_mirror = _add(db_session, TEXT[50:2950])
+    unrelated = _add(db_session, OTHER)
+
+    assert original.duplicate_of is None
+    assert mirror.duplicate_of == original.id
+    assert clip_of_mirror.duplicate_of == original.id
+    assert unrelated.duplicate_of is None
+
+    duplicates = crud.get_duplicate_videos(db_session, original.id)
+    assert [d["id"] for d in duplicates] == [mirror.id, clip_of_mirror.id]
+    assert duplicates[0]["similarity"] > 0.8
+    assert crud.get_duplicate_videos(db_session, 999) is None
+
+
+def test_delete_clears_duplicate_links(db_session):
+    original = _add(db_session, TEXT)
+    mirror = _add(db_session, TEXT)
+
+    crud.delete_video(db_session, original.id)
+
+    db_session.expire_all()
+    assert db_session.get(Video, mirror.id).duplicate_of is None
+    assert db_session.query(models.VideoLSHBand).filter_by(video_id=original.id).count() == 0
+
+
+@pytest.fixture
+def youtube():
+    metadata = {"title": "T", "channel_id": "UC1", "channel_name": "C", "duration_seconds": 60}
+    with patch('src.crud.extract_video_id', return_value="vid"), \
+         patch('src.crud.get_youtube_video_metadata', return_value=metadata), \
+         patch('src.crud.get_caption_transcript') as mock_captions:
+        yield mock_captions
+
+
+def test_high_quality_reuses_near_duplicate_transcript(db_session, youtube):
+    original = _add(db_session, TEXT, transcript_source="speech", summary="要約")
+    # 自動生成字幕は音声認識の結果と完全には一致しない
+    youtube.return_value = (TEXT[:1500] + OTHER[:300] + TEXT[1800:], "youtube_generated")
+
+    video = crud.create_video(db_session, models.VideoCreate(url="https://youtu.be/vid", transcriptionOption="high_quality"))
+
+    assert video.status == "completed"
+    assert video.transcript == TEXT
+    assert video.summary == "要約"
+    assert video.duplicate_of == original.id
+
+
+def test_high_quality_without_match_is_queued(db_session, youtube):
+    _add(db_session, TEXT, transcript_source="speech")
+    youtube.return_value = (OTHER, "youtube_generated")
+
+    video = crud.create_video(db_session, models.VideoCreate(url="https://youtu.be/vid", transcriptionOption="high_quality"))
+
+    assert video.status == "processing"
+    assert video.duplicate_of is None
+
+
+def test_auto_probes_generated_captions_only_when_restricted(db_session, youtube):
+    _add(db_session, TEXT, transcript_source="speech")
+    youtube.return_value = (None, None)
+    create = models.VideoCreate(url="https://youtu.be/vid", transcriptionOption="auto")
+
+    # 自動生成字幕まで探して見つからなければ、同じ問い合わせを繰り返さない
+    with patch.object(crud, "AUTO_ACCEPT_GENERATED_CAPTIONS", True):
+        assert crud.create_video(db_session, create).status == "processing"
+    assert youtube.call_count == 1
+
+    youtube.reset_mock()
+    with patch.object(crud, "AUTO_ACCEPT_GENERATED_CAPTIONS", False):
+        crud.create_video(db_session, create)
+    assert [call.kwargs["accept_generated"] for call in youtube.call_args_list] == [False, True]
+
+
+def test_clip_does_not_reuse_full_transcript(db_session, youtube):
+    _add(db_session, TEXT, transcript_source="speech", duration_seconds=600)
+
+    # 切り抜きの字幕は元動画と十分似ていても、長さが違うので流用しない
+    youtube.return_value = (TEXT[:1600], "youtube_generated")
+    create = models.VideoCreate(url="https://youtu.be/vid", transcriptionOption="high_quality")
+    assert crud.create_video(db_session, create).status == "processing"
+
+    # 字幕の長さが同じでも再生時間が大きく違えば流用しない
+    youtube.return_value = (TEXT, "youtube_generated")
+    assert crud.create_video(db_session, create).status == "processing"
+
+
+def test_duplicates_are_read_only_until_backfilled(db_session):
+    original = _add(db_session, TEXT)
+    legacy = Video(url="u", title="T", channel_name="c", transcript=TEXT, status="completed")
+    db_session.add(legacy)
+    db_session.commit()
+
+    # 署名のない動画も調べられるが、GET では何も書き込まない
+    assert [d["id"] for d in crud.get_duplicate_videos(db_session, legacy.id)] == [original.id]
+    assert db_session.get(models.VideoSignature, legacy.id) is None
+
+    with patch.object(crud, "SessionLocal", sessionmaker(bind=db_session.get_bind())):
+        assert crud.backfill_signatures(batch_size=1) == 1
+        assert crud.backfill_signatures() == 0
+    db_session.expire_all()
+    assert db_session.get(models.VideoSignature, legacy.id) is not None
+    assert db_session.get(Video, legacy.id).duplicate_of == original.id
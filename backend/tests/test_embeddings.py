@@ -0,0 +1,132 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+
+from src import crud, embeddings
+from src.models import Video, VideoEmbedding
+
+
+def test_embed_texts_is_normalized_and_deterministic():
+    vectors = embeddings.embed_texts(["機械学習の入門", "machine learning basics", ""])
+    assert vectors.shape == (3, embeddings.EMBEDDING_DIM)
+    assert np.allclose(np.linalg.norm(vectors[:2], axis=1), 1.0, atol=1e-5)
+    assert np.allclose(vectors, embeddings.embed_texts(["機械学習の入門", "machine learning basics", ""]))
+
+
+def test_vector_bytes_round_trip_is_float16():
+    vector = embeddings.embed_texts(["hello world"])[0]
+    data = embeddings.to_bytes(vector)
+    assert len(data) == embeddings.EMBEDDING_DIM * 2
+    assert np.allclose(embeddings.from_bytes(data), vector, atol=1e-3)
+
+
+def test_vector_index_upsert_search_remove():
+    index = embeddings.VectorIndex(4)
+    index.upsert([1, 2, 3], np.eye(4, dtype=np.float32)[:3])
+
+    assert index.search(np.array([1, 0, 0, 0], dtype=np.float32), k=1) == [(1, pytest.approx(1.0))]
+
+    index.upsert([2], np.array([[1, 0, 0, 0]], dtype=np.float32))
+    assert [i for i, _ in index.search(np.array([1, 0, 0, 0], dtype=np.float32), k=2)] in ([1, 2], [2, 1])
+
+    index.remove([1])
+    assert len(index) == 2
+    assert [i for i, _ in index.search(np.array([1, 0, 0, 0], dtype=np.float32), k=1, exclude=None)] == [2]
+    assert [i for i, _ in index.search(np.array([0, 0, 1, 0], dtype=np.float32), k=5, exclude=3)] == [2]
+
+
+def test_vector_index_grows_in_place_across_upserts():
+    index = embeddings.VectorIndex(4)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((3000, 4)).astype(np.float32)
+    for start in range(0, 3000, 1000):
+        index.upsert(list(range(start, start + 1000)), vectors[start:start + 1000])
+    index.remove([0])
+
+    assert len(index) == 2999
+    assert np.array_equal(index.get(2999), vectors[2999])
+    assert np.array_equal(index.get(1500), vectors[1500])
+    assert index.get(0) is None
+
+
+def test_refresh_index_reads_rows_at_the_watermark(db_session, fresh_index):
+    # 別プロセスが書いた埋め込みを想定して、テーブルに直接書き込む
+    stamp = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    vectors = embeddings.embed_texts(["a", "b"])
+
+    def write(video_id, vector):
+        db_session.add(Video(id=video_id, url="u", title="t", channel_name="c"))
+        db_session.add(VideoEmbedding(video_id=video_id, model=embeddings.model_name(), dim=len(vector),
+                                      vector=embeddings.to_bytes(vector), updated_at=stamp))
+        db_session.commit()
+
+    write(1, vectors[0])
+    embeddings.refresh_index(db_session, force=True)
+    write(2, vectors[1])
+    fresh_index.refreshed_at = 0.0
+    embeddings.refresh_index(db_session)
+
+    assert len(fresh_index) == 2 and fresh_index.get(2) is not None
+
+
+@pytest.fixture
+def fresh_index(db_session):
+    with patch.object(embeddings, "index", embeddings.VectorIndex(embeddings.EMBEDDING_DIM)), \
+         patch.object(crud, "SessionLocal", sessionmaker(bind=db_session.get_bind())):
+        yield embeddings.index
+
+
+def test_related_and_semantic_search(db_session, fresh_index):
+    videos = [
+        Video(url="u1", title="Python 入門", channel_name="c", transcript="Pythonの関数と変数を学びます", status="completed"),
+        Video(url="u2", title="Python 応用", channel_name="c", transcript="Pythonの関数とクラスを学びます", status="completed"),
+        Video(url="u3", title="京都旅行", channel_name="c", transcript="京都のお寺を巡る旅です", status="completed"),
+    ]
+    db_session.add_all(videos)
+    db_session.commit()
+    ids = [v.id for v in videos]
+
+    crud.index_video_embeddings(ids)
+
+    assert db_session.query(VideoEmbedding).count() == 3
+    related = crud.get_related_videos(db_session, ids[0], limit=1)
+    assert [r["id"] for r in related] == [ids[1]]
+    results = crud.semantic_search(db_session, "京都のお寺", limit=1)
+    assert [r["id"] for r in results] == [ids[2]]
+
+
+def test_delete_video_removes_from_index(db_session, fresh_index):
+    video = Video(url="u1", title="t", channel_name="c", status="completed")
+    db_session.add(video)
+    db_session.commit()
+    crud.index_video_embeddings([video.id])
+    assert len(fresh_index) == 1
+
+    crud.delete_video(db_session, video.id)
+
+    assert len(fresh_index) == 0
+    assert db_session.query(VideoEmbedding).count() == 0
+
+
+def test_related_videos_not_found(db_session, fresh_index):
+    assert crud.get_related_videos(db_session, 999) is None
+
+
+def test_backfill_and_reconcile(db_session, fresh_index):
+    videos = [Video(url=f"u{i}", title=f"t{i}", channel_name="c", status="completed") for i in range(3)]
+    db_session.add_all(videos)
+    db_session.commit()
+
+    # 埋め込みが導入される前からある動画
+    assert crud.backfill_embeddings(batch_size=2) == 3
+    assert crud.backfill_embeddings() == 0
+    assert db_session.query(VideoEmbedding).count() == 3
+
+    # 別のレプリカで削除された動画は、定期的な作り直しでインデックスから消える
+    db_session.query(VideoEmbedding).filter(VideoEmbedding.video_id == videos[0].id).delete()
+    db_session.commit()
+    embeddings.refresh_index(db_session, force=True)
+    assert len(fresh_index) == 2 and fresh_index.get(videos[0].id) is None
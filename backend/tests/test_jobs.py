@@ -0,0 +1,110 @@
+import ipaddress
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from src.jobs import JobExecutor
+
+
+def _blocked_executor(**limits):
+    """Executor whose single worker is held by a job until ``release`` is set."""
+    executor = JobExecutor("test", max_concurrency=1, **limits)
+    release, started = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    executor.submit("other", "blocker", blocker)
+    assert started.wait(5)
+    return executor, release
+
+
+def test_queue_limits_return_429_with_retry_after():
+    executor, release = _blocked_executor(max_queue=3, max_queue_per_client=2)
+    try:
+        executor.submit("bulk", 1, lambda: None)
+        executor.submit("bulk", 2, lambda: None)
+        with pytest.raises(HTTPException) as exc_info:
+            executor.submit("bulk", 3, lambda: None)
+        assert exc_info.value.status_code == 429
+        assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+        # 他のクライアントは全体の上限までは受け付けられる
+        assert executor.capacity("interactive") == 1
+        executor.submit("interactive", 4, lambda: None)
+        with pytest.raises(HTTPException):
+            executor.admit("someone-else")
+        assert executor.stats["rejected"] == 2
+        # 統計にはクライアントキー（IP など）を出さず、件数だけを返す
+        assert executor.get_stats()["clients"] == 2
+    finally:
+        release.set()
+
+
+def test_round_robin_across_clients():
+    executor, release = _blocked_executor(max_queue=10, max_queue_per_client=10)
+    order = []
+    done = threading.Event()
+    try:
+        for key in ("b1", "b2", "b3"):
+            executor.submit("bulk", key, order.append, key)
+        position = executor.submit("interactive", "i1", order.append, "i1")
+        # 一括投入の後ろではなく、2番目に実行される
+        assert position == 2
+        assert executor.position("i1") == 2
+        assert executor.position("blocker") == 0
+    finally:
+        release.set()
+    for _ in range(500):
+        if executor.stats["completed"] == 5:
+            break
+        done.wait(0.01)
+    assert order[:2] == ["b1", "i1"]
+    assert sorted(order) == ["b1", "b2", "b3", "i1"]
+
+
+def test_failed_job_does_not_stop_worker():
+    executor = JobExecutor("test", max_concurrency=1, max_queue=5, max_queue_per_client=5)
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    executor.submit("c", 1, fail)
+    executor.submit("c", 2, done.set)
+    assert done.wait(5)
+    assert executor.stats["failed"] == 1
+
+
+def test_create_video_rejected_before_any_work():
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from src.main import API_PREFIX, app
+
+    full = JobExecutor("high_quality", max_concurrency=1, max_queue=0, max_queue_per_client=0)
+    with patch.dict("src.routers.videos.executors", {"high_quality": full}), \
+         patch("src.crud.create_video") as create_video:
+        response = TestClient(app).post(
+            f"{API_PREFIX}/videos/", json={"url": "https://youtu.be/x", "transcriptionOption": "high_quality"},
+        )
+    assert response.status_code == 429
+    assert "retry-after" in response.headers
+    create_video.assert_not_called()
+
+
+def test_client_key_trusts_headers_only_from_proxies():
+    from types import SimpleNamespace
+    from unittest.mock import patch
+    from src import jobs
+
+    def request(host, **headers):
+        return SimpleNamespace(client=SimpleNamespace(host=host), headers=headers)
+
+    with patch.object(jobs, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")]):
+        assert jobs.client_key(request("203.0.113.5", **{"x-client-id": "spoofed"})) == "ip:203.0.113.5"
+        assert jobs.client_key(request("10.0.0.2", **{"x-client-id": "tenant-a"})) == "id:tenant-a"
+        forwarded = {"x-forwarded-for": "198.51.100.1, 203.0.113.7"}
+        assert jobs.client_key(request("10.0.0.2", **forwarded)) == "ip:203.0.113.7"
+        assert jobs.client_key(request("203.0.113.5", **forwarded)) == "ip:203.0.113.5"
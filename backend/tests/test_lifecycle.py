@@ -0,0 +1,146 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+
+from src import crud, jobs, lifecycle
+from src.jobs import JobExecutor, JobInterrupted
+from src.models import Video
+
+
+@pytest.fixture
+def fresh_lifecycle(monkeypatch):
+    monkeypatch.setattr(lifecycle, "_draining", threading.Event())
+    monkeypatch.setattr(lifecycle, "_drain_result", None)
+    monkeypatch.setattr(jobs, "shutdown", threading.Event())
+
+
+@pytest.fixture
+def sessions(db_session):
+    with patch.object(crud, "SessionLocal", sessionmaker(bind=db_session.get_bind())), \
+            patch.object(crud, "invalidate_cache"):
+        yield db_session
+
+
+def test_drain_stops_intake_and_hands_back_unstarted_jobs(fresh_lifecycle):
+    executor = JobExecutor("high_quality", max_concurrency=1, max_queue=10, max_queue_per_client=10)
+    release, started = threading.Event(), threading.Event()
+    executor.submit("a", 1, lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    executor.submit("a", 2, lambda: None)
+    executor.submit("b", 3, lambda: None)
+
+    handed_back = []
+    with patch.object(lifecycle, "executors", {"high_quality": executor}), \
+            patch.object(crud.recognition_scheduler, "stop", return_value=[4]), \
+            patch.object(crud, "mark_transcriptions_interrupted", side_effect=lambda ids: handed_back.extend(ids) or ids):
+        result = lifecycle.drain(deadline_seconds=0.1)
+        # 2回目以降は最初の結果を返す（preStop と lifespan shutdown の両方から呼ばれる）
+        assert lifecycle.drain() is result
+
+    assert lifecycle.is_draining()
+    # 実行中でチェックポイントに達しないジョブの行はそのまま（リース切れで引き継がれる）
+    assert sorted(handed_back) == [2, 3, 4]
+    assert result["running"] == [1]
+    with pytest.raises(HTTPException) as exc_info:
+        executor.submit("c", 5, lambda: None)
+    assert exc_info.value.status_code == 503 and exc_info.value.headers["Retry-After"]
+    assert executor.capacity("c") == 0
+    release.set()
+
+
+def test_drain_asks_running_jobs_to_stop_at_a_checkpoint(fresh_lifecycle):
+    executor = JobExecutor("high_quality", max_concurrency=1, max_queue=10, max_queue_per_client=10)
+    started, stopped = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        try:
+            while True:
+                jobs.check_interrupted()
+                time.sleep(0.01)
+        except JobInterrupted:
+            stopped.set()
+
+    executor.submit("a", 1, job)
+    assert started.wait(5)
+    with patch.object(lifecycle, "executors", {"high_quality": executor}), \
+            patch.object(lifecycle, "SHUTDOWN_CANCEL_SECONDS", 1), \
+            patch.object(crud.recognition_scheduler, "stop", return_value=[]), \
+            patch.object(crud, "mark_transcriptions_interrupted", side_effect=lambda ids: ids):
+        result = lifecycle.drain(deadline_seconds=2)
+
+    assert stopped.is_set()
+    assert result == {"interrupted": [], "running": []}
+
+
+def test_interrupted_job_hands_itself_back_at_a_checkpoint(sessions, fresh_lifecycle):
+    video = Video(url="https://youtu.be/abcdefghijk", title="T", channel_name="c", status="processing")
+    sessions.add(video)
+    sessions.commit()
+
+    def prepare_audio(video_id_yt, checkpoint, record, job_id=None):
+        # ダウンロード中に停止が始まった
+        jobs.shutdown.set()
+        record("downloaded", download_bytes=10)
+        record("converted")
+
+    with patch.object(crud, "prepare_audio", side_effect=prepare_audio), \
+            patch.object(crud.recognition_scheduler, "enqueue") as enqueue:
+        crud.run_high_quality_transcription(video.id)
+
+    enqueue.assert_not_called()
+    sessions.expire_all()
+    assert video.status == "interrupted"
+    assert video.transcription_stage == "downloaded"
+
+
+def test_interrupted_jobs_are_claimed_once(sessions):
+    videos = [Video(url="u", title=f"T{i}", channel_name="c", status=status)
+              for i, status in enumerate(["processing", "processing", "completed"])]
+    sessions.add_all(videos)
+    sessions.commit()
+    ids = [video.id for video in videos]
+
+    assert crud.mark_transcriptions_interrupted(ids) == ids[:2]
+    assert crud.claim_interrupted_transcriptions(limit=1) == [ids[0]]
+    assert crud.claim_interrupted_transcriptions(limit=5) == [ids[1]]
+    assert crud.claim_interrupted_transcriptions(limit=5) == []
+    sessions.expire_all()
+    assert [video.status for video in videos] == ["processing", "processing", "completed"]
+
+
+def test_expired_processing_jobs_are_claimed(sessions):
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(seconds=600)
+    # ハートビートのない行は、旧バージョンのレプリカで動いている可能性があるので updated_at で判断する
+    videos = [Video(url="u", title=f"T{i}", channel_name="c", status="processing", heartbeat_at=heartbeat, updated_at=updated_at)
+              for i, (heartbeat, updated_at) in enumerate([(now, now), (old, old), (None, old), (None, now)])]
+    sessions.add_all(videos)
+    sessions.commit()
+    ids = [video.id for video in videos]
+
+    assert crud.claim_interrupted_transcriptions(limit=5) == []
+    assert sorted(crud.claim_interrupted_transcriptions(limit=5, lease_seconds=300)) == ids[1:3]
+    # 引き受けた行のリースは更新されている
+    assert crud.claim_interrupted_transcriptions(limit=5, lease_seconds=300) == []
+
+    crud.heartbeat_transcriptions([ids[0]])
+    sessions.expire_all()
+    assert videos[0].heartbeat_at is not None
+
+
+def test_ready_reports_draining(fresh_lifecycle):
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    client = TestClient(app)
+    assert client.get("/ready").status_code == 200
+    lifecycle._draining.set()
+    response = client.get("/ready")
+    assert response.status_code == 503 and response.json()["status"] == "draining"
+    assert client.post("/drain").status_code == 403
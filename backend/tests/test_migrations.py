@@ -0,0 +1,61 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, inspect, text
+
+from src import database, crud, models
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'test.db'}"
+    engine = create_engine(url)
+    with patch.object(database, "engine", engine), \
+         patch.object(database, "DATABASE_URL", url):
+        yield engine
+    engine.dispose()
+
+
+def test_run_migrations_creates_indexes(sqlite_engine):
+    database.run_migrations()
+
+    index_names = {ix["name"] for ix in inspect(sqlite_engine).get_indexes("videos")}
+    assert {
+        "ix_videos_status",
+        "ix_videos_created_at",
+        "ix_videos_updated_at",
+        "ix_videos_channel_name",
+        "ix_videos_title",
+        "ix_videos_processing",
+        "ix_videos_unfinished",
+    } <= index_names
+
+
+def test_run_migrations_stamps_legacy_schema(sqlite_engine):
+    # create_all 時代のスキーマ（インデックスなし）を再現する
+    with sqlite_engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE videos (id INTEGER PRIMARY KEY, url TEXT NOT NULL, title VARCHAR(255) NOT NULL, "
+            "channel_name VARCHAR(255) NOT NULL, tags TEXT, memo TEXT, transcript TEXT, "
+            "status VARCHAR(50) NOT NULL, created_at DATETIME, updated_at DATETIME)"
+        ))
+
+    database.run_migrations()
+
+    index_names = {ix["name"] for ix in inspect(sqlite_engine).get_indexes("videos")}
+    assert "ix_videos_status" in index_names
+
+
+def test_sortable_columns_are_indexed():
+    indexed = {col.name for ix in models.Video.__table__.indexes for col in ix.columns}
+    indexed.add("id")
+    assert set(models.SORTABLE_COLUMNS) <= indexed
+
+
+def test_search_videos_ignores_unindexed_sort_column():
+    from unittest.mock import MagicMock
+    db = MagicMock()
+    query = db.query.return_value
+    crud.search_videos(db, sort_by="transcript")
+    query.order_by.assert_called_once()
+    ordered_by = query.order_by.call_args[0][0]
+    assert str(ordered_by) == str(models.Video.id.asc())
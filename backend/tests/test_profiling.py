@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from unittest.mock import patch
+
+from src import profiling
+from src.profiling import ProfilingMiddleware
+
+
+@pytest.fixture
+def client(db_session, tmp_path):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, directory=str(tmp_path))
+
+    def get_session():
+        return db_session
+
+    @app.get("/slow")
+    def slow(db=Depends(get_session)):
+        db.execute(text("SELECT 1")).all()
+        total = 0
+        for i in range(1000000):
+            total += i
+        return {"total": total}
+
+    with patch.object(profiling, "PROFILING_TOKEN", "secret"), \
+         patch.object(profiling, "PROFILING_SAMPLE_RATE", 0.0):
+        yield TestClient(app), tmp_path
+
+
+def test_not_profiled_without_token(client):
+    test_client, directory = client
+    response = test_client.get("/slow", headers={"X-Profile": "wrong"})
+    assert response.json()["total"] > 0
+    assert "x-profile-file" not in response.headers
+    assert os.listdir(directory) == []
+
+
+def test_profile_written_to_directory(client):
+    test_client, directory = client
+    response = test_client.get("/slow", headers={"X-Profile": "secret"})
+    assert response.json()["total"] > 0
+
+    path = directory / response.headers["x-profile-file"]
+    profile = json.loads(path.read_text())
+    assert profile["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    assert [q["statement"] for q in profile["sql"]] == ["SELECT 1"]
+    assert {p["type"] for p in profile["profiles"]} == {"sampled", "evented"}
+    # エンドポイントを実行したワーカースレッドのスタックが記録されている
+    names = {frame["name"] for frame in profile["shared"]["frames"]}
+    assert any(name.endswith("slow") for name in names)
+
+
+def test_profile_returned_inline(client):
+    test_client, directory = client
+    response = test_client.get("/slow", headers={"X-Profile": "secret", "X-Profile-Output": "inline"})
+    assert response.headers["x-profiled-status"] == "200"
+    assert response.json()["name"] == "GET /slow"
+    assert os.listdir(directory) == []
+
+
+def test_profiler_is_the_outermost_middleware():
+    from src.main import app
+
+    # user_middleware は外側から順に並ぶ
+    assert app.user_middleware[0].cls is ProfilingMiddleware
+
+
+def test_sampled_profiles_are_only_written_to_disk(client):
+    test_client, directory = client
+    with patch.object(profiling, "PROFILING_SAMPLE_RATE", 1.0), \
+         patch.object(profiling, "PROFILING_MAX_FILES", 2):
+        for _ in range(3):
+            response = test_client.get("/slow", headers={"X-Profile-Output": "inline"})
+            # トークンなしでは通常のレスポンスのまま、ファイル名も返さない
+            assert response.json()["total"] > 0
+            assert "x-profile-file" not in response.headers
+
+    assert len([name for name in os.listdir(directory) if name.endswith(".speedscope.json")]) == 2
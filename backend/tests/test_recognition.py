@@ -0,0 +1,92 @@
+import threading
+
+from src.recognition import RecognitionScheduler
+
+
+class _FakeBackend:
+    name = "fake"
+
+    def __init__(self, max_batch):
+        self.max_batch = max_batch
+        self.submitted = []
+        self.done = set()
+        self.polls = 0
+
+    def submit(self, refs, lang_code):
+        self.submitted.append(list(refs))
+        return f"operations/{len(self.submitted)}"
+
+    def poll(self, operation_name, refs):
+        self.polls += 1
+        if operation_name not in self.done:
+            return None
+        return {ref: (f"text of {ref}", None) for ref in refs if ref != "gs://b/broken"}
+
+
+def _scheduler(backend, **kwargs):
+    submitted, results = [], {}
+    finished = threading.Event()
+
+    def on_result(video_id, transcript, error):
+        results[video_id] = (transcript, error)
+        if len(results) == 3:
+            finished.set()
+
+    scheduler = RecognitionScheduler(
+        on_submitted=lambda video_ids, name: submitted.append((video_ids, name)),
+        on_result=on_result,
+        backend=backend,
+        **kwargs,
+    )
+    return scheduler, submitted, results, finished
+
+
+def test_files_from_several_jobs_share_one_operation():
+    backend = _FakeBackend(max_batch=2)
+    scheduler, submitted, results, finished = _scheduler(backend, batch_wait=0.05, poll_interval=0.01)
+    scheduler.enqueue(1, "gs://b/1")
+    scheduler.enqueue(2, "gs://b/2")
+    scheduler.enqueue(3, "gs://b/broken")
+    backend.done.update({"operations/1", "operations/2"})
+
+    assert finished.wait(5)
+    # 満杯のバッチはすぐ、残りは待ち時間の後にまとめて投入される
+    assert backend.submitted == [["gs://b/1", "gs://b/2"], ["gs://b/broken"]]
+    assert submitted == [([1, 2], "operations/1"), ([3], "operations/2")]
+    assert results[1] == ("text of gs://b/1", None)
+    assert results[2] == ("text of gs://b/2", None)
+    assert results[3][0] is None and results[3][1]
+    stats = scheduler.get_stats()
+    assert stats["operations"] == 2 and stats["completed"] == 2 and stats["failed"] == 1
+    assert stats["in_flight_operations"] == 0
+
+
+def test_tracked_operations_are_polled_until_done_or_timeout():
+    backend = _FakeBackend(max_batch=15)
+    scheduler, submitted, results, finished = _scheduler(backend, poll_interval=0.01, timeout=0.3)
+    scheduler.track("operations/old", {"gs://b/1": 1})
+    scheduler.track("operations/old", {"gs://b/2": 2})
+    scheduler.track("operations/stuck", {"gs://b/3": 3})
+    backend.done.add("operations/old")
+
+    assert finished.wait(5)
+    assert submitted == [] and backend.submitted == []
+    assert results[1] == ("text of gs://b/1", None) and results[2] == ("text of gs://b/2", None)
+    assert results[3] == (None, "Recognition timed out")
+    assert backend.polls > 3
+
+
+def test_rows_sharing_audio_are_submitted_once_and_all_get_the_result():
+    backend = _FakeBackend(max_batch=2)
+    scheduler, submitted, results, finished = _scheduler(backend, batch_wait=0.05, poll_interval=0.01)
+    # 同じ動画の2行は同じ GCS オブジェクトを指す
+    scheduler.enqueue(1, "gs://b/same")
+    scheduler.enqueue(2, "gs://b/same")
+    scheduler.enqueue(3, "gs://b/other")
+    backend.done.add("operations/1")
+
+    assert finished.wait(5)
+    assert backend.submitted == [["gs://b/same", "gs://b/other"]]
+    assert submitted == [([1, 2, 3], "operations/1")]
+    assert results[1] == results[2] == ("text of gs://b/same", None)
+    assert results[3] == ("text of gs://b/other", None)
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from unittest.mock import patch
+
+from src import cache, crud, database
+from src.database import Base, Replica
+from src.models import Video
+
+
+@pytest.fixture
+def primary_and_replica(tmp_path):
+    """Two SQLite files standing in for the primary and a read replica."""
+    primary_engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+    replica = Replica(bind=create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False}))
+    for engine, title in ((primary_engine, "primary"), (replica.engine, "replica")):
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add(Video(url="u", title=title, channel_name="c", tags="t", transcript="x", status="completed"))
+            db.commit()
+    primary = sessionmaker(autocommit=False, autoflush=False, bind=primary_engine)
+    query_cache = cache.QueryCache()
+    with patch.object(database, "SessionLocal", primary), \
+         patch.object(database, "replicas", [replica]), \
+         patch.object(cache, "query_cache", query_cache), \
+         patch.object(crud, "query_cache", query_cache):
+        yield primary, replica
+    primary_engine.dispose()
+    replica.engine.dispose()
+
+
+class _Request:
+    def __init__(self, cookies=None):
+        self.cookies = cookies or {}
+
+
+def test_reads_go_to_replica_by_default(primary_and_replica):
+    primary, replica = primary_and_replica
+    assert database.read_sessionmaker(_Request()) is replica.SessionLocal
+
+
+def test_sticky_cookie_reads_from_primary(primary_and_replica):
+    primary, _ = primary_and_replica
+    request = _Request({database.STICKY_COOKIE: str(time.time() + 10)})
+    assert database.read_sessionmaker(request) is primary
+    expired = _Request({database.STICKY_COOKIE: str(time.time() - 1)})
+    assert database.read_sessionmaker(expired) is not primary
+
+
+def test_lagging_replica_falls_back_to_primary(primary_and_replica):
+    primary, replica = primary_and_replica
+    with patch.object(database, "measure_replica_lag", return_value=database.REPLICA_MAX_LAG_SECONDS + 1):
+        replica.lag = None
+        assert database.read_sessionmaker(_Request()) is primary
+
+
+def test_recent_write_does_not_cache_replica_reads(primary_and_replica):
+    primary, replica = primary_and_replica
+    crud.query_cache.bump_version()
+    # 他のクライアントはレプリカを読み続けるが、遅れているかもしれない結果はキャッシュしない
+    assert database.read_sessionmaker(_Request()) is replica.SessionLocal
+    with replica.SessionLocal() as db:
+        assert database.may_miss_recent_writes(db)
+        crud.search_videos_cached(db)
+    with primary() as db:
+        assert not database.may_miss_recent_writes(db)
+        assert crud.search_videos_cached(db) and crud.query_cache.stats["hits"] == 0
+
+
+def test_endpoints_route_reads_and_set_stickiness(primary_and_replica):
+    from src.main import API_PREFIX, app
+
+    client = TestClient(app)
+    assert client.get(f"{API_PREFIX}/videos/").json()[0]["title"] == "replica"
+
+    response = client.put(f"{API_PREFIX}/videos/1", json={"url": "u", "tags": "new"})
+    assert response.status_code == 200
+    assert database.STICKY_COOKIE in response.cookies
+    assert client.get(f"{API_PREFIX}/videos/1").json()["title"] == "primary"
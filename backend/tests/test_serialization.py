@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from src import crud, models
+from src.models import Video
+from src.serialization import dumps, iter_json_array, loads, rows_to_dicts, schema_columns
+
+
+def test_iter_json_array():
+    assert b"".join(iter_json_array([])) == b"[]"
+    assert loads(b"".join(iter_json_array([{"a": 1}, {"a": 2}]))) == [{"a": 1}, {"a": 2}]
+
+
+def test_dumps_handles_datetimes_and_unicode():
+    value = {"at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc), "text": "日本語"}
+    decoded = loads(dumps(value))
+    assert decoded["text"] == "日本語"
+    assert decoded["at"].startswith("2024-01-02T03:04:05")
+
+
+def test_rows_to_dicts_matches_schema_fields():
+    fields = schema_columns(models.VideoListSchema, Video)
+    assert [name for name, _ in fields] == list(models.VideoListSchema.model_fields)
+    row = tuple(range(sum(1 for _, column in fields if column is not None)))
+    result = next(rows_to_dicts([row], fields))
+    assert result["transcriptionOption"] is None
+
+
+def test_tuple_path_matches_pydantic_output(db_session):
+    db_session.add(Video(url="u", title="T", channel_name="c", transcript="x" * 1000, summary="s", status="completed"))
+    db_session.commit()
+    video = db_session.query(Video).first()
+
+    fast = loads(crud.get_video_json(db_session, video.id))
+    slow = models.VideoSchema.model_validate(video).model_dump()
+
+    assert fast.keys() == slow.keys()
+    assert {k: v for k, v in fast.items() if k not in ("created_at", "updated_at")} == \
+        {k: v for k, v in slow.items() if k not in ("created_at", "updated_at")}
+
+    rows = list(crud.search_video_rows(db_session, batch_size=10))
+    assert "transcript" not in rows[0]
+    assert rows[0]["summary"] == "s"
+
+
+def test_get_video_json_not_found(db_session):
+    assert crud.get_video_json(db_session, 123) is None
@@ -0,0 +1,50 @@
+import time
+
+from src.summarizer import split_sentences, summarize
+
+
+def test_split_sentences_japanese():
+    text = "今日は晴れです。明日は雨でしょう！本当ですか？"
+    assert split_sentences(text) == ["今日は晴れです。", "明日は雨でしょう！", "本当ですか？"]
+
+
+def test_split_sentences_english_and_newlines():
+    text = "Hello there. How are you?\nFine"
+    assert split_sentences(text) == ["Hello there.", "How are you?", "Fine"]
+
+
+def test_split_sentences_chunks_unpunctuated_captions():
+    text = " ".join(["word"] * 200)
+    sentences = split_sentences(text)
+    assert len(sentences) > 1
+    assert all(len(s) <= 120 for s in sentences)
+
+
+def test_summarize_empty():
+    assert summarize(None) is None
+    assert summarize("   ") is None
+
+
+def test_summarize_keeps_original_order_and_picks_central_sentences():
+    text = (
+        "Pythonの関数について説明します。"
+        "関数はdefで定義します。"
+        "今日の天気は晴れです。"
+        "Pythonの関数は引数を受け取ります。"
+        "関数は値を返します。"
+    )
+    summary = summarize(text, max_sentences=2, ratio=1.0)
+    assert "天気" not in summary
+    assert summary.count("。") == 2
+    sentences = split_sentences(text)
+    picked = split_sentences(summary)
+    assert [sentences.index(s) for s in picked] == sorted(sentences.index(s) for s in picked)
+
+
+def test_summarize_hour_long_transcript_is_fast():
+    sentence = "これは機械学習のモデルについての説明です。データの前処理も重要です。"
+    text = sentence * 1000
+    start = time.perf_counter()
+    summary = summarize(text)
+    assert summary
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,73 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+
+from src import crud, models
+from src.jobs import JobExecutor
+
+METADATA = {"title": "T", "channel_id": "UC1", "channel_name": "C", "duration_seconds": 60}
+
+
+@pytest.fixture
+def youtube(db_session):
+    with patch('src.crud.extract_video_id', return_value="vid"), \
+         patch('src.crud.get_youtube_video_metadata', return_value=METADATA), \
+         patch('src.crud.get_caption_transcript') as mock_captions:
+        yield mock_captions
+
+
+def _create(db, option):
+    return crud.create_video(db, models.VideoCreate(url="https://youtu.be/vid", transcriptionOption=option))
+
+
+def test_auto_uses_qualifying_captions(db_session, youtube):
+    youtube.return_value = ("字幕です。", "youtube_manual")
+
+    video = _create(db_session, "auto")
+
+    assert video.status == "completed"
+    assert video.transcript == "字幕です。"
+    assert video.transcript_source == "youtube_manual"
+    assert youtube.call_args.kwargs["accept_generated"] is False
+
+
+def test_auto_escalates_to_high_quality(db_session, youtube):
+    youtube.return_value = (None, None)
+
+    video = _create(db_session, "auto")
+
+    assert video.status == "processing"
+    assert video.transcript is None
+
+
+def test_standard_accepts_generated_captions(db_session, youtube):
+    youtube.return_value = ("auto captions", "youtube_generated")
+
+    video = _create(db_session, "standard")
+
+    assert video.status == "completed"
+    assert video.transcript_source == "youtube_generated"
+    assert youtube.call_args.kwargs["accept_generated"] is True
+
+
+def test_high_quality_skips_captions(db_session, youtube):
+    video = _create(db_session, "high_quality")
+
+    assert video.status == "processing"
+    youtube.assert_not_called()
+
+
+def test_auto_admits_only_when_escalating(db_session, youtube):
+    youtube.return_value = ("字幕です。", "youtube_manual")
+    full = JobExecutor("high_quality", max_concurrency=1, max_queue=0, max_queue_per_client=0)
+    video = crud.create_video(db_session, models.VideoCreate(url="https://youtu.be/vid", transcriptionOption="auto"),
+                              admit=lambda: full.admit("c"))
+    assert video.status == "completed"
+
+    # 高品質文字起こしに回す場合は、行を作る前に断る
+    youtube.return_value = (None, None)
+    with pytest.raises(HTTPException) as exc_info:
+        crud.create_video(db_session, models.VideoCreate(url="https://youtu.be/vid", transcriptionOption="auto"),
+                          admit=lambda: full.admit("c"))
+    assert exc_info.value.status_code == 429
+    assert db_session.query(models.Video).count() == 1
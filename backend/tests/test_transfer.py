@@ -0,0 +1,90 @@
+import io
+import json
+
+import pytest
+
+from src import transfer
+from src.models import Channel, Video
+
+
+def _add_videos(db, n):
+    for i in range(n):
+        db.add(Video(
+            url=f"https://youtu.be/vid{i}",
+            title=f"Title {i}",
+            channel_name="Channel",
+            tags="a, b",
+            transcript=f"こんにちは {i}",
+            status="completed",
+        ))
+    db.commit()
+
+
+def test_iter_ndjson_streams_every_row(db_session):
+    _add_videos(db_session, 5)
+
+    lines = list(transfer.iter_ndjson(db_session, batch_size=2))
+
+    assert len(lines) == 5
+    first = json.loads(lines[0])
+    assert first["title"] == "Title 0"
+    assert first["transcript"] == "こんにちは 0"
+    assert isinstance(first["created_at"], str)
+
+
+def test_ndjson_round_trip(db_session):
+    _add_videos(db_session, 3)
+    out = io.BytesIO()
+    transfer.export_to_file(db_session, out, "ndjson")
+    db_session.query(Video).delete()
+    db_session.commit()
+
+    count = transfer.import_file(db_session, io.BytesIO(out.getvalue()), "ndjson", batch_size=2)
+
+    assert count == 3
+    assert sorted(v.title for v in db_session.query(Video)) == ["Title 0", "Title 1", "Title 2"]
+
+
+def test_import_rejects_rows_without_required_fields(db_session):
+    data = io.BytesIO(b'{"url": "https://youtu.be/x"}\n')
+    with pytest.raises(ValueError, match="title"):
+        transfer.import_file(db_session, data, "ndjson")
+    assert db_session.query(Video).count() == 0
+
+
+@pytest.mark.parametrize("line", [b"[]", b'"x"', b"1", b"null"])
+def test_import_rejects_rows_that_are_not_objects(db_session, line):
+    data = io.BytesIO(b'{"url": "https://youtu.be/x", "title": "T", "channel_name": "C"}\n' + line + b"\n")
+    with pytest.raises(ValueError, match="JSON object"):
+        transfer.import_file(db_session, data, "ndjson")
+    assert db_session.query(Video).count() == 0
+
+
+def test_parquet_round_trip(db_session):
+    pytest.importorskip("pyarrow")
+    _add_videos(db_session, 4)
+    out = io.BytesIO()
+    transfer.export_to_file(db_session, out, "parquet", batch_size=3)
+    db_session.query(Video).delete()
+    db_session.commit()
+
+    count = transfer.import_file(db_session, io.BytesIO(out.getvalue()), "parquet")
+
+    assert count == 4
+
+
+def test_import_keeps_channel_and_fails_unfinished_jobs(db_session):
+    rows = [
+        {"url": "u1", "title": "A", "channel_name": "Chan", "channel_id": "UC1", "status": "processing"},
+        {"url": "u2", "title": "B", "channel_name": "Chan", "channel_id": "UC1", "transcript": "x"},
+    ]
+    ids = []
+
+    count = transfer.import_rows(db_session, rows, ids=ids)
+
+    assert count == 2 and len(ids) == 2
+    videos = {v.id: v for v in db_session.query(Video)}
+    assert [videos[i].status for i in ids] == ["failed", "completed"]
+    assert {v.channel_id for v in videos.values()} == {"UC1"}
+    assert db_session.get(Channel, "UC1").title == "Chan"
+    assert "channel_id" in transfer.iter_video_rows(db_session).__next__()
@@ -1,5 +1,5 @@
 import pytest
-from src.youtube_api import extract_video_id, get_youtube_video_details, get_transcript_from_youtube, get_high_quality_transcript
+from src.youtube_api import extract_video_id, get_youtube_video_details, get_caption_transcript, get_high_quality_transcript
 import os
 from unittest.mock import patch, MagicMock, mock_open
 from youtube_transcript_api import FetchedTranscriptSnippet
@@ -73,20 +73,15 @@ def test_get_youtube_video_details_no_api_key():
     with pytest.raises(ValueError, match="YouTube API key is not set."):
         get_youtube_video_details("test_video_id")
 
-# Test cases for get_transcript_from_youtube
+# Test cases for get_caption_transcript
 @patch('src.youtube_api.YouTubeTranscriptApi')
-def test_get_transcript_from_youtube_success(mock_youtube_api_class):
+def test_get_caption_transcript_success(mock_youtube_api_class):
     from youtube_transcript_api import FetchedTranscript, FetchedTranscriptSnippet
-    from unittest.mock import Mock
     
     # FetchedTranscriptSnippetオブジェクトを作成
     snippet1 = FetchedTranscriptSnippet("Hello", 0.0, 1.0)
     snippet2 = FetchedTranscriptSnippet("world", 1.0, 1.0)
     
-    # 辞書形式でアクセスできるようにモック
-    snippet1.__getitem__ = lambda self, key: {"text": "Hello", "start": 0, "duration": 1}[key]
-    snippet2.__getitem__ = lambda self, key: {"text": "world", "start": 1, "duration": 1}[key]
-    
     # FetchedTranscriptオブジェクトを作成
     mock_transcript = FetchedTranscript(
         snippets=[snippet1, snippet2],
@@ -96,62 +91,246 @@ def test_get_transcript_from_youtube_success(mock_youtube_api_class):
         is_generated=False
     )
     
-    # モックインスタンスを作成
+    # 字幕トラックの一覧をモック
+    track = MagicMock(language_code="en", is_generated=False)
+    track.fetch.return_value = mock_transcript
     mock_api_instance = mock_youtube_api_class.return_value
-    mock_api_instance.fetch.return_value = mock_transcript
+    mock_api_instance.list.return_value = [track]
     
-    transcript = get_transcript_from_youtube("test_video_id")
+    transcript, source = get_caption_transcript("test_video_id")
     assert transcript == "Hello world"
+    assert source == "youtube_manual"
 
 @patch('src.youtube_api.YouTubeTranscriptApi')
-def test_get_transcript_from_youtube_failure(mock_youtube_api_class):
+def test_get_caption_transcript_failure(mock_youtube_api_class):
     mock_api_instance = mock_youtube_api_class.return_value
-    mock_api_instance.fetch.side_effect = Exception("No transcript available")
-    transcript = get_transcript_from_youtube("test_video_id")
-    assert transcript is None
+    mock_api_instance.list.side_effect = Exception("No transcript available")
+    assert get_caption_transcript("test_video_id") == (None, None)
 
 # Test cases for get_high_quality_transcript
-@patch('src.youtube_api.shutil.rmtree')
-@patch('src.youtube_api.tempfile.mkdtemp')
-@patch('src.youtube_api.speech.SpeechClient')
-@patch('src.youtube_api.yt_dlp.YoutubeDL')
-@patch('src.youtube_api.os.path.exists')
-@patch('builtins.open', new_callable=mock_open, read_data=b'fake_audio_data')
-def test_get_high_quality_transcript_success(
-    mock_file_open,
-    mock_path_exists,
-    mock_youtube_dl,
-    mock_speech_client,
-    mock_mkdtemp,
-    mock_rmtree
-):
-    # Arrange
-    mock_path_exists.return_value = True
-    mock_mkdtemp.return_value = '/fake/temp/dir'
-    
-    # speech.SpeechClient().long_running_recognize().result()
+def _recognition_operation(text, name="operations/123"):
     mock_result = MagicMock()
     mock_result.alternatives = [MagicMock()]
-    mock_result.alternatives[0].transcript = "This is a high quality transcript."
-    
+    mock_result.alternatives[0].transcript = text
     mock_operation = MagicMock()
+    mock_operation.operation.name = name
     mock_operation.result.return_value = MagicMock(results=[mock_result])
-    
-    mock_speech_client.return_value.long_running_recognize.return_value = mock_operation
+    return mock_operation
+
+@pytest.fixture
+def audio_cache(tmp_path):
+    from src.audio_cache import AudioCache
+    cache = AudioCache(root=str(tmp_path / "cache"), max_bytes=10 ** 9)
+    with patch('src.audio_cache.audio_cache', cache), \
+            patch('src.youtube_api.DOWNLOAD_DIR', str(tmp_path / "downloads")):
+        yield cache
+
+def _fake_download(video_id, work_dir, stats=None):
+    os.makedirs(work_dir, exist_ok=True)
+    return os.path.join(work_dir, f"{video_id}.webm")
 
-    # Act
-    transcript = get_high_quality_transcript('fake_video_id')
+def _fake_convert(audio_path, flac_path):
+    with open(flac_path, "wb") as f:
+        f.write(b"fake flac data")
+    return flac_path
+
+@patch.dict(os.environ, {'GCS_SPEECH_BUCKET': ''})
+@patch('src.youtube_api.convert_to_flac', side_effect=_fake_convert)
+@patch('src.youtube_api.download_audio', side_effect=_fake_download)
+@patch('src.youtube_api.speech.SpeechClient')
+def test_get_high_quality_transcript_success(mock_speech_client, mock_download, mock_convert, audio_cache, tmp_path):
+    mock_speech_client.return_value.long_running_recognize.return_value = _recognition_operation(
+        "This is a high quality transcript."
+    )
+    stages = []
+
+    transcript = get_high_quality_transcript('fake_video_id', on_checkpoint=lambda stage, **data: stages.append((stage, data)))
 
-    # Assert
     assert transcript == "This is a high quality transcript."
-    
-    # Check if mocks were called
-    mock_mkdtemp.assert_called_once()
-    mock_youtube_dl.assert_called_once()
-    mock_speech_client.assert_called_once()
-    
-    # Check that the audio file was opened
-    mock_file_open.assert_called_once_with('/fake/temp/dir/fake_video_id.wav', 'rb')
-    
-    # Check if cleanup was called
-    mock_rmtree.assert_called_once_with('/fake/temp/dir')
+    mock_download.assert_called_once()
+    assert [stage for stage, _ in stages] == ["downloaded", "converted", "submitted"]
+    assert stages[-1][1] == {"operation_name": "operations/123"}
+    # 変換済みの音声はキャッシュに残る
+    assert audio_cache.lookup('fake_video_id') is not None
+    # 変換に使ったダウンロード先は削除される
+    assert not os.path.exists(mock_download.call_args[0][1])
+
+@patch.dict(os.environ, {'GCS_SPEECH_BUCKET': ''})
+@patch('src.youtube_api.convert_to_flac', side_effect=_fake_convert)
+@patch('src.youtube_api.download_audio', return_value='/fake/audio.wav')
+@patch('src.youtube_api.speech.SpeechClient')
+def test_get_high_quality_transcript_retry_uses_cached_audio(mock_speech_client, mock_download, mock_convert, audio_cache, tmp_path):
+    flac = tmp_path / "a.flac"
+    flac.write_bytes(b"cached flac")
+    sha256, _ = audio_cache.put('fake_video_id', str(flac))
+    mock_speech_client.return_value.long_running_recognize.return_value = _recognition_operation("retried")
+
+    transcript = get_high_quality_transcript('fake_video_id', checkpoint={"stage": "converted", "audio_sha256": sha256})
+
+    assert transcript == "retried"
+    mock_download.assert_not_called()
+    mock_convert.assert_not_called()
+
+@patch('src.youtube_api.attach_recognition')
+@patch('src.youtube_api.download_audio')
+@patch('src.youtube_api.speech.SpeechClient')
+def test_get_high_quality_transcript_reattaches_to_operation(mock_speech_client, mock_download, mock_attach, audio_cache):
+    mock_attach.return_value = _recognition_operation("resumed")
+
+    transcript = get_high_quality_transcript('fake_video_id', checkpoint={"stage": "submitted", "operation_name": "operations/9"})
+
+    assert transcript == "resumed"
+    mock_attach.assert_called_once_with(mock_speech_client.return_value, "operations/9")
+    mock_speech_client.return_value.long_running_recognize.assert_not_called()
+    mock_download.assert_not_called()
+
+def test_heavy_sdks_are_imported_lazily():
+    import subprocess
+    import sys
+    code = (
+        "import sys, src.youtube_api; "
+        "heavy = ['yt_dlp', 'google.cloud.speech', 'google.cloud.storage', 'googleapiclient.discovery']; "
+        "print(','.join(m for m in heavy if m in sys.modules))"
+    )
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+@pytest.mark.parametrize("value, expected", [
+    ("PT1H2M3S", 3723),
+    ("PT45S", 45),
+    ("P1DT1M", 86460),
+    ("P0D", 0),
+    ("", None),
+    ("garbage", None),
+])
+def test_parse_iso8601_duration(value, expected):
+    from src.youtube_api import _parse_iso8601_duration
+    assert _parse_iso8601_duration(value) == expected
+
+@patch('src.youtube_api.build')
+@patch.dict(os.environ, {'YOUTUBE_API_KEY': 'test_key'})
+def test_get_youtube_video_metadata_success(mock_build):
+    from src.youtube_api import get_youtube_video_metadata
+    mock_videos = mock_build.return_value.videos.return_value
+    mock_videos.list.return_value.execute.return_value = {
+        "items": [{
+            "snippet": {
+                "title": "Test Video Title",
+                "channelId": "UC123",
+                "channelTitle": "Test Channel Name"
+            },
+            "contentDetails": {"duration": "PT10M"}
+        }]
+    }
+    metadata = get_youtube_video_metadata("test_video_id")
+    assert metadata == {
+        "title": "Test Video Title",
+        "channel_id": "UC123",
+        "channel_name": "Test Channel Name",
+        "duration_seconds": 600,
+    }
+    mock_videos.list.assert_called_once_with(part="snippet,contentDetails", id="test_video_id")
+
+# Test cases for caption track selection (auto mode)
+def _track(language_code, is_generated):
+    track = MagicMock()
+    track.language_code = language_code
+    track.is_generated = is_generated
+    return track
+
+def test_choose_caption_track_prefers_manual():
+    from src.youtube_api import choose_caption_track
+    generated_ja = _track('ja', True)
+    manual_en = _track('en', False)
+    assert choose_caption_track([generated_ja, manual_en], ['ja', 'en'], accept_generated=True) is manual_en
+
+def test_choose_caption_track_rejects_generated_unless_allowed():
+    from src.youtube_api import choose_caption_track
+    generated_ja = _track('ja', True)
+    assert choose_caption_track([generated_ja], ['ja'], accept_generated=False) is None
+    assert choose_caption_track([generated_ja], ['ja'], accept_generated=True) is generated_ja
+
+def test_choose_caption_track_ignores_other_languages():
+    from src.youtube_api import choose_caption_track
+    assert choose_caption_track([_track('fr', False)], ['ja', 'en'], accept_generated=True) is None
+
+@patch('src.youtube_api.YouTubeTranscriptApi')
+def test_get_caption_transcript_records_source(mock_youtube_api_class):
+    from src.youtube_api import get_caption_transcript
+    track = _track('ja', False)
+    track.fetch.return_value.to_raw_data.return_value = [{"text": "こんにちは"}, {"text": "世界"}]
+    mock_youtube_api_class.return_value.list.return_value = [track]
+
+    assert get_caption_transcript("vid", languages=['ja']) == ("こんにちは 世界", "youtube_manual")
+
+@patch('src.youtube_api.YouTubeTranscriptApi')
+def test_get_caption_transcript_listing_failure(mock_youtube_api_class):
+    from src.youtube_api import get_caption_transcript
+    mock_youtube_api_class.return_value.list.side_effect = Exception("disabled")
+    assert get_caption_transcript("vid") == (None, None)
+
+class _FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL: runs the filters/hooks and writes a small file."""
+
+    def __init__(self, opts, duration=60, chunks=(1000, 2000)):
+        self.opts = opts
+        self.duration = duration
+        self.chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url, download=True):
+        info = {"id": "vid", "duration": self.duration}
+        if self.opts["match_filter"](info, incomplete=False):
+            return info
+        path = self.opts["outtmpl"].replace("%(id)s", "vid").replace("%(ext)s", "webm")
+        for size in self.chunks:
+            for hook in self.opts["progress_hooks"]:
+                hook({"status": "downloading", "filename": path, "downloaded_bytes": size})
+        with open(path, "wb") as f:
+            f.write(b"x" * self.chunks[-1])
+        return {**info, "requested_downloads": [{"filepath": path, "format_id": "249"}]}
+
+def _fake_yt_dlp(created, **kwargs):
+    def factory(opts):
+        created.append(opts)
+        return _FakeYoutubeDL(opts, **kwargs)
+    return MagicMock(YoutubeDL=factory)
+
+def test_download_audio_prefers_small_audio_and_records_stats(tmp_path):
+    from src import youtube_api
+    created, stats = [], {}
+    with patch.object(youtube_api, 'yt_dlp', _fake_yt_dlp(created), create=True):
+        path = youtube_api.download_audio('vid', str(tmp_path / 'vid'), stats=stats)
+
+    opts = created[0]
+    assert opts['format'].startswith('wa')
+    assert 'postprocessors' not in opts
+    assert opts['continuedl'] is True
+    assert opts['concurrent_fragment_downloads'] == youtube_api.DOWNLOAD_CONCURRENT_FRAGMENTS
+    assert path.endswith('vid.webm')
+    assert stats['download_bytes'] == 2000
+    assert stats['download_seconds'] >= 0
+
+def test_download_audio_enforces_duration_and_byte_caps(tmp_path):
+    from src import youtube_api
+    with patch.object(youtube_api, 'yt_dlp', _fake_yt_dlp([], duration=10 ** 6), create=True):
+        with pytest.raises(youtube_api.DownloadLimitExceeded, match="long"):
+            youtube_api.download_audio('vid', str(tmp_path / 'a'))
+    with patch.object(youtube_api, 'yt_dlp', _fake_yt_dlp([], chunks=(10, 10 ** 4)), create=True), \
+         patch.object(youtube_api, 'DOWNLOAD_MAX_BYTES', 5000):
+        with pytest.raises(youtube_api.DownloadLimitExceeded, match="bytes"):
+            youtube_api.download_audio('vid', str(tmp_path / 'b'))
+    # 上限を超えたダウンロードは再開させずに捨てる
+    assert not (tmp_path / 'a').exists() and not (tmp_path / 'b').exists()
+
+
+def test_download_dir_is_per_job():
+    from src import youtube_api
+    assert youtube_api.download_dir('vid', 1) != youtube_api.download_dir('vid', 2)
+    assert youtube_api.download_dir('vid', 1).startswith(youtube_api.DOWNLOAD_DIR)
@@ -6,6 +6,25 @@ import VideoList from './components/VideoList';
 import TagMultiSelect from './components/TagMultiSelect';
 import VideoDetail from './components/VideoDetail';
 
+// Rows fetched per "Load more" in the default view
+const PAGE_SIZE = 100;
+
+// Data versions look like "<scope>:<n>"; numbers from different scopes
+// (e.g. two workers without a shared cache) cannot be compared
+const parseVersion = (version) => {
+  const separator = String(version).lastIndexOf(':');
+  return { scope: String(version).slice(0, separator), number: Number(String(version).slice(separator + 1)) };
+};
+
+const isNextVersion = (previous, next) => {
+  if (previous === null) {
+    return false;
+  }
+  const before = parseVersion(previous);
+  const after = parseVersion(next);
+  return before.scope === after.scope && after.number === before.number + 1;
+};
+
 const MainPage = () => {
   const [videos, setVideos] = useState([]);
   const [allTags, setAllTags] = useState([]);
@@ -16,6 +35,8 @@ const MainPage = () => {
   const [searchTags, setSearchTags] = useState([]);
   const [sortBy, setSortBy] = useState('id');
   const [sortOrder, setSortOrder] = useState('asc');
+  const [dataVersion, setDataVersion] = useState(null);
+  const [hasMore, setHasMore] = useState(false);
 
   const fetchVideos = (title = searchTitle, tags = searchTags, sort_by = sortBy, sort_order = sortOrder) => {
     const params = new URLSearchParams();
@@ -29,25 +50,89 @@ const MainPage = () => {
     params.append('sort_order', sort_order);
     fetch(`/api/videos/?${params.toString()}`)
       .then((res) => res.json())
-      .then((data) => setVideos(data))
+      .then((data) => {
+        setVideos(data);
+        setHasMore(false);
+      })
       .catch((err) => console.error("Error fetching videos:", err));
   };
 
-  const fetchTags = () => {
-    fetch('/api/tags/')
+  // Loads the first page, tags and data version in one request
+  const fetchBootstrap = () => {
+    fetch('/api/bootstrap')
       .then((res) => res.json())
-      .then((data) => setAllTags(data))
-      .catch((err) => console.error("Error fetching tags:", err));
+      .then((data) => {
+        setVideos(data.videos);
+        setAllTags(data.tags.map((tag) => tag.name));
+        setDataVersion(data.version);
+        setHasMore(data.has_more);
+      })
+      .catch((err) => console.error("Error fetching bootstrap data:", err));
+  };
+
+  // Appends the next page of the default view instead of loading the whole list up front
+  const fetchMoreVideos = () => {
+    const params = new URLSearchParams({
+      sort_by: 'id',
+      sort_order: 'asc',
+      skip: String(videos.length),
+      limit: String(PAGE_SIZE),
+    });
+    fetch(`/api/videos/?${params.toString()}`)
+      .then((res) => res.json())
+      .then((data) => {
+        setVideos((current) => {
+          const loaded = new Set(current.map((video) => video.id));
+          return [...current, ...data.filter((video) => !loaded.has(video.id))];
+        });
+        setHasMore(data.length === PAGE_SIZE);
+      })
+      .catch((err) => console.error("Error fetching more videos:", err));
+  };
+
+  const isDefaultView = () => !searchTitle && searchTags.length === 0 && sortBy === 'id' && sortOrder === 'asc';
+
+  // Patches the list with the delta returned by a mutation instead of refetching it
+  const applyDelta = (delta) => {
+    setAllTags(delta.tags.map((tag) => tag.name));
+    const upToDate = isNextVersion(dataVersion, delta.version);
+    setDataVersion(delta.version);
+    if (!upToDate) {
+      // Someone else changed the data in between, so the delta is not enough
+      if (isDefaultView()) {
+        fetchBootstrap();
+      } else {
+        fetchVideos();
+      }
+      return;
+    }
+    if (!isDefaultView()) {
+      fetchVideos();
+      return;
+    }
+    // Only the default view (id ascending) is patched in place, so sorting by id is
+    // enough here; filtered or differently sorted views were refetched above
+    setVideos((current) => {
+      const upserted = new Map(delta.upserted.map((video) => [video.id, video]));
+      const kept = current
+        .filter((video) => !delta.removed.includes(video.id))
+        .map((video) => upserted.get(video.id) || video);
+      const lastLoadedId = current.length > 0 ? current[current.length - 1].id : 0;
+      // New rows past the loaded pages arrive with "Load more"
+      const added = delta.upserted.filter(
+        (video) => !current.some((v) => v.id === video.id) && (!hasMore || video.id < lastLoadedId)
+      );
+      return [...kept, ...added].sort((a, b) => a.id - b.id);
+    });
   };
 
   useEffect(() => {
-    fetchVideos();
-    fetchTags();
+    fetchBootstrap();
   }, []);
 
   const handleAddVideo = async (videoData) => {
     try {
-      const response = await fetch('/api/videos/', {
+      const response = await fetch('/api/videos/?delta=true', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -55,9 +140,12 @@ const MainPage = () => {
         body: JSON.stringify(videoData),
       });
       if (response.ok) {
-        fetchVideos();
-        fetchTags();
+        const data = await response.json();
+        applyDelta(data.delta);
         setShowModal(false);
+      } else if (response.status === 429) {
+        const retryAfter = response.headers.get('Retry-After');
+        alert(`Too many transcriptions are queued. Please try again in about ${retryAfter} seconds.`);
       } else {
         console.error("Failed to add video");
       }
@@ -68,7 +156,7 @@ const MainPage = () => {
 
   const handleUpdateVideo = async (videoId, videoData) => {
     try {
-      const response = await fetch(`/api/videos/${videoId}`,
+      const response = await fetch(`/api/videos/${videoId}?delta=true`,
         {
           method: 'PUT',
           headers: {
@@ -80,8 +168,8 @@ const MainPage = () => {
       if (response.ok) {
         setEditingVideoId(null);
         setCurrentEditData({ url: '', tags: [], memo: '' });
-        fetchVideos();
-        fetchTags();
+        const data = await response.json();
+        applyDelta(data.delta);
       } else {
         console.error("Failed to update video");
       }
@@ -92,12 +180,12 @@ const MainPage = () => {
 
   const handleDeleteVideo = async (id) => {
     try {
-      const response = await fetch(`/api/videos/${id}`, {
+      const response = await fetch(`/api/videos/${id}?delta=true`, {
         method: 'DELETE',
       });
       if (response.ok) {
-        fetchVideos();
-        fetchTags();
+        const data = await response.json();
+        applyDelta(data.delta);
       } else {
         console.error("Failed to delete video");
       }
@@ -172,7 +260,7 @@ const MainPage = () => {
           setSearchTags([]);
           setSortBy('id');
           setSortOrder('asc');
-          fetchVideos('', [], 'id', 'asc');
+          fetchBootstrap();
         }}>Clear Search</button>
       </div>
 
@@ -193,6 +281,9 @@ const MainPage = () => {
           onEditFormChange={handleEditFormChange}
         />
       )}
+      {hasMore && (
+        <button onClick={fetchMoreVideos}>Load more</button>
+      )}
     </>
   );
 }
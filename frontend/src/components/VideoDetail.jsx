@@ -21,6 +21,10 @@ const StatusBadge = ({ status }) => {
       style = { ...badgeStyle, backgroundColor: '#f0ad4e' };
       text = 'Processing...';
       break;
+    case 'interrupted':
+      style = { ...badgeStyle, backgroundColor: '#5bc0de' };
+      text = 'Resuming...';
+      break;
     case 'failed':
       style = { ...badgeStyle, backgroundColor: '#d9534f' };
       text = 'Failed';
@@ -70,7 +74,7 @@ const VideoDetail = () => {
 
   useEffect(() => {
     const startPolling = (videoData) => {
-      if (videoData && videoData.status === 'processing' && !pollingInterval.current) {
+      if (videoData && ['processing', 'interrupted'].includes(videoData.status) && !pollingInterval.current) {
         pollingInterval.current = setInterval(() => {
           console.log('Polling for video status...');
           fetchVideo();
@@ -111,6 +115,9 @@ const VideoDetail = () => {
     if (video.status === 'processing') {
       return 'Transcript is being generated...';
     }
+    if (video.status === 'interrupted') {
+      return 'Transcription was interrupted by a server restart and will resume shortly...';
+    }
     if (video.status === 'failed') {
       return 'Transcript generation failed.';
     }
@@ -125,7 +132,17 @@ const VideoDetail = () => {
       <p><strong>URL:</strong> <a href={video.url} target="_blank" rel="noopener noreferrer">{video.url}</a></p>
       <p><strong>Memo:</strong> {video.memo}</p>
       <p><strong>Tags:</strong> {video.tags}</p>
+      {video.duplicate_of && (
+        <p><strong>Near-duplicate of:</strong> <Link to={`/video/${video.duplicate_of}`}>#{video.duplicate_of}</Link></p>
+      )}
       
+      {video.summary && (
+        <>
+          <h2>Summary</h2>
+          <p style={{ whiteSpace: 'pre-wrap', wordWrap: 'break-word' }}>{video.summary}</p>
+        </>
+      )}
+
       <h2>Transcript</h2>
       <pre style={{ whiteSpace: 'pre-wrap', wordWrap: 'break-word' }}>
         {getTranscriptText()}
@@ -107,6 +107,15 @@ const VideoForm = ({ onAddVideo, allTags, setAllTags, onCancel }) => {
             />
             High-Quality (Paid)
           </label>
+          <label style={{ marginLeft: '10px' }}>
+            <input
+              type="radio"
+              value="auto"
+              checked={transcriptionOption === 'auto'}
+              onChange={(e) => setTranscriptionOption(e.target.value)}
+            />
+            Auto (Captions, then High-Quality)
+          </label>
         </div>
       </div>
       <div>
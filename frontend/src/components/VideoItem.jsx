@@ -21,6 +21,10 @@ const StatusBadge = ({ status }) => {
       style = { ...badgeStyle, backgroundColor: '#f0ad4e' };
       text = 'Processing...';
       break;
+    case 'interrupted':
+      style = { ...badgeStyle, backgroundColor: '#5bc0de' };
+      text = 'Resuming...';
+      break;
     case 'failed':
       style = { ...badgeStyle, backgroundColor: '#d9534f' };
       text = 'Failed';